@@ -1,16 +1,51 @@
+import atexit
+import base64
+import hashlib
+import json
+import logging
 import os
-from datetime import timedelta
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
 
 from flask import (
     Flask, render_template, request,
-    redirect, url_for, session, flash
+    redirect, url_for, session, flash, jsonify,
+    abort, send_file, send_from_directory, stream_with_context
 )
+import click
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from markupsafe import Markup
 from dotenv import load_dotenv
-from sqlalchemy import text
+from werkzeug.http import is_resource_modified
+from sqlalchemy import (
+    text, event, func, update, insert, or_, and_, case, inspect, bindparam, cast, literal
+)
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.engine import create_engine
-from sqlalchemy.sql import func   # <- para ORDER BY NEWID() no SQL Server
+from sqlalchemy.orm import aliased
+
+import assets
+from availability import AvailabilityIndex
+import catalog_import
+from charts import ALL as ALL_GENRES, Charts
+from covers import CoverStore, CoverFetchError, UrlFetcher
+from discover import DiscoverSampler
+import exports
+import genres as genre_taxonomy
+from favorites_cache import FavoriteSetCache
+from instrumentation import RequestMetrics
+import index_advisor
+from migrations import Migration, Migrator
+from fragments import FragmentCache, MemoryBackend, RedisBackend
+from recommend import Recommender, build_neighbors, favorite_pair_changes
+from replicas import ReplicaRouter, RoutingSession
+from search import SearchIndex
+import startup
+from passwords import PasswordHasher, HasherBusy
+from plays import PlayBuffer, PlayBufferFull
+import positions
 
 load_dotenv()
 
@@ -46,27 +81,152 @@ def ensure_mssql_database():
         ))
 
 
-# garante DB
-ensure_mssql_database()
+# DATABASE_URL permite apontar para outro banco (ex.: sqlite:///harmonic.db
+# para testes/benchmarks locais). Sem ela, usamos o SQL Server.
+DATABASE_URL = os.getenv("DATABASE_URL")
 
-# aponta SQLAlchemy para o DB
-# Para rodar na escola
-# app.config["SQLALCHEMY_DATABASE_URI"] = (
-#     f"mssql+pyodbc://{MSSQL_USER}:{MSSQL_PASSWORD}"
-#     f"@{MSSQL_HOST},{MSSQL_PORT}/{MSSQL_DB}?driver={ODBC_DRIVER.replace(' ', '+')}"
-# )
+if DATABASE_URL:
+    app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
+else:
+    # o banco em si só é criado no bootstrap(), se a conexão falhar
 
-# Para rodar em casa
-app.config["SQLALCHEMY_DATABASE_URI"] = (
-    f"mssql+pyodbc://@{MSSQL_HOST},{MSSQL_PORT}/{MSSQL_DB}"
-    f"?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes"
-)
+    # aponta SQLAlchemy para o DB
+    # Para rodar na escola
+    # app.config["SQLALCHEMY_DATABASE_URI"] = (
+    #     f"mssql+pyodbc://{MSSQL_USER}:{MSSQL_PASSWORD}"
+    #     f"@{MSSQL_HOST},{MSSQL_PORT}/{MSSQL_DB}?driver={ODBC_DRIVER.replace(' ', '+')}"
+    # )
+
+    # Para rodar em casa
+    app.config["SQLALCHEMY_DATABASE_URI"] = (
+        f"mssql+pyodbc://@{MSSQL_HOST},{MSSQL_PORT}/{MSSQL_DB}"
+        f"?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes"
+    )
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Réplicas de leitura (opcional): URLs separadas por vírgula. Leituras de
+# requests GET vão para elas (ver replicas.py); quem acabou de escrever lê
+# do primário por READ_YOUR_WRITES_SECONDS. Para testar com SQLite:
+#   DATABASE_URL=sqlite:////tmp/primario.db
+#   DATABASE_REPLICA_URLS=sqlite:////tmp/replica.db
+#   flask sync-replicas        (copia o primário para as réplicas)
+REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+app.config["SQLALCHEMY_BINDS"] = {
+    f"replica_{i}": url for i, url in enumerate(REPLICA_URLS, start=1)
+}
+app.config["READ_YOUR_WRITES_SECONDS"] = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+app.config["REPLICA_CHECK_INTERVAL"] = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))
+
+# Pool de conexões (por processo). Com `flask serve`, DB_POOL_SIZE perto do
+# número de threads por processo evita esperar conexão livre.
+_engine_options = {
+    "pool_pre_ping": True,
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+}
+for _option, _env in (("pool_size", "DB_POOL_SIZE"),
+                      ("max_overflow", "DB_MAX_OVERFLOW"),
+                      ("pool_timeout", "DB_POOL_TIMEOUT")):
+    if os.getenv(_env):
+        _engine_options[_option] = int(os.getenv(_env))
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _engine_options
+
+# "Descobrir": quantas músicas mostrar e se esconde as já favoritadas
+app.config["DISCOVER_SIZE"] = int(os.getenv("DISCOVER_SIZE", "10"))
+app.config["DISCOVER_EXCLUDE_FAVORITES"] = os.getenv("DISCOVER_EXCLUDE_FAVORITES", "0") == "1"
+
+# Estatísticas: intervalo (segundos) da reconciliação em segundo plano
+# (0 = desligada; use `flask reconcile-stats` num agendador)
+app.config["STATS_RECONCILE_INTERVAL"] = int(os.getenv("STATS_RECONCILE_INTERVAL", "0"))
+app.config["STATS_FAVORITE_DAYS"] = int(os.getenv("STATS_FAVORITE_DAYS", "14"))
+
+# Recomendações: vizinhos guardados por música e quantas mostrar na home
+app.config["RECS_TOP_K"] = int(os.getenv("RECS_TOP_K", "20"))
+app.config["RECS_SIZE"] = int(os.getenv("RECS_SIZE", "10"))
+app.config["RECS_BLOCK_ITEMS"] = int(os.getenv("RECS_BLOCK_ITEMS", "4096"))
+
+# "Em alta": tamanho das paradas em memória e quantas músicas na home
+app.config["CHARTS_TOP_K"] = int(os.getenv("CHARTS_TOP_K", "50"))
+app.config["CHARTS_HOME_SIZE"] = int(os.getenv("CHARTS_HOME_SIZE", "10"))
+
+# Execuções (/api/plays): lote e prazo (ms) da gravação adiada, limite da
+# fila por processo, intervalo (s) do rollup por hora (0 = desligado; use
+# `flask rollup-plays`), dias guardando as execuções brutas já somadas e
+# "Tocadas recentemente" na home
+app.config["PLAYS_BATCH_SIZE"] = int(os.getenv("PLAYS_BATCH_SIZE", "1000"))
+app.config["PLAYS_FLUSH_MS"] = int(os.getenv("PLAYS_FLUSH_MS", "250"))
+app.config["PLAYS_MAX_PENDING"] = int(os.getenv("PLAYS_MAX_PENDING", "50000"))
+app.config["PLAYS_ROLLUP_INTERVAL"] = int(os.getenv("PLAYS_ROLLUP_INTERVAL", "30"))
+app.config["PLAYS_RETENTION_DAYS"] = int(os.getenv("PLAYS_RETENTION_DAYS", "30"))
+app.config["RECENT_PLAYS_SIZE"] = int(os.getenv("RECENT_PLAYS_SIZE", "10"))
+app.config["RECENT_PLAYS_DAYS"] = int(os.getenv("RECENT_PLAYS_DAYS", "14"))
+
+# Capas: cache local (originais + miniaturas) servido por /cover/<id>
+app.config["COVER_CACHE_DIR"] = os.getenv(
+    "COVER_CACHE_DIR", os.path.join(app.instance_path, "covers")
+)
+app.config["COVER_ALLOW_PRIVATE"] = os.getenv("COVER_ALLOW_PRIVATE", "0") == "1"
+
+# Cache de fragmentos da home: LRU em memória (bytes) ou Redis compartilhado
+app.config["FRAGMENT_CACHE_URL"] = os.getenv("FRAGMENT_CACHE_URL")
+app.config["FRAGMENT_CACHE_BYTES"] = int(os.getenv("FRAGMENT_CACHE_BYTES", str(32 * 2**20)))
+app.config["FRAGMENT_CACHE_TTL"] = int(os.getenv("FRAGMENT_CACHE_TTL", "300"))
+
+# Estáticos com hash no nome (gerados por `flask build-assets`); sem o
+# manifest, url_for('static', ...) continua servindo static/ direto
+asset_manifest = assets.Manifest.load(app.static_folder)
+
+cover_store = CoverStore(
+    app.config["COVER_CACHE_DIR"],
+    fetcher=UrlFetcher(allow_private=app.config["COVER_ALLOW_PRIVATE"]),
+)
+
+# Instrumentação: SQL/templates por request (Server-Timing), consultas
+# lentas e provável N+1 no logger "harmonic.sql" (e em arquivo, se definido)
+app.config["SLOW_QUERY_MS"] = float(os.getenv("SLOW_QUERY_MS", "100"))
+app.config["SLOW_QUERY_LOG"] = os.getenv("SLOW_QUERY_LOG")
+app.config["N_PLUS_ONE_THRESHOLD"] = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+request_metrics = RequestMetrics(
+    slow_query_ms=app.config["SLOW_QUERY_MS"],
+    n_plus_one_threshold=app.config["N_PLUS_ONE_THRESHOLD"],
+)
+request_metrics.init_app(app)
+
+if app.config["SLOW_QUERY_LOG"]:
+    _slow_log = logging.FileHandler(app.config["SLOW_QUERY_LOG"], encoding="utf-8")
+    _slow_log.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logging.getLogger("harmonic.sql").addHandler(_slow_log)
+
 # sessão
 app.permanent_session_lifetime = timedelta(days=1)
 
-db = SQLAlchemy(app)
+# Hash de senhas: método do werkzeug (ex.: "scrypt", "scrypt:32768:8:1",
+# "pbkdf2:sha256:600000"), processos do pool (0 = na própria thread) e
+# quantas verificações podem estar em andamento antes de recusar
+app.config["PASSWORD_HASH_METHOD"] = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+app.config["PASSWORD_HASH_MAX_PENDING"] = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+password_hasher = PasswordHasher(
+    method=app.config["PASSWORD_HASH_METHOD"],
+    workers=app.config["PASSWORD_HASH_WORKERS"],
+    max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+)
+
+replica_router = ReplicaRouter(
+    app.config["SQLALCHEMY_BINDS"],
+    window=app.config["READ_YOUR_WRITES_SECONDS"],
+    check_interval=app.config["REPLICA_CHECK_INTERVAL"],
+    # réplica atrasada no esquema não entra no rodízio
+    check=lambda engine: schema_migrator.current(engine) == schema_migrator.head,
+)
+
+db = SQLAlchemy(app, session_options={"class_": RoutingSession, "router": replica_router})
+
+with app.app_context():
+    replica_router.attach(db.engines)
 
 
 # -----------------------------
@@ -92,10 +252,13 @@ class User(db.Model):
     favorites = db.relationship("Favorite", backref="user", lazy=True)
 
     def set_password(self, raw_password: str):
-        self.password_hash = generate_password_hash(raw_password)
+        self.password_hash = password_hasher.hash(raw_password)
 
     def check_password(self, raw_password: str) -> bool:
-        return check_password_hash(self.password_hash, raw_password)
+        return password_hasher.verify(self.password_hash, raw_password)
+
+    def password_needs_rehash(self) -> bool:
+        return password_hasher.needs_rehash(self.password_hash)
 
 
 class Music(db.Model):
@@ -107,9 +270,24 @@ class Music(db.Model):
     cover_url   = db.Column(db.String(4096))
     artist_name = db.Column(db.String(120))
     artist_id   = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # total de favoritos (desnormalizado; ver bump_favorite_counts)
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     favorited_by = db.relationship("Favorite", backref="music", lazy=True)
 
+    __table_args__ = (
+        # paginação por (genre, title) em /api/musics; o id entra como
+        # chave do índice clusterizado
+        db.Index("ix_musics_genre_title", "genre", "title"),
+        # músicas do artista (home) e remoção em lote de usuários
+        db.Index("ix_musics_artist_id", "artist_id"),
+        # detecção de duplicatas na importação/seed
+        db.Index("ix_musics_title_artist_name", "title", "artist_name"),
+        # carga das paradas "Em alta" (geral e por gênero)
+        db.Index("ix_musics_favorite_count", "favorite_count"),
+        db.Index("ix_musics_genre_favorite_count", "genre", "favorite_count"),
+    )
+
 
 class Favorite(db.Model):
     __tablename__ = "favorites"
@@ -120,7 +298,824 @@ class Favorite(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("user_id", "music_id", name="uq_favorite_user_music"),
+        # join da seção de favoritos e buscas por música (a unique acima só
+        # serve para quem filtra por user_id)
+        db.Index("ix_favorites_music_id", "music_id"),
+    )
+
+
+class MusicNeighbor(db.Model):
+    """
+    Vizinhos pré-calculados de cada música (co-favoritos).
+    A linha com neighbor_id == music_id guarda o total de favoritos dela.
+    """
+    __tablename__ = "music_neighbors"
+
+    music_id    = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    neighbor_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    co_count    = db.Column(db.Integer, nullable=False)
+
+
+class StatCounter(db.Model):
+    """Contadores do painel admin, atualizados junto com as escritas."""
+    __tablename__ = "stat_counters"
+
+    # kind: "total" (users/musics/favorites), "role", "genre", "favorites_day",
+    #       "version" (versão do catálogo, ver touch_catalog) ou "fragment"
+    #       (versões do cache de fragmentos, ver CounterVersions)
+    kind  = db.Column(db.String(20), primary_key=True)
+    key   = db.Column(db.String(80), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class Genre(db.Model):
+    """Gênero canônico (ver genres.py); music_count alimenta as facetas."""
+    __tablename__ = "genres"
+
+    id          = db.Column(db.Integer, primary_key=True)
+    slug        = db.Column(db.String(80), unique=True, nullable=False)
+    name        = db.Column(db.String(80), nullable=False)
+    music_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+
+class MusicGenre(db.Model):
+    """Ligação música <-> gênero (uma música pode ter vários)."""
+    __tablename__ = "music_genres"
+
+    # (genre_id, music_id): a navegação por gênero lê uma faixa da chave
+    genre_id = db.Column(db.Integer, db.ForeignKey("genres.id"), primary_key=True,
+                         autoincrement=False)
+    music_id = db.Column(db.Integer, db.ForeignKey("musics.id"), primary_key=True,
+                         autoincrement=False)
+
+    __table_args__ = (
+        db.Index("ix_music_genres_music_id", "music_id"),
+    )
+
+
+class Play(db.Model):
+    """
+    Uma execução recebida por /api/plays. Só recebe INSERTs em lote; sem
+    chaves estrangeiras, para um lote não falhar por uma música apagada no
+    caminho (o rollup ignora execuções de músicas/usuários que não existem).
+    """
+    __tablename__ = "plays"
+
+    id        = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    user_id   = db.Column(db.Integer, nullable=False)
+    music_id  = db.Column(db.Integer, nullable=False)
+    played_at = db.Column(db.DateTime, nullable=False)    # UTC
+    hour      = db.Column(db.DateTime, nullable=False)    # played_at truncado na hora
+    ms_played = db.Column(db.Integer)
+
+
+class UserPlayHour(db.Model):
+    """Execuções por usuário, música e hora (rollup de plays)."""
+    __tablename__ = "user_play_hours"
+
+    # (user_id, hour): "Tocadas recentemente" lê uma faixa da chave
+    user_id  = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hour     = db.Column(db.DateTime, primary_key=True)
+    music_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    plays    = db.Column(db.Integer, nullable=False)
+    last_played_at = db.Column(db.DateTime, nullable=False)
+
+
+class MusicPlayHour(db.Model):
+    """Execuções por música e hora (rollup de plays)."""
+    __tablename__ = "music_play_hours"
+
+    music_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hour     = db.Column(db.DateTime, primary_key=True)
+    plays    = db.Column(db.Integer, nullable=False)
+
+
+class Playlist(db.Model):
+    """Playlist de um usuário; item_count é mantido junto com os itens."""
+    __tablename__ = "playlists"
+
+    id         = db.Column(db.Integer, primary_key=True)
+    user_id    = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    name       = db.Column(db.String(120), nullable=False)
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        db.Index("ix_playlists_user_id", "user_id"),
+    )
+
+
+class PlaylistItem(db.Model):
+    """
+    Música numa playlist (no máximo uma vez). A ordem vem de ``position``,
+    chave fracionária de positions.py: mover um item altera só a linha dele.
+    """
+    __tablename__ = "playlist_items"
+
+    playlist_id = db.Column(db.Integer, db.ForeignKey("playlists.id"), primary_key=True,
+                            autoincrement=False)
+    music_id    = db.Column(db.Integer, db.ForeignKey("musics.id"), primary_key=True,
+                            autoincrement=False)
+    position    = db.Column(db.String(64), nullable=False)
+
+    __table_args__ = (
+        # páginas (keyset) e vizinhos de um item: faixa de (playlist_id, position)
+        db.Index("ux_playlist_items_position", "playlist_id", "position", unique=True),
+        # remoção em lote de músicas
+        db.Index("ix_playlist_items_music_id", "music_id"),
+    )
+
+
+class AppMeta(db.Model):
+    """Pares chave/valor do próprio app (ex.: impressão digital do bootstrap)."""
+    __tablename__ = "app_meta"
+
+    key   = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.String(128), nullable=False)
+
+
+# contagem exata de favoritos de cada música (subconsulta correlacionada)
+FAVORITE_COUNT_EXACT = (
+    db.select(func.count())
+    .where(Favorite.music_id == Music.id)
+    .scalar_subquery()
+)
+FAVORITE_COUNT_BACKFILL = update(Music).values(favorite_count=FAVORITE_COUNT_EXACT)
+
+
+# -----------------------------
+# Migrações do esquema (flask db-upgrade / db-downgrade)
+# -----------------------------
+# Nunca altere uma migração já publicada: crie a próxima versão. Os
+# índices/colunas novos também vão nos modelos acima (bancos novos).
+BASELINE_TABLES = ["users", "musics", "favorites", "music_neighbors", "stat_counters"]
+
+
+def _baseline_up(ops):
+    ops.create_tables(BASELINE_TABLES)
+
+
+def _baseline_down(ops):
+    ops.drop_tables(BASELINE_TABLES)
+
+
+HOT_LOOKUP_INDEXES = [
+    ("favorites", "ix_favorites_music_id", ["music_id"]),
+    ("musics", "ix_musics_artist_id", ["artist_id"]),
+    ("musics", "ix_musics_title_artist_name", ["title", "artist_name"]),
+]
+
+
+def _hot_indexes_up(ops):
+    for table, name, columns in HOT_LOOKUP_INDEXES:
+        ops.create_index(table, name, columns)
+
+
+def _hot_indexes_down(ops):
+    for table, name, _ in HOT_LOOKUP_INDEXES:
+        ops.drop_index(table, name)
+
+
+FAVORITE_COUNT_INDEXES = [
+    ("musics", "ix_musics_favorite_count", ["favorite_count"]),
+    ("musics", "ix_musics_genre_favorite_count", ["genre", "favorite_count"]),
+]
+
+
+def _favorite_count_up(ops):
+    if ops.add_column("musics", db.Column(
+        "favorite_count", db.Integer, nullable=False, server_default="0"
+    )):
+        ops.conn.execute(FAVORITE_COUNT_BACKFILL)
+    for table, name, columns in FAVORITE_COUNT_INDEXES:
+        ops.create_index(table, name, columns)
+
+
+def _favorite_count_down(ops):
+    for table, name, _ in FAVORITE_COUNT_INDEXES:
+        ops.drop_index(table, name)
+    ops.drop_column("musics", "favorite_count")
+
+
+def _genres_up(ops):
+    ops.create_tables(["genres", "music_genres"])
+    backfill_music_genres(conn=ops.conn)
+
+
+def _genres_down(ops):
+    ops.drop_tables(["music_genres", "genres"])
+
+
+def _app_meta_up(ops):
+    ops.create_tables(["app_meta"])
+
+
+def _app_meta_down(ops):
+    ops.drop_tables(["app_meta"])
+
+
+PLAY_TABLES = ["plays", "user_play_hours", "music_play_hours"]
+
+
+def _plays_up(ops):
+    ops.create_tables(PLAY_TABLES)
+
+
+def _plays_down(ops):
+    ops.drop_tables(PLAY_TABLES)
+
+
+PLAYLIST_TABLES = ["playlists", "playlist_items"]
+
+
+def _playlists_up(ops):
+    ops.create_tables(PLAYLIST_TABLES)
+
+
+def _playlists_down(ops):
+    ops.drop_tables(PLAYLIST_TABLES)
+
+
+schema_migrator = Migrator([
+    Migration(1, "esquema inicial", _baseline_up, _baseline_down),
+    Migration(2, "índices de favorites.music_id, musics.artist_id e (title, artist_name)",
+              _hot_indexes_up, _hot_indexes_down),
+    Migration(3, "musics.favorite_count (paradas Em alta)",
+              _favorite_count_up, _favorite_count_down),
+    Migration(4, "taxonomia de gêneros (genres, music_genres) com backfill",
+              _genres_up, _genres_down),
+    Migration(5, "app_meta (impressão digital do bootstrap)", _app_meta_up, _app_meta_down),
+    Migration(6, "execuções (plays) e rollups por hora", _plays_up, _plays_down),
+    Migration(7, "playlists e itens com posição fracionária", _playlists_up, _playlists_down),
+], db.metadata)
+
+
+def upgrade_schema(target=None, on_step=None):
+    """Aplica as migrações pendentes (num banco vazio, cria tudo)."""
+    return schema_migrator.upgrade(db.engine, target, on_step)
+
+
+# -----------------------------
+# Estatísticas (contadores)
+# -----------------------------
+COUNTER_CHUNK = 200   # chaves por UPDATE (5 parâmetros cada; SQL Server aceita até 2100)
+
+
+def bump_counters(deltas):
+    """
+    Soma ``deltas`` ({(kind, key): n}) nos contadores, na transação atual:
+    um UPDATE com CASE para todas as chaves; só as que ainda não têm linha
+    custam um SELECT e um INSERT a mais. Quem chama faz o commit junto com
+    a escrita que originou a contagem.
+    """
+    deltas = {counter: delta for counter, delta in deltas.items() if delta}
+    for chunk in catalog_import.chunked(list(deltas.items()), COUNTER_CHUNK):
+        chunk = dict(chunk)
+        if _add_to_counters(chunk) == len(chunk):
+            continue
+        existing = set(
+            db.session.query(StatCounter.kind, StatCounter.key).filter(_counter_rows(chunk))
+        )
+        missing = {counter: delta for counter, delta in chunk.items() if counter not in existing}
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(StatCounter), [
+                    {"kind": kind, "key": key, "value": delta}
+                    for (kind, key), delta in missing.items()
+                ])
+        except IntegrityError:
+            # outro request criou alguma das linhas ao mesmo tempo
+            for counter, delta in missing.items():
+                _add_or_create_counter(counter, delta)
+
+
+def _counter_rows(deltas):
+    return or_(*(
+        and_(StatCounter.kind == kind, StatCounter.key == key) for kind, key in deltas
+    ))
+
+
+def _add_to_counters(deltas):
+    """Soma os deltas nas linhas existentes; devolve quantas foram alteradas."""
+    delta = case(
+        *((and_(StatCounter.kind == kind, StatCounter.key == key), n)
+          for (kind, key), n in deltas.items()),
+        else_=0,
+    )
+    result = db.session.execute(
+        update(StatCounter)
+        .where(_counter_rows(deltas))
+        .values(value=StatCounter.value + delta)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _add_or_create_counter(counter, delta):
+    if _add_to_counters({counter: delta}):
+        return
+    kind, key = counter
+    try:
+        with db.session.begin_nested():
+            db.session.add(StatCounter(kind=kind, key=key, value=delta))
+    except IntegrityError:
+        _add_to_counters({counter: delta})
+
+
+def user_counter_deltas(role, sign=1):
+    return {("total", "users"): sign, ("role", role): sign}
+
+
+def music_counter_deltas(genre, sign=1):
+    return {("total", "musics"): sign, ("genre", genre or ""): sign}
+
+
+def favorite_counter_deltas(n=1):
+    deltas = {("total", "favorites"): n}
+    if n > 0:
+        # favoritos por dia contam as adições (não são descontados depois)
+        deltas[("favorites_day", date.today().isoformat())] = n
+    return deltas
+
+
+def _set_catalog_version(now_ms):
+    # versão = instante da última alteração em ms (sempre crescente)
+    result = db.session.execute(
+        update(StatCounter)
+        .where(StatCounter.kind == "version", StatCounter.key == "catalog")
+        .values(value=case(
+            (StatCounter.value < now_ms, now_ms), else_=StatCounter.value + 1
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+def touch_catalog():
+    """
+    Avança a versão do catálogo (ETag/Last-Modified de /api/musics), na
+    transação atual. Chamar em toda escrita em musics.
+    """
+    now_ms = int(time.time() * 1000)
+    if _set_catalog_version(now_ms):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(StatCounter(kind="version", key="catalog", value=now_ms))
+    except IntegrityError:
+        _set_catalog_version(now_ms)
+
+
+def catalog_version():
+    row = db.session.get(StatCounter, ("version", "catalog"))
+    return row.value if row else 0
+
+
+class CounterVersions:
+    """
+    Versões do cache de fragmentos em stat_counters (kind "fragment"): o
+    bump feito num worker vale para todos. Conexão própria (o bump roda
+    depois do commit da escrita) e sempre no primário.
+    """
+
+    def get_versions(self, names):
+        with db.engine.connect() as conn:
+            found = dict(conn.execute(
+                db.select(StatCounter.key, StatCounter.value)
+                .where(StatCounter.kind == "fragment", StatCounter.key.in_(names))
+            ).all())
+        return [found.get(name, 0) for name in names]
+
+    def incr(self, name):
+        row = (StatCounter.kind == "fragment", StatCounter.key == name)
+        add_one = update(StatCounter).where(*row).values(value=StatCounter.value + 1)
+        with db.engine.begin() as conn:
+            if conn.execute(add_one).rowcount:
+                return
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(StatCounter).values(kind="fragment", key=name, value=1))
+            except IntegrityError:
+                # outro worker criou a linha ao mesmo tempo
+                conn.execute(add_one)
+
+
+fragment_cache = FragmentCache(
+    RedisBackend(app.config["FRAGMENT_CACHE_URL"])
+    if app.config["FRAGMENT_CACHE_URL"]
+    else MemoryBackend(app.config["FRAGMENT_CACHE_BYTES"], versions=CounterVersions()),
+    ttl=app.config["FRAGMENT_CACHE_TTL"],
+)
+
+
+def read_admin_stats():
+    """Lê todos os contadores do painel numa única consulta pela chave."""
+    since = (date.today() - timedelta(days=app.config["STATS_FAVORITE_DAYS"])).isoformat()
+    # contadores que voltaram a zero (ex.: gênero sem músicas) não aparecem
+    rows = StatCounter.query.filter(StatCounter.kind != "fragment", StatCounter.value != 0, or_(
+        StatCounter.kind != "favorites_day",
+        StatCounter.key >= since
+    )).all()
+
+    by_kind = {}
+    for row in rows:
+        by_kind.setdefault(row.kind, {})[row.key] = row.value
+    totals = by_kind.get("total", {})
+
+    return {
+        "total_users": totals.get("users", 0),
+        "total_musics": totals.get("musics", 0),
+        "total_favorites": totals.get("favorites", 0),
+        "users_by_role": sorted(by_kind.get("role", {}).items()),
+        "musics_by_genre": sorted(
+            by_kind.get("genre", {}).items(), key=lambda kv: (-kv[1], kv[0])
+        ),
+        "favorites_by_day": sorted(by_kind.get("favorites_day", {}).items(), reverse=True),
+    }
+
+
+def reconcile_stats():
+    """
+    Recalcula os contadores a partir das tabelas base (corrige desvios).
+    Favoritos por dia não são recalculados: a tabela favorites não guarda data.
+    A versão do catálogo (kind "version") e as dos fragmentos ("fragment")
+    também são preservadas.
+    """
+    fresh = Counter()
+    fresh[("total", "users")] = User.query.count()
+    fresh[("total", "musics")] = Music.query.count()
+    fresh[("total", "favorites")] = Favorite.query.count()
+    for role, n in db.session.query(User.role, func.count()).group_by(User.role):
+        fresh[("role", role)] = n
+    for genre, n in db.session.query(Music.genre, func.count()).group_by(Music.genre):
+        fresh[("genre", genre or "")] += n
+
+    StatCounter.query.filter(StatCounter.kind.notin_(("favorites_day", "version", "fragment"))).delete(
+        synchronize_session=False
+    )
+    db.session.add_all(
+        StatCounter(kind=kind, key=key, value=value)
+        for (kind, key), value in fresh.items()
+    )
+    db.session.commit()
+    return fresh
+
+
+def start_periodic(name, interval, job):
+    """Thread em segundo plano que roda ``job()`` a cada ``interval`` s."""
+    def loop():
+        while not stop.wait(interval):
+            with app.app_context():
+                try:
+                    job()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Falha na tarefa %s", name)
+
+    stop = threading.Event()
+    threading.Thread(target=loop, name=name, daemon=True).start()
+    return stop
+
+
+def start_stats_reconciler(interval):
+    """Roda reconcile_stats() a cada ``interval`` s."""
+    return start_periodic("stats-reconciler", interval, reconcile_stats)
+
+
+# -----------------------------
+# Índices em memória do catálogo ("Descobrir" e busca)
+# -----------------------------
+discover_sampler = DiscoverSampler(
+    lambda: [row[0] for row in db.session.query(Music.id)]
+)
+
+def load_search_rows():
+    # contexto próprio: a reconstrução periódica roda fora do request
+    with app.app_context():
+        yield from db.session.query(
+            Music.id, Music.title, Music.artist_name, Music.genre
+        ).yield_per(10000)
+
+
+search_index = SearchIndex(load_search_rows)
+
+
+def load_chart_rows(genre, n):
+    query = db.session.query(Music.id, Music.favorite_count).filter(Music.favorite_count > 0)
+    if genre != ALL_GENRES:
+        query = query.filter(Music.genre == genre)
+    return query.order_by(Music.favorite_count.desc(), Music.id).limit(n).all()
+
+
+def load_chart_tops(n):
+    """Os ``n`` primeiros de cada gênero numa consulta (ROW_NUMBER por gênero)."""
+    rank = func.row_number().over(
+        partition_by=Music.genre,
+        order_by=(Music.favorite_count.desc(), Music.id),
+    ).label("rank")
+    ranked = (
+        db.select(Music.genre, Music.id, Music.favorite_count, rank)
+        .where(Music.favorite_count > 0)
+        .subquery()
+    )
+    return db.session.execute(
+        db.select(ranked.c.genre, ranked.c.id, ranked.c.favorite_count)
+        .where(ranked.c.rank <= n)
+    ).all()
+
+
+charts = Charts(
+    load_chart_tops,
+    load_chart_rows,
+    size=app.config["CHARTS_TOP_K"],
+)
+
+
+@event.listens_for(db.session, "after_flush")
+def _track_music_changes(sess, flush_context):
+    """Anota as músicas criadas/alteradas/removidas; só aplicamos após o commit."""
+    added = sess.info.setdefault("music_added", {})
+    removed = sess.info.setdefault("music_removed", set())
+    for obj in list(sess.new) + list(sess.dirty):
+        if isinstance(obj, Music):
+            added[obj.id] = (obj.title, obj.artist_name, obj.genre)
+            if obj in sess.dirty:
+                sess.info["music_edited"] = True
+    for obj in sess.deleted:
+        if isinstance(obj, Music):
+            removed.add(obj.id)
+            added.pop(obj.id, None)
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_music_changes(sess):
+    for music_id, fields in sess.info.pop("music_added", {}).items():
+        discover_sampler.add(music_id)
+        search_index.add(music_id, *fields)
+    removed = sess.info.pop("music_removed", ())
+    for music_id in removed:
+        discover_sampler.remove(music_id)
+        search_index.remove(music_id)
+    if removed or sess.info.pop("music_edited", False):
+        # músicas já exibidas em fragmentos mudaram
+        fragment_cache.bump("catalog")
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_music_changes(sess):
+    sess.info.pop("music_added", None)
+    sess.info.pop("music_removed", None)
+    sess.info.pop("music_edited", None)
+
+
+# -----------------------------
+# Disponibilidade de e-mail/CPF/nickname (formulários)
+# -----------------------------
+availability_index = AvailabilityIndex(
+    lambda: db.session.query(User.id, User.email, User.cpf, User.nickname).yield_per(10000)
+)
+
+
+@event.listens_for(db.session, "after_flush")
+def _track_user_changes(sess, flush_context):
+    changed = sess.info.setdefault("users_changed", {})
+    for obj in list(sess.new) + list(sess.dirty):
+        if isinstance(obj, User):
+            changed[obj.id] = (obj.email, obj.cpf, obj.nickname)
+    for obj in sess.deleted:
+        if isinstance(obj, User):
+            changed[obj.id] = None
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_user_changes(sess):
+    for user_id, keys in sess.info.pop("users_changed", {}).items():
+        if keys is None:
+            availability_index.remove_user(user_id)
+        else:
+            availability_index.set_user(user_id, *keys)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_user_changes(sess):
+    sess.info.pop("users_changed", None)
+
+
+def taken_fields(user_id=None, **values):
+    """
+    Quais dos campos (email/cpf/nickname) já pertencem a outro usuário,
+    numa única consulta.
+    """
+    columns = {name: getattr(User, name) for name in values}
+    query = db.session.query(*columns.values()).filter(
+        or_(*(col == values[name] for name, col in columns.items()))
+    )
+    if user_id is not None:
+        query = query.filter(User.id != user_id)
+    taken = set()
+    for row in query.limit(len(values)):
+        taken.update(name for name, value in zip(columns, row) if value == values[name])
+    return taken
+
+
+favorite_cache = FavoriteSetCache(
+    lambda user_id: [
+        row[0] for row in
+        db.session.query(Favorite.music_id).filter(Favorite.user_id == user_id)
+    ]
+)
+
+
+recommender = Recommender(
+    lambda: db.session.query(
+        MusicNeighbor.music_id, MusicNeighbor.neighbor_id, MusicNeighbor.co_count
+    ).yield_per(10000),
+    top_k=app.config["RECS_TOP_K"],
+)
+
+
+def bump_favorite_counts(music_ids, delta):
+    """
+    Soma ``delta`` em musics.favorite_count, na transação atual. Devolve
+    (id, gênero, favoritos) já atualizados, para as paradas após o commit.
+    """
+    if not music_ids:
+        return []
+    stmt = (
+        update(Music)
+        .where(Music.id.in_(music_ids))
+        .values(favorite_count=Music.favorite_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+    if db.engine.dialect.update_returning:
+        # SQLite 3.35+ (RETURNING) e SQL Server (OUTPUT): um comando só
+        return db.session.execute(
+            stmt.returning(Music.id, Music.genre, Music.favorite_count)
+        ).all()
+    db.session.execute(stmt)
+    return db.session.query(Music.id, Music.genre, Music.favorite_count).filter(
+        Music.id.in_(music_ids)
+    ).all()
+
+
+def bump_neighbor_counts(user_id, added=(), removed=()):
+    """
+    Grava em music_neighbors, na transação atual, os co-favoritos que mudam
+    com ``added``/``removed`` (já gravados em favorites). Mesmas regras da
+    memória (Recommender.favorite_changed): par novo só entra se a música
+    ainda tiver menos de RECS_TOP_K vizinhos; a reconstrução corrige o resto.
+    """
+    if not added and not removed:
+        return
+    favorites = [
+        row[0] for row in
+        db.session.query(Favorite.music_id).filter(Favorite.user_id == user_id)
+    ]
+    for music_id, others, delta in favorite_pair_changes(favorites, added, removed):
+        _bump_neighbors_of(music_id, others, delta, app.config["RECS_TOP_K"])
+
+
+def _bump_neighbors_of(music_id, others, delta, top_k):
+    n = MusicNeighbor
+    add = {n.co_count: n.co_count + delta}
+
+    # diagonal: total de favoritos da música
+    found = n.query.filter(n.music_id == music_id, n.neighbor_id == music_id).update(
+        add, synchronize_session=False
     )
+    new_rows = []
+    if not found and delta > 0:
+        new_rows.append((music_id, music_id))
+
+    for chunk in catalog_import.chunked(others, BULK_CHUNK_SIZE):
+        n.query.filter(n.music_id == music_id, n.neighbor_id.in_(chunk)).update(
+            add, synchronize_session=False
+        )
+        n.query.filter(n.neighbor_id == music_id, n.music_id.in_(chunk)).update(
+            add, synchronize_session=False
+        )
+        if delta < 0:
+            continue
+        # pares novos nos dois sentidos, enquanto a música tiver espaço
+        sizes = dict(
+            db.session.query(n.music_id, func.count())
+            .filter(n.music_id.in_(chunk), n.neighbor_id != n.music_id)
+            .group_by(n.music_id)
+        )
+        linked = {
+            row[0] for row in
+            db.session.query(n.music_id).filter(n.neighbor_id == music_id, n.music_id.in_(chunk))
+        }
+        new_rows.extend(
+            (other, music_id) for other in chunk
+            if other not in linked and sizes.get(other, 0) < top_k
+        )
+
+    if delta < 0:
+        n.query.filter(
+            or_(n.music_id == music_id, n.neighbor_id == music_id), n.co_count <= 0
+        ).delete(synchronize_session=False)
+        return
+
+    mine = {
+        row[0] for row in
+        db.session.query(n.neighbor_id).filter(n.music_id == music_id, n.neighbor_id != music_id)
+    }
+    room = top_k - len(mine)
+    for other in others:
+        if room <= 0:
+            break
+        if other not in mine:
+            new_rows.append((music_id, other))
+            room -= 1
+
+    if new_rows:
+        db.session.execute(insert(MusicNeighbor), [
+            {"music_id": i, "neighbor_id": j, "co_count": 1} for i, j in new_rows
+        ])
+
+
+def discount_neighbor_pairs(user_ids):
+    """
+    Tira de music_neighbors os pares contados pelos favoritos de
+    ``user_ids`` (o mesmo desconto de bump_neighbor_counts ao desfavoritar,
+    diagonal inclusive), num UPDATE e num DELETE. Chamar antes de apagar
+    esses favoritos; não faz commit.
+    """
+    n = MusicNeighbor
+    mine, other = aliased(Favorite), aliased(Favorite)
+    # quantos desses usuários favoritaram as duas músicas do par (na
+    # diagonal, a própria música)
+    shared = (
+        db.select(func.count())
+        .select_from(mine)
+        .join(other, other.user_id == mine.user_id)
+        .where(
+            mine.user_id.in_(user_ids),
+            mine.music_id == n.music_id,
+            other.music_id == n.neighbor_id,
+        )
+        .scalar_subquery()
+    )
+    theirs = db.session.query(Favorite.music_id).filter(Favorite.user_id.in_(user_ids))
+    n.query.filter(n.music_id.in_(theirs), n.neighbor_id.in_(theirs)).update(
+        {n.co_count: n.co_count - shared}, synchronize_session=False
+    )
+    n.query.filter(n.music_id.in_(theirs), n.co_count <= 0).delete(synchronize_session=False)
+
+
+def rebuild_favorite_counts(chunk_size=10000, on_progress=None):
+    """
+    Recalcula musics.favorite_count a partir de favorites, em faixas de id
+    (um UPDATE com subconsulta por faixa, um commit por faixa), e recarrega
+    as paradas. Devolve quantas músicas foram percorridas.
+    """
+    low, high = db.session.query(func.min(Music.id), func.max(Music.id)).one()
+    total = 0
+    if low is not None:
+        for start in range(low, high + 1, chunk_size):
+            result = db.session.execute(
+                FAVORITE_COUNT_BACKFILL
+                .where(Music.id.between(start, start + chunk_size - 1))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            total += result.rowcount
+            if on_progress:
+                on_progress(total)
+    charts.reload()
+    return total
+
+
+def favorites_committed(user_id, added=(), removed=(), counts=()):
+    """
+    Propaga uma escrita em favorites (já confirmada) para os caches.
+    ``counts`` são as linhas devolvidas por bump_favorite_counts.
+    """
+    favorite_cache.update(user_id, added=added, removed=removed)
+    charts.update(counts)
+    if not added and not removed:
+        return
+    fragment_cache.bump(f"favorites:{user_id}")
+
+    # os mesmos deltas que bump_neighbor_counts gravou em music_neighbors
+    for music_id, others, delta in favorite_pair_changes(
+        favorite_cache.get(user_id), added, removed
+    ):
+        recommender.favorite_changed(music_id, others, delta)
+
+
+def musics_by_ids(ids):
+    """Busca as músicas pela chave primária, mantendo a ordem de ``ids``."""
+    if not ids:
+        return []
+    by_id = {m.id: m for m in Music.query.filter(Music.id.in_(ids))}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def pick_discover_tracks(k, exclude=None):
+    """Sorteia ``k`` músicas e busca só essas linhas pela chave primária."""
+    return musics_by_ids(discover_sampler.sample(k, exclude=exclude))
+
 
 # -----------------------------
 # Músicas padrão (seed)
@@ -205,56 +1200,221 @@ def get_or_create_seed_artist():
         # Senha qualquer (não será usada na prática)
         artist.set_password("seed1234")
         db.session.add(artist)
+        bump_counters(user_counter_deltas(artist.role))
         db.session.commit()
     return artist
 
 def seed_default_musics():
     """
     Garante que as músicas padrão existam no banco.
-    Se alguma já existir (mesmo título para esse artista técnico), não duplica.
+    Se alguma já existir (mesmo título e artista), não duplica.
     """
     artist = get_or_create_seed_artist()
+    rows = (
+        catalog_import.clean_record(i, track)
+        for i, track in enumerate(SEED_TRACKS, start=1)
+    )
+    return import_catalog(rows, artist.id)
 
-    for track in SEED_TRACKS:
-        title       = track["title"]
-        genre       = track.get("genre")
-        cover_url   = track.get("cover_url")
-        artist_name = track.get("artist_name")
 
-        # Verifica se essa música já existe para esse artista técnico
-        existing = Music.query.filter_by(
-            title=title,
-            artist_name=artist_name
-        ).first()
+# -----------------------------
+# Importação de catálogo em lote
+# -----------------------------
+IMPORT_CHUNK_SIZE = 1000
 
-        if existing:
-            continue
 
-        m = Music(
-            title       = title,
-            genre       = genre,
-            cover_url   = track.get("cover_url") or None,
-            artist_name = track.get("artist_name") or None,
-            artist_id   = artist.id
+def import_catalog(rows, artist_id, chunk_size=IMPORT_CHUNK_SIZE, on_progress=None):
+    """
+    Insere as músicas de ``rows`` (dicts já validados) em lotes.
+
+    Para cada lote: uma consulta para achar os pares (title, artist_name)
+    que já existem, um INSERT em lote (executemany) e um commit. Nada além
+    do lote atual fica em memória. Devolve (inseridas, ignoradas).
+    """
+    inserted = skipped = 0
+
+    for chunk in catalog_import.chunked(rows, chunk_size):
+        titles = {row["title"] for row in chunk}
+        existing = set(
+            db.session.query(Music.title, Music.artist_name)
+            .filter(Music.title.in_(titles))
         )
-        db.session.add(m)
 
-    db.session.commit()
+        new_rows = []
+        deltas = Counter()
+        for row in chunk:
+            pair = (row["title"], row["artist_name"])
+            if pair in existing:
+                skipped += 1
+                continue
+            existing.add(pair)   # evita duplicar dentro do próprio lote
+            new_rows.append(dict(row, artist_id=artist_id))
+            deltas.update(music_counter_deltas(row["genre"]))
+
+        if new_rows:
+            created = db.session.execute(
+                insert(Music).returning(Music.id, Music.genre, sort_by_parameter_order=True),
+                new_rows,
+            ).all()
+            link_music_genres(db.session, created)
+            bump_counters(deltas)
+            touch_catalog()
+        db.session.commit()
+        inserted += len(new_rows)
+
+        if on_progress:
+            on_progress(inserted, skipped)
+
+    if inserted:
+        # INSERT em lote não passa pelos eventos do ORM
+        discover_sampler.invalidate()
+        search_index.invalidate()
+        fragment_cache.bump(f"uploads:{artist_id}")
+    return inserted, skipped
+
+
+# -----------------------------
+# Gêneros (taxonomia e facetas)
+# -----------------------------
+# As funções recebem ``conn`` (db.session ou uma Connection, no caso das
+# migrações) e não fazem commit.
+def ensure_genres(conn, pairs):
+    """{slug: id} dos gêneros ``pairs`` [(slug, nome)], criando os que faltam."""
+    wanted = dict(pairs)
+    if not wanted:
+        return {}
+
+    def known():
+        return dict(conn.execute(
+            db.select(Genre.slug, Genre.id).where(Genre.slug.in_(list(wanted)))
+        ).all())
+
+    ids = known()
+    missing = [{"slug": slug, "name": name} for slug, name in wanted.items() if slug not in ids]
+    if missing:
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(Genre), missing)
+        except IntegrityError:
+            pass    # outro request criou algum ao mesmo tempo
+        ids = known()
+    return ids
+
+
+def bump_genre_counts(conn, deltas):
+    """Soma ``deltas`` ({genre_id: n}) em genres.music_count (um UPDATE por valor)."""
+    by_delta = {}
+    for genre_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(genre_id)
+    for delta, genre_ids in by_delta.items():
+        conn.execute(
+            update(Genre)
+            .where(Genre.id.in_(genre_ids))
+            .values(music_count=Genre.music_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def link_music_genres(conn, musics, count=True):
+    """
+    Liga cada (music_id, texto do gênero) de ``musics`` aos gêneros
+    canônicos. Com ``count``, já soma nas facetas. Devolve as ligações criadas.
+    """
+    parsed = [(music_id, genre_taxonomy.split_genres(raw)) for music_id, raw in musics]
+    ids = ensure_genres(conn, [pair for _, pairs in parsed for pair in pairs])
+    links = [
+        {"genre_id": ids[slug], "music_id": music_id}
+        for music_id, pairs in parsed for slug, _ in pairs
+    ]
+    if links:
+        conn.execute(insert(MusicGenre), links)
+        if count:
+            bump_genre_counts(conn, Counter(link["genre_id"] for link in links))
+    return len(links)
+
+
+GENRE_COUNT_EXACT = (
+    db.select(func.count())
+    .where(MusicGenre.genre_id == Genre.id)
+    .scalar_subquery()
+)
+
+
+def backfill_music_genres(chunk_size=IMPORT_CHUNK_SIZE, conn=None, on_progress=None):
+    """
+    (Re)monta music_genres a partir de musics.genre, em lotes por id, e
+    recalcula as facetas no fim. Sem ``conn`` usa a sessão e faz um commit
+    por lote. Devolve (músicas, ligações).
+    """
+    commit = conn is None
+    conn = db.session if conn is None else conn
+    after = 0
+    musics = links = 0
+    while True:
+        rows = conn.execute(
+            db.select(Music.id, Music.genre)
+            .where(Music.id > after)
+            .order_by(Music.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        after = rows[-1][0]
+        ids = [music_id for music_id, _ in rows]
+        conn.execute(
+            db.delete(MusicGenre)
+            .where(MusicGenre.music_id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        links += link_music_genres(conn, rows, count=False)
+        musics += len(rows)
+        if commit:
+            db.session.commit()
+        if on_progress:
+            on_progress(musics, links)
+
+    conn.execute(
+        update(Genre)
+        .values(music_count=GENRE_COUNT_EXACT)
+        .execution_options(synchronize_session=False)
+    )
+    if commit:
+        db.session.commit()
+    return musics, links
+
+
+def genre_facets():
+    """[(slug, nome, músicas)] dos gêneros com músicas, dos maiores para os menores."""
+    return (
+        db.session.query(Genre.slug, Genre.name, Genre.music_count)
+        .filter(Genre.music_count > 0)
+        .order_by(Genre.music_count.desc(), Genre.name)
+        .all()
+    )
+
+
+ADMIN_EMAIL = "admin@harmonic.com"
+# usuários técnicos (o do seed é dono do catálogo inicial): o admin não
+# altera nem remove, nem um a um nem em lote
+PROTECTED_EMAILS = ("seed@harmonic.com", "harmonic.seed@system.local")
+
 
 def get_or_create_admin_user():
     """Cria o usuário admin padrão se ele não existir."""
-    admin = User.query.filter_by(email="admin@harmonic.com").first()
+    admin = User.query.filter_by(email=ADMIN_EMAIL).first()
     if not admin:
         admin = User(
             first_name="Administrador",
             last_name="Harmonic",
             cpf="00000000000001",  # só pra satisfazer o campo
-            email="admin@harmonic.com",
+            email=ADMIN_EMAIL,
             nickname="admin",
             role="admin"
         )
         admin.set_password("admin123")   # você pode trocar depois
         db.session.add(admin)
+        bump_counters(user_counter_deltas(admin.role))
         db.session.commit()
     return admin
 
@@ -270,6 +1430,67 @@ def inject_user():
     }
 
 
+@app.template_global("url_for")
+def asset_url_for(endpoint, **values):
+    """url_for dos templates: estáticos apontam para a versão com hash."""
+    if endpoint == "static" and asset_manifest is not None:
+        hashed = asset_manifest.lookup(values.get("filename"))
+        if hashed:
+            return url_for("hashed_asset", filename=hashed)
+    return url_for(endpoint, **values)
+
+
+@app.template_global()
+def self_hosted_fonts():
+    """URL do CSS das fontes servido localmente, se foi gerado."""
+    if asset_manifest is not None and asset_manifest.has("fonts/fonts.css"):
+        return url_for("hashed_asset", filename=asset_manifest.lookup("fonts/fonts.css"))
+    return None
+
+
+@app.route("/assets/<path:filename>")
+def hashed_asset(filename):
+    """Serve os arquivos de static/dist (nome com hash, cache "eterno")."""
+    if asset_manifest is None:
+        abort(404)
+    found = asset_manifest.variant(
+        filename,
+        request.headers.get("Accept-Encoding", ""),
+        request.headers.get("Accept", ""),
+    )
+    if found is None:
+        abort(404)
+
+    path, mimetype, encoding = found
+    resp = send_from_directory(
+        asset_manifest.dist_dir, path, mimetype=mimetype, max_age=31536000
+    )
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    resp.vary.add("Accept-Encoding")
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    if filename.endswith(".png"):
+        resp.vary.add("Accept")   # pode ter saído a versão WebP
+    return resp
+
+
+@app.template_global()
+def cover_src(track, size=240):
+    """URL da capa servida pelo cache local (/cover/<id>)."""
+    # v muda quando a cover_url muda, então a resposta pode ser "immutable"
+    version = hashlib.sha1(track.cover_url.encode("utf-8")).hexdigest()[:10]
+    return url_for("cover", music_id=track.id, size=size, v=version)
+
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(exc):
+    # pool de hash cheio: responde rápido em vez de enfileirar
+    db.session.rollback()
+    flash("Servidor ocupado no momento. Tente novamente em instantes.", "error")
+    return redirect(request.referrer or url_for("login"))
+
+
 # -----------------------------
 # Rotas de páginas
 # -----------------------------
@@ -303,6 +1524,14 @@ def login():
             flash("Credenciais inválidas.", "error")
             return redirect(url_for("login"))
 
+        # hash antigo (parâmetros desatualizados): regrava com os atuais
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+                db.session.commit()
+            except HasherBusy:
+                db.session.rollback()
+
         session.permanent = True
         session["user_id"] = user.id
         session["user_name"] = user.nickname
@@ -343,13 +1572,14 @@ def register():
         if user_type not in ("listener", "artist", "admin"):
             user_type = "listener"
 
-        if User.query.filter_by(email=email).first():
+        taken = taken_fields(email=email, cpf=cpf, nickname=nickname)
+        if "email" in taken:
             flash("E-mail já cadastrado.", "error")
             return redirect(url_for("register"))
-        if User.query.filter_by(cpf=cpf).first():
+        if "cpf" in taken:
             flash("CPF já cadastrado.", "error")
             return redirect(url_for("register"))
-        if User.query.filter_by(nickname=nickname).first():
+        if "nickname" in taken:
             flash("Nickname já em uso.", "error")
             return redirect(url_for("register"))
 
@@ -363,7 +1593,14 @@ def register():
         )
         u.set_password(password)
         db.session.add(u)
-        db.session.commit()
+        bump_counters(user_counter_deltas(u.role))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # outro cadastro com os mesmos dados entrou entre a checagem e o commit
+            db.session.rollback()
+            flash("E-mail, CPF ou nickname já cadastrado.", "error")
+            return redirect(url_for("register"))
 
         flash("Cadastro realizado! Faça login.", "success")
         return redirect(url_for("login"))
@@ -441,7 +1678,12 @@ def crud_msc():
             cover_url=cover_url or None
         )
         db.session.add(music)
+        db.session.flush()
+        link_music_genres(db.session, [(music.id, music.genre)])
+        bump_counters(music_counter_deltas(music.genre))
+        touch_catalog()
         db.session.commit()
+        fragment_cache.bump(f"uploads:{user_id}")
 
         flash("Música cadastrada com sucesso!", "success")
         return redirect(url_for("home"))
@@ -471,21 +1713,12 @@ def profile():
             flash("Preencha todos os campos obrigatórios.", "error")
             return redirect(url_for("profile"))
 
-        # Verificar se e-mail já está em uso por outro usuário
-        existing_email = User.query.filter(
-            User.email == email,
-            User.id != user.id
-        ).first()
-        if existing_email:
+        # E-mail e nickname não podem estar em uso por outro usuário
+        taken = taken_fields(user_id=user.id, email=email, nickname=nickname)
+        if "email" in taken:
             flash("Este e-mail já está em uso por outro usuário.", "error")
             return redirect(url_for("profile"))
-
-        # Verificar se nickname já está em uso por outro usuário
-        existing_nick = User.query.filter(
-            User.nickname == nickname,
-            User.id != user.id
-        ).first()
-        if existing_nick:
+        if "nickname" in taken:
             flash("Este nickname já está em uso.", "error")
             return redirect(url_for("profile"))
 
@@ -517,58 +1750,567 @@ def home():
     user_id  = session.get("user_id")
     user_role = session.get("user_role", "listener")
 
-    # 10 músicas "aleatórias" — NEWID() no SQL Server
-    discover_tracks = (
-        Music.query
-        .order_by(func.newid())
-        .limit(10)
-        .all()
+    favorite_ids = frozenset()
+    recommended_tracks = []
+    recent_tracks = []
+
+    if user_id:
+        # estrelas: conjunto em cache (atualizado pelas rotas de favorito)
+        favorite_ids = favorite_cache.get(user_id)
+
+        # "Tocadas recentemente": totais por hora do rollup (não lê plays)
+        recent_tracks = musics_by_ids(recent_plays(user_id, app.config["RECENT_PLAYS_SIZE"]))
+
+        # "Recomendadas para você": vizinhos das músicas favoritas
+        recommended_tracks = musics_by_ids(
+            recommender.recommend(favorite_ids, app.config["RECS_SIZE"])
+        )
+
+    # "Em alta": parada geral mantida em memória (sem GROUP BY em favorites)
+    trending_tracks = musics_by_ids(
+        [music_id for music_id, _ in charts.top(k=app.config["CHARTS_HOME_SIZE"])]
     )
 
-    artist_tracks = []
-    favorite_tracks = []
-    favorite_ids = set()
+    # músicas "aleatórias" sorteadas em memória (sem ORDER BY NEWID())
+    exclude = favorite_ids if app.config["DISCOVER_EXCLUDE_FAVORITES"] else None
+    discover_tracks = pick_discover_tracks(app.config["DISCOVER_SIZE"], exclude)
+
+    # seções que só mudam com escritas do próprio usuário: vêm do cache de
+    # fragmentos e só consultam o banco quando a versão muda
+    owner = user_id or 0
+    artist_section = favorites_section = ""
+
+    if user_id and user_role in ("artist", "admin"):
+        artist_section = fragment_cache.get_or_render(
+            "artist_tracks", owner,
+            [f"uploads:{owner}", f"favorites:{owner}", "catalog"],
+            lambda: render_template(
+                "partials/_artist_tracks.html",
+                artist_tracks=Music.query.filter_by(artist_id=user_id).all(),
+                favorite_ids=favorite_ids,
+            ),
+        )
 
-    if user_id:
-        # músicas desse artista
-        if user_role in ("artist", "admin"):
-            artist_tracks = Music.query.filter_by(artist_id=user_id).all()
-
-        # músicas favoritas do usuário logado
-        favorite_tracks = (
-            Music.query
-            .join(Favorite, Favorite.music_id == Music.id)
-            .filter(Favorite.user_id == user_id)
-            .all()
+    def render_favorites():
+        favorite_tracks = []
+        if user_id:
+            favorite_tracks = (
+                Music.query
+                .join(Favorite, Favorite.music_id == Music.id)
+                .filter(Favorite.user_id == user_id)
+                .all()
+            )
+        return render_template(
+            "partials/_favorites.html",
+            favorite_tracks=favorite_tracks,
+            favorite_ids=favorite_ids,
         )
-        favorite_ids = {m.id for m in favorite_tracks}
 
-    admin_users = None
-    admin_uploads = None
+    favorites_section = fragment_cache.get_or_render(
+        "favorites", owner, [f"favorites:{owner}", "catalog"], render_favorites
+    )
+
+    # o painel admin é HTML fixo (as tabelas de usuários/uploads são
+    # carregadas sob demanda pelas rotas /admin/api/*); as estatísticas vêm
+    # dos contadores
     admin_stats = None
 
-    if session.get("user_role") == "admin":
-        admin_users = User.query.all()
-        admin_uploads = Music.query.all()
-        admin_stats = {
-            "total_users": User.query.count(),
-            "total_musics": Music.query.count(),
-            "total_favorites": Favorite.query.count(),
-        }
+    if user_role == "admin":
+        admin_stats = read_admin_stats()
 
     return render_template(
         "home.html",
         discover_tracks=discover_tracks,
-        artist_tracks=artist_tracks,
-        favorite_tracks=favorite_tracks,
+        trending_tracks=trending_tracks,
+        recent_tracks=recent_tracks,
+        recommended_tracks=recommended_tracks,
         favorite_ids=favorite_ids,
+        artist_section=Markup(artist_section),
+        favorites_section=Markup(favorites_section),
 
         # dados do admin
-        admin_users=admin_users,
-        admin_uploads=admin_uploads,
         admin_stats=admin_stats
     )
 
+
+@app.route("/api/availability")
+def api_availability():
+    """
+    Checagem ao digitar nos formulários: ?email=...&cpf=...&nickname=...
+    Responde pelo índice em memória; logado, os próprios dados contam como livres.
+    """
+    result = {}
+    for field in ("email", "cpf", "nickname"):
+        value = request.args.get(field, "").strip()
+        if value:
+            result[field] = availability_index.is_available(
+                field, value, user_id=session.get("user_id")
+            )
+    if not result:
+        return jsonify(error="Informe email, cpf ou nickname."), 400
+    return jsonify(available=result)
+
+
+@app.route("/admin/api/cache-stats")
+def admin_api_cache_stats():
+    """Taxas de acerto dos caches em memória (para monitoramento)."""
+    if session.get("user_role") != "admin":
+        return jsonify(error="Acesso restrito a administradores."), 403
+
+    return jsonify(
+        fragments=fragment_cache.stats(),
+        favorite_sets={"hits": favorite_cache.hits, "misses": favorite_cache.misses},
+        plays=play_buffer.stats(),
+        replicas=replica_router.stats(),
+    )
+
+
+@app.route("/admin/metrics")
+def admin_metrics():
+    """Histogramas por endpoint no formato texto do Prometheus."""
+    if session.get("user_role") != "admin":
+        return jsonify(error="Acesso restrito a administradores."), 403
+
+    return app.response_class(
+        request_metrics.render_prometheus(),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+# -----------------------------
+# Capas (proxy com cache local)
+# -----------------------------
+@app.route("/cover/<int:music_id>")
+def cover(music_id):
+    cover_url = db.session.query(Music.cover_url).filter(Music.id == music_id).scalar()
+    if not cover_url:
+        abort(404)
+
+    size = request.args.get("size", type=int)
+    fmt = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpeg"
+    try:
+        path, mimetype, etag = cover_store.get(cover_url, size, fmt)
+    except CoverFetchError as exc:
+        # sem cópia local: deixa o navegador buscar direto na origem
+        app.logger.warning("Capa da música %s indisponível: %s", music_id, exc)
+        return redirect(cover_url)
+
+    versioned = bool(request.args.get("v"))
+    resp = send_file(
+        path, mimetype=mimetype, etag=etag, conditional=True,
+        max_age=31536000 if versioned else 86400,
+    )
+    resp.cache_control.public = True
+    if versioned:
+        resp.cache_control.immutable = True
+    resp.vary.add("Accept")
+    return resp
+
+
+@app.cli.command("warm-covers")
+def warm_covers_command():
+    """Baixa as capas e gera as miniaturas de todas as músicas."""
+    ok = failed = 0
+    urls = db.session.query(Music.cover_url).filter(Music.cover_url.isnot(None)).distinct()
+    for (url,) in urls.yield_per(1000):
+        try:
+            cover_store.warm(url)
+            ok += 1
+        except CoverFetchError as exc:
+            failed += 1
+            click.echo(f"  {exc}", err=True)
+    print(f"Capas em cache: {ok} ok, {failed} com falha.")
+
+
+# -----------------------------
+# Busca no catálogo
+# -----------------------------
+SEARCH_LIMIT = 20
+SEARCH_LIMIT_MAX = 100
+
+
+def run_search():
+    query = request.args.get("q", "").strip()[:200]
+    limit = min(max(request.args.get("limit", SEARCH_LIMIT, type=int), 1), SEARCH_LIMIT_MAX)
+    hits = search_index.search(query, limit) if query else []
+    return query, hits
+
+
+@app.route("/search")
+def search():
+    query, hits = run_search()
+    tracks = musics_by_ids([music_id for music_id, _ in hits])
+
+    favorite_ids = frozenset()
+    user_id = session.get("user_id")
+    if user_id:
+        favorite_ids = favorite_cache.get(user_id)
+
+    return render_template(
+        "search.html", query=query, tracks=tracks, favorite_ids=favorite_ids
+    )
+
+
+GENRE_PAGE_SIZE = 24
+
+
+@app.route("/genre/<slug>")
+def browse_genre(slug):
+    """Músicas do gênero, das mais novas para as mais antigas (?before=<id>)."""
+    genre = Genre.query.filter_by(slug=slug).first_or_404()
+    before = request.args.get("before", type=int)
+
+    # busca na chave (genre_id, music_id) a partir da última música vista
+    query = db.session.query(MusicGenre.music_id).filter(MusicGenre.genre_id == genre.id)
+    if before:
+        query = query.filter(MusicGenre.music_id < before)
+    ids = [row[0] for row in query.order_by(MusicGenre.music_id.desc()).limit(GENRE_PAGE_SIZE + 1)]
+    has_more = len(ids) > GENRE_PAGE_SIZE
+    ids = ids[:GENRE_PAGE_SIZE]
+
+    favorite_ids = frozenset()
+    user_id = session.get("user_id")
+    if user_id:
+        favorite_ids = favorite_cache.get(user_id)
+
+    return render_template(
+        "genre.html",
+        genre=genre,
+        tracks=musics_by_ids(ids),
+        next_before=ids[-1] if has_more else None,
+        facets=genre_facets(),
+        favorite_ids=favorite_ids,
+    )
+
+
+@app.route("/api/genres")
+def api_genres():
+    """Facetas: gêneros com a quantidade de músicas (contagem pré-calculada)."""
+    return jsonify(genres=[
+        {"slug": slug, "name": name, "musics": n,
+         "url": url_for("browse_genre", slug=slug)}
+        for slug, name, n in genre_facets()
+    ])
+
+
+@app.route("/api/search")
+def api_search():
+    query, hits = run_search()
+    tracks = {m.id: m for m in musics_by_ids([music_id for music_id, _ in hits])}
+    return jsonify(
+        query=query,
+        items=[
+            {
+                "id": music_id,
+                "title": tracks[music_id].title,
+                "artist_name": tracks[music_id].artist_name,
+                "genre": tracks[music_id].genre,
+                "cover_url": tracks[music_id].cover_url,
+                "score": score,
+            }
+            for music_id, score in hits if music_id in tracks
+        ],
+    )
+
+
+# -----------------------------
+# Listagens do admin (paginação por id / keyset)
+# -----------------------------
+ADMIN_PAGE_SIZE = 50
+ADMIN_PAGE_MAX = 200
+
+
+def keyset_args(default=ADMIN_PAGE_SIZE, maximum=ADMIN_PAGE_MAX):
+    """Lê ?after=<id>&limit=<n> da query string."""
+    after = request.args.get("after", 0, type=int)
+    limit = request.args.get("limit", default, type=int)
+    return max(after, 0), min(max(limit, 1), maximum)
+
+
+def keyset_page(rows, limit, to_dict):
+    """Monta a resposta; ``rows`` deve trazer limit + 1 linhas no máximo."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify(
+        items=[to_dict(r) for r in rows],
+        next_after=rows[-1].id if has_more else None,
+    )
+
+
+@app.route("/admin/api/users")
+def admin_api_users():
+    if session.get("user_role") != "admin":
+        return jsonify(error="Acesso restrito a administradores."), 403
+
+    after, limit = keyset_args()
+    rows = (
+        db.session.query(
+            User.id, User.first_name, User.last_name,
+            User.email, User.nickname, User.role
+        )
+        .filter(User.id > after)
+        .order_by(User.id)
+        .limit(limit + 1)
+        .all()
+    )
+    current_id = session.get("user_id")
+
+    return keyset_page(rows, limit, lambda u: {
+        "id": u.id,
+        "first_name": u.first_name,
+        "last_name": u.last_name,
+        "email": u.email,
+        "nickname": u.nickname,
+        "role": u.role,
+        "can_delete": u.email not in PROTECTED_EMAILS and u.id != current_id,
+    })
+
+
+@app.route("/admin/api/uploads")
+def admin_api_uploads():
+    if session.get("user_role") != "admin":
+        return jsonify(error="Acesso restrito a administradores."), 403
+
+    after, limit = keyset_args()
+    # join com o artista na mesma consulta (sem um SELECT por linha)
+    rows = (
+        db.session.query(
+            Music.id, Music.title, Music.artist_name,
+            User.nickname.label("uploader")
+        )
+        .outerjoin(User, User.id == Music.artist_id)
+        .filter(Music.id > after)
+        .order_by(Music.id)
+        .limit(limit + 1)
+        .all()
+    )
+
+    return keyset_page(rows, limit, lambda m: {
+        "id": m.id,
+        "title": m.title,
+        "artist_name": m.artist_name,
+        "uploader": m.uploader,
+    })
+
+
+# -----------------------------
+# Catálogo público (paginação por cursor)
+# -----------------------------
+MUSIC_API_FIELDS = ("id", "title", "genre", "artist_name", "cover_url", "cover", "artist_id")
+MUSIC_API_PAGE_SIZE = 30
+MUSIC_API_PAGE_MAX = 200
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Lista de valores do cursor; ValueError se for inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("cursor inválido") from exc
+    if not isinstance(values, list):
+        raise ValueError("cursor inválido")
+    return values
+
+
+def music_keyset_filter(order, values):
+    """
+    Condição "depois do cursor" para a ordenação pedida. Sem OFFSET: cada
+    página é uma busca no índice a partir da última linha vista.
+    """
+    if order == "id":
+        (after_id,) = values
+        return Music.id > int(after_id)
+
+    genre, title, after_id = values
+    after_title = or_(Music.title > title, and_(Music.title == title, Music.id > int(after_id)))
+    if genre is None:
+        # NULL vem antes no ORDER BY ascendente (SQL Server e SQLite)
+        return or_(Music.genre.isnot(None), and_(Music.genre.is_(None), after_title))
+    return or_(Music.genre > genre, and_(Music.genre == genre, after_title))
+
+
+@app.route("/api/musics")
+def api_musics():
+    """
+    Lista o catálogo: ?order=id|genre&fields=id,title,...&limit=n&cursor=...
+    A resposta traz next_cursor (None na última página).
+    """
+    version = catalog_version()
+    etag = f"catalog-{version}"
+    last_modified = datetime.fromtimestamp(version // 1000, timezone.utc) if version else None
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        resp = app.response_class(status=304)
+        resp.set_etag(etag)
+        return resp
+
+    order = request.args.get("order", "id")
+    if order not in ("id", "genre"):
+        return jsonify(error="order deve ser 'id' ou 'genre'."), 400
+
+    fields = [f for f in request.args.get("fields", "").split(",") if f] or list(MUSIC_API_FIELDS)
+    unknown = set(fields) - set(MUSIC_API_FIELDS)
+    if unknown:
+        return jsonify(error=f"Campos desconhecidos: {', '.join(sorted(unknown))}."), 400
+
+    limit = request.args.get("limit", MUSIC_API_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), MUSIC_API_PAGE_MAX)
+
+    # só as colunas pedidas (+ as que formam o cursor)
+    names = {"id"} | {f for f in fields if f != "cover"}
+    if "cover" in fields:
+        names.add("cover_url")
+    if order == "genre":
+        names |= {"genre", "title"}
+    order_by = [Music.id] if order == "id" else [Music.genre, Music.title, Music.id]
+    query = db.session.query(*(getattr(Music, name) for name in sorted(names)))
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            query = query.filter(music_keyset_filter(order, decode_cursor(cursor)))
+        except (ValueError, TypeError):
+            return jsonify(error="Cursor inválido."), 400
+
+    rows = query.order_by(*order_by).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    def to_dict(row):
+        item = {f: getattr(row, f) for f in fields if f != "cover"}
+        if "cover" in fields:
+            item["cover"] = cover_src(row) if row.cover_url else None
+        return item
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            [last.id] if order == "id" else [last.genre, last.title, last.id]
+        )
+
+    resp = jsonify(items=[to_dict(r) for r in rows], next_cursor=next_cursor)
+    resp.set_etag(etag)
+    resp.last_modified = last_modified
+    # público, mas sempre revalidado (a versão muda com qualquer escrita)
+    resp.cache_control.public = True
+    resp.cache_control.no_cache = True
+    return resp
+
+
+@app.route("/api/charts")
+def api_charts():
+    """Parada "Em alta": ?genre=Pop&limit=n (sem genre: a geral)."""
+    genre = request.args.get("genre", ALL_GENRES).strip()
+    limit = request.args.get("limit", app.config["CHARTS_HOME_SIZE"], type=int)
+    limit = min(max(limit, 1), app.config["CHARTS_TOP_K"])
+
+    genres = charts.genres()
+    if genre != ALL_GENRES and genre not in genres:
+        return jsonify(error="Gênero sem parada.", genres=genres), 404
+
+    top = charts.top(genre, limit)
+    by_id = {m.id: m for m in musics_by_ids([music_id for music_id, _ in top])}
+    items = [
+        {
+            "id": music_id,
+            "title": by_id[music_id].title,
+            "artist_name": by_id[music_id].artist_name,
+            "genre": by_id[music_id].genre,
+            "cover": cover_src(by_id[music_id]) if by_id[music_id].cover_url else None,
+            "favorite_count": count,
+        }
+        for music_id, count in top if music_id in by_id
+    ]
+    resp = jsonify(genre=genre or None, genres=genres, items=items)
+    # a parada muda aos poucos; um pouco de cache no navegador/CDN basta
+    resp.headers["Cache-Control"] = "public, max-age=30"
+    return resp
+
+
+# -----------------------------
+# Exportação em streaming (admin e `flask export`)
+# -----------------------------
+EXPORT_BATCH = 20000        # linhas por consulta (a conexão volta ao pool entre lotes)
+EXPORT_YIELD_PER = 2000     # linhas trazidas do cursor por vez
+
+# tabela: (modelo, colunas públicas, colunas só com sensitive)
+EXPORT_TABLES = {
+    "musics": (Music, ["id", "title", "genre", "artist_name", "artist_id",
+                       "cover_url", "favorite_count"], []),
+    "users": (User, ["id", "first_name", "last_name", "email", "nickname", "role"],
+              ["cpf", "password_hash"]),
+    "favorites": (Favorite, ["id", "user_id", "music_id"], []),
+}
+
+
+def export_rows(table, sensitive=False, after=0, until=None, batch=EXPORT_BATCH):
+    """
+    (colunas, gerador de linhas) da tabela em ordem de id, de ``after``
+    (exclusivo) até ``until``. Cada lote é uma consulta por keyset com cursor
+    no servidor (yield_per); nada de transação longa segurando a tabela.
+    """
+    model, public, private = EXPORT_TABLES[table]
+    names = public + (private if sensitive else [])
+    columns = [getattr(model, name) for name in names]
+
+    def rows():
+        last = after
+        while True:
+            stmt = db.select(*columns).where(model.id > last)
+            if until is not None:
+                stmt = stmt.where(model.id <= until)
+            stmt = stmt.order_by(model.id).limit(batch)
+            n = 0
+            with db.engine.connect() as conn:
+                result = conn.execution_options(yield_per=EXPORT_YIELD_PER).execute(stmt)
+                for row in result:
+                    n += 1
+                    last = row[0]
+                    yield tuple(row)
+            if n < batch:
+                return
+
+    return names, rows()
+
+
+@app.route("/admin/export/<table>.<fmt>")
+def admin_export(table, fmt):
+    """?after=<id>&until=<id>&gzip=1&sensitive=1 (CPF e hash só pedindo)."""
+    if session.get("user_role") != "admin":
+        return jsonify(error="Acesso restrito a administradores."), 403
+    if table not in EXPORT_TABLES or fmt not in exports.CONTENT_TYPES:
+        return jsonify(error="Exportação desconhecida."), 404
+
+    after = request.args.get("after", 0, type=int)
+    until = request.args.get("until", type=int)
+    sensitive = request.args.get("sensitive") == "1"
+    compress = request.args.get("gzip") == "1"
+    if sensitive:
+        app.logger.warning("Exportação de %s com dados sensíveis por %s",
+                           table, session.get("user_name"))
+
+    names, rows = export_rows(table, sensitive, after, until)
+    chunks = exports.encode(fmt, names, rows)
+    filename = f"{table}.{fmt}"
+    mimetype = exports.CONTENT_TYPES[fmt]
+    if compress:
+        chunks = exports.gzip_chunks(chunks)
+        filename += ".gz"
+        mimetype = "application/gzip"
+
+    resp = app.response_class(stream_with_context(chunks), mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Accel-Buffering"] = "no"    # proxy repassa os pedaços na hora
+    return resp
+
+
 @app.route("/admin/update_user", methods=["POST"])
 def admin_update_user():
     if session.get("user_role") != "admin":
@@ -577,16 +2319,21 @@ def admin_update_user():
     user_id = request.form.get("id")
     user = User.query.get_or_404(user_id)
 
-    # impedir alterar seed
-    if user.email == "seed@harmonic.com":
+    # impedir alterar os usuários técnicos
+    if user.email in PROTECTED_EMAILS:
         flash("O usuário seed não pode ser alterado.", "error")
         return redirect(url_for("home"))
 
+    old_role = user.role
+
     user.first_name = request.form.get("first_name")
     user.last_name = request.form.get("last_name")
     user.nickname = request.form.get("nickname")
     user.role = request.form.get("role")
 
+    if user.role != old_role:
+        bump_counters({("role", old_role): -1, ("role", user.role): 1})
+
     db.session.commit()
 
     flash("Usuário atualizado!", "success")
@@ -602,7 +2349,7 @@ def admin_delete_user():
     user = User.query.get_or_404(user_id)
 
     # proteções
-    if user.email == "seed@harmonic.com":
+    if user.email in PROTECTED_EMAILS:
         flash("O usuário seed não pode ser removido!", "error")
         return redirect(url_for("home"))
 
@@ -610,14 +2357,288 @@ def admin_delete_user():
         flash("Você não pode excluir a própria conta!", "error")
         return redirect(url_for("home"))
 
-    Favorite.query.filter_by(user_id=user.id).delete()
-    db.session.delete(user)
+    # mesma remoção em cascata das operações em lote (músicas e favoritos)
+    delete_users([[user.id]])
     db.session.commit()
+    users_bulk_changed(deleted=True)
 
     flash("Usuário removido com sucesso!", "success")
     return redirect(url_for("home"))
 
 
+# -----------------------------
+# Operações em lote do admin (moderação)
+# -----------------------------
+BULK_CHUNK_SIZE = 500   # ids por comando (SQL Server aceita até 2100 parâmetros)
+BULK_FILTER_FIELDS = ("role", "email_suffix", "nickname_prefix", "id_min", "id_max")
+
+
+def _like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _is_int(value):
+    # bool é subclasse de int, mas true/false não são ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _filter_id(criteria, field):
+    if field not in criteria:
+        return None
+    value = criteria[field]
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    if not _is_int(value):
+        raise ValueError(f"{field} deve ser um número inteiro.")
+    return value
+
+
+def selected_user_ids(payload, current_user_id, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Gera os ids escolhidos em lotes de até ``chunk_size``, a partir de
+    {"ids": [...]} ou {"filter": {...}}. O próprio admin e os usuários
+    técnicos nunca entram. ValueError se a seleção for inválida.
+    """
+    base = [User.email.notin_(PROTECTED_EMAILS), User.id != current_user_id]
+
+    if payload.get("ids") is not None:
+        ids = payload["ids"]
+        if not isinstance(ids, list) or not all(_is_int(i) for i in ids):
+            raise ValueError("ids deve ser uma lista de inteiros.")
+        for chunk in catalog_import.chunked(sorted(set(ids)), chunk_size):
+            found = [row[0] for row in db.session.query(User.id).filter(User.id.in_(chunk), *base)]
+            if found:
+                yield found
+        return
+
+    criteria = payload.get("filter")
+    if not isinstance(criteria, dict) or not criteria:
+        raise ValueError("Informe ids ou um filtro.")
+    unknown = set(criteria) - set(BULK_FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Filtros desconhecidos: {', '.join(sorted(unknown))}.")
+    for field in ("role", "email_suffix", "nickname_prefix"):
+        if field in criteria and not isinstance(criteria[field], str):
+            raise ValueError(f"{field} deve ser um texto.")
+    id_min = _filter_id(criteria, "id_min")
+    id_max = _filter_id(criteria, "id_max")
+
+    conditions = list(base)
+    if "role" in criteria:
+        conditions.append(User.role == criteria["role"])
+    if criteria.get("email_suffix"):
+        conditions.append(User.email.like(
+            "%" + _like_escape(criteria["email_suffix"].lower()), escape="\\"
+        ))
+    if criteria.get("nickname_prefix"):
+        conditions.append(User.nickname.like(
+            _like_escape(criteria["nickname_prefix"]) + "%", escape="\\"
+        ))
+    if id_min is not None:
+        conditions.append(User.id >= id_min)
+    if id_max is not None:
+        conditions.append(User.id <= id_max)
+
+    # keyset pelo id: linhas já alteradas/removidas ficam para trás
+    after = 0
+    while True:
+        chunk = [
+            row[0] for row in
+            db.session.query(User.id)
+            .filter(User.id > after, *conditions)
+            .order_by(User.id)
+            .limit(chunk_size)
+        ]
+        if not chunk:
+            return
+        yield chunk
+        after = chunk[-1]
+
+
+def delete_users(id_chunks, dry_run=False):
+    """
+    Remove os usuários com as músicas que enviaram, as playlists deles e
+    todos os favoritos e itens de playlist envolvidos (deles e nas músicas
+    deles), com poucos comandos por lote.
+    Não faz commit. Devolve as quantidades (afetadas ou que seriam).
+    """
+    totals = {"users": 0, "musics": 0, "favorites": 0}
+    for chunk in id_chunks:
+        their_musics = db.session.query(Music.id).filter(Music.artist_id.in_(chunk))
+        favorites = Favorite.query.filter(or_(
+            Favorite.user_id.in_(chunk),
+            Favorite.music_id.in_(their_musics),
+        ))
+        roles = db.session.query(User.role, func.count()).filter(
+            User.id.in_(chunk)
+        ).group_by(User.role).all()
+        genres = db.session.query(Music.genre, func.count()).filter(
+            Music.artist_id.in_(chunk)
+        ).group_by(Music.genre).all()
+        n_musics = sum(n for _, n in genres)
+
+        if dry_run:
+            n_favorites = favorites.count()
+        else:
+            # desconta os favoritos que esses usuários deram (as músicas
+            # deles saem inteiras logo abaixo)
+            given = (
+                db.select(func.count())
+                .where(Favorite.music_id == Music.id, Favorite.user_id.in_(chunk))
+                .scalar_subquery()
+            )
+            Music.query.filter(Music.id.in_(
+                db.session.query(Favorite.music_id).filter(Favorite.user_id.in_(chunk))
+            )).update({Music.favorite_count: Music.favorite_count - given},
+                      synchronize_session=False)
+            discount_neighbor_pairs(chunk)
+            n_favorites = favorites.delete(synchronize_session=False)
+            MusicNeighbor.query.filter(or_(
+                MusicNeighbor.music_id.in_(their_musics),
+                MusicNeighbor.neighbor_id.in_(their_musics),
+            )).delete(synchronize_session=False)
+            their_links = MusicGenre.music_id.in_(their_musics)
+            bump_genre_counts(db.session, {
+                genre_id: -n for genre_id, n in
+                db.session.query(MusicGenre.genre_id, func.count())
+                .filter(their_links).group_by(MusicGenre.genre_id)
+            })
+            MusicGenre.query.filter(their_links).delete(synchronize_session=False)
+            # itens com as músicas deles (descontados nas playlists de outros
+            # usuários) e as playlists desses usuários
+            their_items = PlaylistItem.music_id.in_(their_musics)
+            removed_items = (
+                db.select(func.count())
+                .where(PlaylistItem.playlist_id == Playlist.id, their_items)
+                .scalar_subquery()
+            )
+            Playlist.query.filter(Playlist.id.in_(
+                db.session.query(PlaylistItem.playlist_id).filter(their_items)
+            )).update({Playlist.item_count: Playlist.item_count - removed_items},
+                      synchronize_session=False)
+            their_playlists = db.session.query(Playlist.id).filter(Playlist.user_id.in_(chunk))
+            PlaylistItem.query.filter(or_(
+                their_items, PlaylistItem.playlist_id.in_(their_playlists),
+            )).delete(synchronize_session=False)
+            Playlist.query.filter(Playlist.user_id.in_(chunk)).delete(synchronize_session=False)
+            # totais de execuções (as execuções brutas o rollup já ignora)
+            UserPlayHour.query.filter(or_(
+                UserPlayHour.user_id.in_(chunk),
+                UserPlayHour.music_id.in_(their_musics),
+            )).delete(synchronize_session=False)
+            MusicPlayHour.query.filter(
+                MusicPlayHour.music_id.in_(their_musics)
+            ).delete(synchronize_session=False)
+            Music.query.filter(Music.artist_id.in_(chunk)).delete(synchronize_session=False)
+            User.query.filter(User.id.in_(chunk)).delete(synchronize_session=False)
+
+            deltas = Counter(favorite_counter_deltas(-n_favorites))
+            for role, n in roles:
+                deltas.update(user_counter_deltas(role, -n))
+            for genre, n in genres:
+                deltas.update(music_counter_deltas(genre, -n))
+            bump_counters(deltas)
+            if n_musics:
+                touch_catalog()
+
+        totals["users"] += sum(n for _, n in roles)
+        totals["musics"] += n_musics
+        totals["favorites"] += n_favorites
+    return totals
+
+
+def set_users_role(id_chunks, role, dry_run=False):
+    """Muda o papel dos usuários (um UPDATE por lote). Não faz commit."""
+    changed = Counter()
+    for chunk in id_chunks:
+        to_change = (User.id.in_(chunk), User.role != role)
+        by_role = db.session.query(User.role, func.count()).filter(*to_change).group_by(User.role).all()
+        if not by_role:
+            continue
+        if not dry_run:
+            User.query.filter(*to_change).update({User.role: role}, synchronize_session=False)
+            deltas = Counter()
+            for old_role, n in by_role:
+                deltas[("role", old_role)] -= n
+                deltas[("role", role)] += n
+            bump_counters(deltas)
+        changed.update(dict(by_role))
+    return {"users": sum(changed.values()), "from_roles": dict(changed)}
+
+
+def users_bulk_changed(deleted):
+    """Após o commit de uma operação em lote: caches que o Core não avisa."""
+    if deleted:
+        # comandos em lote não passam pelos eventos do ORM
+        availability_index.invalidate()
+        favorite_cache.invalidate()
+        discover_sampler.invalidate()
+        search_index.invalidate()
+        recommender.invalidate()
+        charts.invalidate()
+        fragment_cache.bump("catalog")
+
+
+def _bulk_request():
+    if session.get("user_role") != "admin":
+        return None, (jsonify(error="Acesso restrito a administradores."), 403)
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return None, (jsonify(error="Envie um JSON com ids ou filter."), 400)
+    return payload, None
+
+
+@app.route("/admin/api/users/bulk-delete", methods=["POST"])
+def admin_api_bulk_delete():
+    """{"ids": [...]} ou {"filter": {...}}, "dry_run": bool -> quantidades."""
+    payload, error = _bulk_request()
+    if error:
+        return error
+    dry_run = bool(payload.get("dry_run"))
+
+    try:
+        counts = delete_users(
+            selected_user_ids(payload, session.get("user_id")), dry_run=dry_run
+        )
+    except ValueError as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc)), 400
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        users_bulk_changed(deleted=True)
+    return jsonify(dry_run=dry_run, **counts)
+
+
+@app.route("/admin/api/users/bulk-role", methods=["POST"])
+def admin_api_bulk_role():
+    """{"ids": [...]} ou {"filter": {...}}, "role": ..., "dry_run": bool."""
+    payload, error = _bulk_request()
+    if error:
+        return error
+    dry_run = bool(payload.get("dry_run"))
+    role = payload.get("role")
+    if role not in ("listener", "artist", "admin"):
+        return jsonify(error="role deve ser listener, artist ou admin."), 400
+
+    try:
+        counts = set_users_role(
+            selected_user_ids(payload, session.get("user_id")), role, dry_run=dry_run
+        )
+    except ValueError as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc)), 400
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        users_bulk_changed(deleted=False)
+    return jsonify(dry_run=dry_run, role=role, **counts)
+
+
 # -----------------------------
 # Favoritar / desfavoritar
 # -----------------------------
@@ -631,31 +2652,1414 @@ def toggle_favorite(music_id):
     music = Music.query.get_or_404(music_id)
 
     fav = Favorite.query.filter_by(user_id=user_id, music_id=music.id).first()
+    removed = fav is not None
     if fav:
         db.session.delete(fav)
+        bump_counters(favorite_counter_deltas(-1))
         flash("Música removida dos favoritos.", "info")
     else:
         fav = Favorite(user_id=user_id, music_id=music.id)
         db.session.add(fav)
+        bump_counters(favorite_counter_deltas(1))
         flash("Música adicionada aos favoritos.", "success")
+    counts = bump_favorite_counts([music.id], -1 if removed else 1)
+    if removed:
+        bump_neighbor_counts(user_id, removed=[music.id])
+    else:
+        bump_neighbor_counts(user_id, added=[music.id])
 
     db.session.commit()
+    if removed:
+        favorites_committed(user_id, removed=[music.id], counts=counts)
+    else:
+        favorites_committed(user_id, added=[music.id], counts=counts)
     return redirect(url_for("home"))
 
 
+FAVORITE_BATCH_MAX = 500
+
+
+def set_favorites(user_id, music_ids, favorited):
+    """
+    Marca (ou desmarca) várias músicas como favoritas numa transação.
+    Devolve (alteradas, inexistentes).
+    """
+    music_ids = set(music_ids)
+    existing = {
+        row[0] for row in
+        db.session.query(Music.id).filter(Music.id.in_(music_ids))
+    } if music_ids else set()
+    current = {
+        row[0] for row in
+        db.session.query(Favorite.music_id).filter(
+            Favorite.user_id == user_id,
+            Favorite.music_id.in_(existing)
+        )
+    } if existing else set()
+
+    if favorited:
+        changed = existing - current
+        if changed:
+            db.session.execute(
+                insert(Favorite),
+                [{"user_id": user_id, "music_id": m} for m in changed]
+            )
+            bump_counters(favorite_counter_deltas(len(changed)))
+    else:
+        changed = current
+        if changed:
+            Favorite.query.filter(
+                Favorite.user_id == user_id,
+                Favorite.music_id.in_(changed)
+            ).delete(synchronize_session=False)
+            bump_counters(favorite_counter_deltas(-len(changed)))
+    counts = bump_favorite_counts(changed, 1 if favorited else -1)
+    if favorited:
+        bump_neighbor_counts(user_id, added=changed)
+    else:
+        bump_neighbor_counts(user_id, removed=changed)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # clique duplo / outra aba: alguém gravou antes; o estado já é o pedido
+        db.session.rollback()
+        favorite_cache.invalidate(user_id)
+        return set(), music_ids - existing
+
+    if favorited:
+        favorites_committed(user_id, added=changed, counts=counts)
+    else:
+        favorites_committed(user_id, removed=changed, counts=counts)
+    return changed, music_ids - existing
+
+
+def json_object():
+    """Corpo JSON do request: dict ({} sem corpo) ou None se não for um objeto."""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return {}
+    return payload if isinstance(payload, dict) else None
+
+
+@app.route("/api/favorites/<int:music_id>", methods=["POST"])
+def api_toggle_favorite(music_id):
+    """
+    Alterna o favorito sem recarregar a página. Aceita {"favorited": bool}
+    para definir o estado explicitamente.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify(error="Você precisa estar logado para favoritar músicas."), 401
+
+    payload = json_object()
+    if payload is None:
+        return jsonify(error="Envie um objeto JSON."), 400
+    favorited = payload.get("favorited")
+    if favorited is None:
+        favorited = music_id not in favorite_cache.get(user_id)
+
+    _, missing = set_favorites(user_id, [music_id], bool(favorited))
+    if missing:
+        return jsonify(error="Música não encontrada."), 404
+
+    return jsonify(music_id=music_id, favorited=bool(favorited))
+
+
+@app.route("/api/favorites", methods=["GET"])
+def api_favorite_ids():
+    """Ids favoritados pelo usuário logado (estrelas dos cards montados no JS)."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify(ids=[])
+    return jsonify(ids=sorted(favorite_cache.get(user_id)))
+
+
+@app.route("/api/favorites", methods=["POST"])
+def api_batch_favorites():
+    """Define o estado de várias músicas: {"ids": [...], "favorited": bool}."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify(error="Você precisa estar logado para favoritar músicas."), 401
+
+    payload = json_object()
+    if payload is None:
+        return jsonify(error="Envie um objeto JSON."), 400
+    ids = payload.get("ids")
+    favorited = payload.get("favorited", True)
+    if (not isinstance(ids, list) or not ids or len(ids) > FAVORITE_BATCH_MAX
+            or not all(_is_int(i) for i in ids)):
+        return jsonify(error=f"Envie 'ids' com 1 a {FAVORITE_BATCH_MAX} ids."), 400
+
+    changed, missing = set_favorites(user_id, ids, bool(favorited))
+    return jsonify(
+        favorited=bool(favorited),
+        changed=sorted(changed),
+        not_found=sorted(missing),
+    )
+
+
+# -----------------------------
+# Playlists (ordem por chaves fracionárias, ver positions.py)
+# -----------------------------
+PLAYLIST_NAME_MAX = 120
+PLAYLIST_PAGE_SIZE = 100
+PLAYLIST_PAGE_MAX = 500
+PLAYLIST_ADD_MAX = 500
+
+
+def owned_playlist(playlist_id, user_id):
+    """A playlist, se for do usuário (a de outro usuário conta como inexistente)."""
+    return Playlist.query.filter_by(id=playlist_id, user_id=user_id).first()
+
+
+def playlist_page(playlist_id, after=None, limit=PLAYLIST_PAGE_SIZE):
+    """
+    Itens (posição, música) depois da posição ``after``, em ordem, e a
+    posição para pedir a página seguinte (None na última). Cada página é
+    uma busca no índice (playlist_id, position), sem OFFSET.
+    """
+    query = (
+        db.session.query(PlaylistItem.position, Music)
+        .join(Music, Music.id == PlaylistItem.music_id)
+        .filter(PlaylistItem.playlist_id == playlist_id)
+    )
+    if after:
+        query = query.filter(PlaylistItem.position > after)
+    rows = query.order_by(PlaylistItem.position).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, rows[-1].position if has_more else None
+
+
+def _neighbor_position(playlist_id, music_id, after=None, before=None):
+    """Posição vizinha (a seguinte a ``after`` ou a anterior a ``before``), sem contar o próprio item."""
+    query = db.session.query(PlaylistItem.position).filter(
+        PlaylistItem.playlist_id == playlist_id, PlaylistItem.music_id != music_id
+    )
+    if before is not None:
+        query = query.filter(PlaylistItem.position < before).order_by(PlaylistItem.position.desc())
+    else:
+        if after:
+            query = query.filter(PlaylistItem.position > after)
+        query = query.order_by(PlaylistItem.position)
+    return query.limit(1).scalar()
+
+
+def _last_position(playlist_id):
+    """Posição do último item ("" com a playlist vazia)."""
+    return db.session.query(PlaylistItem.position).filter(
+        PlaylistItem.playlist_id == playlist_id
+    ).order_by(PlaylistItem.position.desc()).limit(1).scalar() or ""
+
+
+def _keys_at_end(playlist_id, n, extra=0):
+    """
+    ``n`` chaves para incluir no fim. Se alguma (mais ``extra`` caracteres
+    que o chamador acrescenta) passar de positions.MAX_LENGTH, renumera a
+    playlist antes.
+    """
+    keys = positions.keys_after(_last_position(playlist_id), n)
+    if max(map(len, keys), default=0) + extra > positions.MAX_LENGTH:
+        renumber_playlist(playlist_id)
+        keys = positions.keys_after(_last_position(playlist_id), n)
+    return keys
+
+
+def _bump_item_count(playlist_id, delta):
+    Playlist.query.filter_by(id=playlist_id).update(
+        {Playlist.item_count: Playlist.item_count + delta}, synchronize_session=False
+    )
+
+
+def append_to_playlist(playlist_id, music_ids):
+    """
+    Inclui as músicas no fim, na ordem dada (as que já estão na playlist
+    ficam onde estão). Não faz commit. Devolve (incluídas, inexistentes).
+    """
+    wanted = list(dict.fromkeys(music_ids))
+    existing = {
+        row[0] for row in
+        db.session.query(Music.id).filter(Music.id.in_(wanted))
+    } if wanted else set()
+    present = {
+        row[0] for row in
+        db.session.query(PlaylistItem.music_id).filter(
+            PlaylistItem.playlist_id == playlist_id,
+            PlaylistItem.music_id.in_(existing),
+        )
+    } if existing else set()
+
+    added = [m for m in wanted if m in existing and m not in present]
+    if added:
+        keys = _keys_at_end(playlist_id, len(added))
+        db.session.execute(insert(PlaylistItem), [
+            {"playlist_id": playlist_id, "music_id": m, "position": key}
+            for m, key in zip(added, keys)
+        ])
+        _bump_item_count(playlist_id, len(added))
+    return added, [m for m in wanted if m not in existing]
+
+
+def add_favorites_to_playlist(playlist_id, user_id):
+    """
+    Inclui no fim os favoritos do usuário que ainda não estão na playlist,
+    na ordem em que foram favoritados, num único INSERT ... SELECT (as
+    chaves saem do próprio SQL, ver positions.bulk_key). Não faz commit.
+    Devolve quantos entraram.
+    """
+    # as chaves do lote são prefix + número (BULK_DIGITS) + "1"
+    (prefix,) = _keys_at_end(playlist_id, 1, extra=positions.BULK_DIGITS + 1)
+    number = func.row_number().over(order_by=Favorite.id)
+    already = db.exists().where(
+        PlaylistItem.playlist_id == playlist_id,
+        PlaylistItem.music_id == Favorite.music_id,
+    )
+    rows = (
+        db.select(literal(playlist_id), Favorite.music_id, positions.bulk_key(prefix, number))
+        .where(Favorite.user_id == user_id, ~already)
+    )
+    added = db.session.execute(
+        insert(PlaylistItem).from_select(["playlist_id", "music_id", "position"], rows)
+    ).rowcount
+    if added:
+        _bump_item_count(playlist_id, added)
+    return added
+
+
+def renumber_playlist(playlist_id):
+    """
+    Regrava todas as posições com chaves curtas e espaçadas. Só acontece
+    quando uma chave passa de positions.MAX_LENGTH. Não faz commit.
+    """
+    items = PlaylistItem.__table__
+    ids = [
+        row[0] for row in
+        db.session.query(PlaylistItem.music_id)
+        .filter(PlaylistItem.playlist_id == playlist_id)
+        .order_by(PlaylistItem.position)
+    ]
+    # primeiro chaves provisórias únicas, para a troca não esbarrar na
+    # unique (playlist_id, position)
+    PlaylistItem.query.filter_by(playlist_id=playlist_id).update(
+        {PlaylistItem.position: "~" + cast(PlaylistItem.music_id, db.String)},
+        synchronize_session=False,
+    )
+    db.session.execute(
+        update(items)
+        .where(items.c.playlist_id == bindparam("b_playlist_id"),
+               items.c.music_id == bindparam("b_music_id"))
+        .values(position=bindparam("b_position")),
+        [
+            {"b_playlist_id": playlist_id, "b_music_id": m, "b_position": key}
+            for m, key in zip(ids, positions.spread(len(ids)))
+        ],
+    )
+
+
+def move_playlist_item(playlist_id, music_id, after=None, before=None):
+    """
+    Põe a música logo depois de ``after`` (None: no início) ou logo antes
+    de ``before``. Lê a posição da âncora e a do vizinho dela e grava uma
+    chave entre as duas só no item movido: o custo não depende do tamanho
+    da playlist. Não faz commit. Devolve a nova posição ou None se a música
+    ou a âncora não estiverem na playlist.
+    """
+    anchor = before if before is not None else after
+    if anchor == music_id:
+        return None
+    ids = {music_id} if anchor is None else {music_id, anchor}
+    found = dict(
+        db.session.query(PlaylistItem.music_id, PlaylistItem.position)
+        .filter(PlaylistItem.playlist_id == playlist_id, PlaylistItem.music_id.in_(ids))
+    )
+    if len(found) < len(ids):
+        return None
+
+    if before is not None:
+        high = found[before]
+        low = _neighbor_position(playlist_id, music_id, before=high)
+    else:
+        low = found[after] if after is not None else None
+        high = _neighbor_position(playlist_id, music_id, after=low)
+
+    current = found[music_id]
+    if (low is None or low < current) and (high is None or current < high):
+        return current      # já está no lugar
+    if high is None:
+        key = positions.key_after(low)
+    elif low is None:
+        key = positions.key_before(high)
+    else:
+        key = positions.midpoint(low, high)
+
+    if len(key) > positions.MAX_LENGTH:
+        renumber_playlist(playlist_id)
+        return move_playlist_item(playlist_id, music_id, after=after, before=before)
+
+    PlaylistItem.query.filter_by(playlist_id=playlist_id, music_id=music_id).update(
+        {PlaylistItem.position: key}, synchronize_session=False
+    )
+    return key
+
+
+def remove_from_playlist(playlist_id, music_id):
+    """Tira a música da playlist. Não faz commit. True se ela estava lá."""
+    removed = PlaylistItem.query.filter_by(
+        playlist_id=playlist_id, music_id=music_id
+    ).delete(synchronize_session=False)
+    if removed:
+        _bump_item_count(playlist_id, -removed)
+    return bool(removed)
+
+
+def playlist_item_dict(position, music):
+    return {
+        "id": music.id,
+        "title": music.title,
+        "artist_name": music.artist_name,
+        "cover": cover_src(music) if music.cover_url else None,
+        "position": position,
+    }
+
+
+def _playlist_or_404(playlist_id):
+    playlist = owned_playlist(playlist_id, session["user_id"])
+    if playlist is None:
+        abort(404)
+    return playlist
+
+
+@app.route("/playlists", methods=["GET", "POST"])
+def playlists():
+    user_id = session.get("user_id")
+    if not user_id:
+        flash("Faça login para ver suas playlists.", "error")
+        return redirect(url_for("login"))
+
+    if request.method == "POST":
+        name = request.form.get("name", "").strip()[:PLAYLIST_NAME_MAX]
+        if not name:
+            flash("Dê um nome à playlist.", "error")
+            return redirect(url_for("playlists"))
+        playlist = Playlist(user_id=user_id, name=name)
+        db.session.add(playlist)
+        db.session.commit()
+        flash("Playlist criada!", "success")
+        return redirect(url_for("playlist_view", playlist_id=playlist.id))
+
+    return render_template(
+        "playlists.html",
+        playlists=Playlist.query.filter_by(user_id=user_id).order_by(Playlist.id.desc()).all(),
+    )
+
+
+@app.route("/playlists/<int:playlist_id>")
+def playlist_view(playlist_id):
+    """Primeira página de itens; as seguintes vêm de /api/playlists/<id>/items."""
+    if not session.get("user_id"):
+        flash("Faça login para ver suas playlists.", "error")
+        return redirect(url_for("login"))
+    playlist = _playlist_or_404(playlist_id)
+    items, next_after = playlist_page(playlist.id)
+    return render_template(
+        "playlist.html",
+        playlist=playlist,
+        items=items,
+        next_after=next_after,
+    )
+
+
+@app.route("/playlists/<int:playlist_id>/rename", methods=["POST"])
+def playlist_rename(playlist_id):
+    if not session.get("user_id"):
+        return redirect(url_for("login"))
+    playlist = _playlist_or_404(playlist_id)
+    name = request.form.get("name", "").strip()[:PLAYLIST_NAME_MAX]
+    if not name:
+        flash("Dê um nome à playlist.", "error")
+    else:
+        playlist.name = name
+        db.session.commit()
+        flash("Playlist renomeada.", "success")
+    return redirect(url_for("playlist_view", playlist_id=playlist.id))
+
+
+@app.route("/playlists/<int:playlist_id>/delete", methods=["POST"])
+def playlist_delete(playlist_id):
+    if not session.get("user_id"):
+        return redirect(url_for("login"))
+    playlist = _playlist_or_404(playlist_id)
+    PlaylistItem.query.filter_by(playlist_id=playlist.id).delete(synchronize_session=False)
+    Playlist.query.filter_by(id=playlist.id).delete(synchronize_session=False)
+    db.session.commit()
+    flash("Playlist removida.", "info")
+    return redirect(url_for("playlists"))
+
+
+@app.route("/playlists/<int:playlist_id>/add-favorites", methods=["POST"])
+def playlist_add_favorites(playlist_id):
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("login"))
+    playlist = _playlist_or_404(playlist_id)
+    try:
+        added = add_favorites_to_playlist(playlist.id, user_id)
+        db.session.commit()
+    except IntegrityError:
+        # outra aba incluindo ao mesmo tempo: nada foi gravado
+        db.session.rollback()
+        flash("A playlist mudou enquanto incluíamos; tente de novo.", "error")
+        return redirect(url_for("playlist_view", playlist_id=playlist.id))
+    if added:
+        flash(f"{added} favoritos incluídos na playlist.", "success")
+    else:
+        flash("Todos os seus favoritos já estão na playlist.", "info")
+    return redirect(url_for("playlist_view", playlist_id=playlist.id))
+
+
+def _api_playlist(playlist_id):
+    user_id = session.get("user_id")
+    if not user_id:
+        return None, (jsonify(error="Você precisa estar logado para usar playlists."), 401)
+    playlist = owned_playlist(playlist_id, user_id)
+    if playlist is None:
+        return None, (jsonify(error="Playlist não encontrada."), 404)
+    return playlist, None
+
+
+def _playlist_conflict():
+    db.session.rollback()
+    return jsonify(error="A playlist mudou; recarregue a página."), 409
+
+
+@app.route("/api/playlists/<int:playlist_id>/items", methods=["GET"])
+def api_playlist_items(playlist_id):
+    """Página de itens: ?after=<posição>&limit=n -> items, next_after."""
+    playlist, error = _api_playlist(playlist_id)
+    if error:
+        return error
+    after = request.args.get("after") or None
+    if after is not None:
+        try:
+            positions.validate(after)
+        except ValueError:
+            return jsonify(error="after inválido."), 400
+    limit = request.args.get("limit", PLAYLIST_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), PLAYLIST_PAGE_MAX)
+
+    items, next_after = playlist_page(playlist.id, after, limit)
+    return jsonify(
+        items=[playlist_item_dict(position, music) for position, music in items],
+        next_after=next_after,
+    )
+
+
+@app.route("/api/playlists/<int:playlist_id>/items", methods=["POST"])
+def api_playlist_append(playlist_id):
+    """Inclui músicas no fim: {"ids": [...]}."""
+    playlist, error = _api_playlist(playlist_id)
+    if error:
+        return error
+    payload = json_object()
+    if payload is None:
+        return jsonify(error="Envie um objeto JSON."), 400
+    ids = payload.get("ids")
+    if (not isinstance(ids, list) or not ids or len(ids) > PLAYLIST_ADD_MAX
+            or not all(_is_int(i) for i in ids)):
+        return jsonify(error=f"Envie 'ids' com 1 a {PLAYLIST_ADD_MAX} ids."), 400
+
+    added, missing = append_to_playlist(playlist.id, ids)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        return _playlist_conflict()
+    return jsonify(added=added, not_found=missing)
+
+
+@app.route("/api/playlists/<int:playlist_id>/items/<int:music_id>/move", methods=["POST"])
+def api_playlist_move(playlist_id, music_id):
+    """
+    Move um item: {"after": <music_id> | null} (null: para o início) ou
+    {"before": <music_id>}. Grava só a linha do item movido.
+    """
+    playlist, error = _api_playlist(playlist_id)
+    if error:
+        return error
+    payload = json_object()
+    if payload is None:
+        return jsonify(error="Envie um objeto JSON."), 400
+    after, before = payload.get("after"), payload.get("before")
+    if not all(v is None or _is_int(v) for v in (after, before)):
+        return jsonify(error="after/before devem ser ids de música."), 400
+    if after is not None and before is not None:
+        return jsonify(error="Informe after ou before, não os dois."), 400
+
+    try:
+        position = move_playlist_item(playlist.id, music_id, after=after, before=before)
+        if position is None:
+            return _playlist_conflict()
+        db.session.commit()
+    except IntegrityError:
+        # outra aba gravou a mesma chave entre os mesmos vizinhos
+        return _playlist_conflict()
+    return jsonify(music_id=music_id, position=position)
+
+
+@app.route("/api/playlists/<int:playlist_id>/items/<int:music_id>/remove", methods=["POST"])
+def api_playlist_remove(playlist_id, music_id):
+    playlist, error = _api_playlist(playlist_id)
+    if error:
+        return error
+    removed = remove_from_playlist(playlist.id, music_id)
+    db.session.commit()
+    return jsonify(music_id=music_id, removed=removed)
+
+
 # -----------------------------
-# Inicialização do banco
+# Execuções (plays): ingestão adiada e rollup por hora
 # -----------------------------
+PLAYS_BATCH_MAX = 500       # eventos por request
+PLAY_MAX_AGE = timedelta(days=1)
+PLAY_INSERT_ROWS = 400      # linhas por INSERT (5 colunas × 400 < 2100 parâmetros do SQL Server)
+PLAYS_ROLLUP_KEY = "plays_rollup"
+PLAYS_ROLLUP_CHUNK = 20000  # ids de plays por transação do rollup
+
+
+def utc_now():
+    # DateTime sem fuso no banco: tudo em UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def write_plays(rows):
+    """Grava um lote do buffer numa transação (INSERTs de várias linhas)."""
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for start in range(0, len(rows), PLAY_INSERT_ROWS):
+                conn.execute(insert(Play.__table__).values(rows[start:start + PLAY_INSERT_ROWS]))
+
+
+play_buffer = PlayBuffer(
+    write_plays,
+    batch_size=app.config["PLAYS_BATCH_SIZE"],
+    flush_ms=app.config["PLAYS_FLUSH_MS"],
+    max_pending=app.config["PLAYS_MAX_PENDING"],
+)
+
+
+def _event_int(event, field, required=False):
+    value = event.get(field)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"Informe '{field}' em cada evento.")
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"'{field}' deve ser um número inteiro.")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' deve ser um número inteiro.") from None
+    if value < 0:
+        raise ValueError(f"'{field}' não pode ser negativo.")
+    return value
+
+
+def parse_play_events(payload, user_id, now):
+    """
+    Linhas de plays a partir de um evento ({"music_id", "ms_played",
+    "played_at" em ms desde 1970}), de uma lista deles ou de {"events": [...]}.
+    Devolve (linhas, ignorados): músicas que não existem e eventos com mais
+    de PLAY_MAX_AGE são ignorados. ValueError se o formato for inválido.
+    """
+    events = payload.get("events", [payload]) if isinstance(payload, dict) else payload
+    if not isinstance(events, list) or not 1 <= len(events) <= PLAYS_BATCH_MAX:
+        raise ValueError(f"Envie de 1 a {PLAYS_BATCH_MAX} eventos.")
+
+    rows = []
+    ignored = 0
+    oldest = now - PLAY_MAX_AGE
+    for event in events:
+        if not isinstance(event, dict):
+            raise ValueError("Cada evento deve ser um objeto.")
+        music_id = _event_int(event, "music_id", required=True)
+        ms_played = _event_int(event, "ms_played")
+        played_ms = _event_int(event, "played_at")
+        played_at = now if played_ms is None else min(
+            now, datetime.fromtimestamp(played_ms / 1000, timezone.utc).replace(tzinfo=None)
+        )
+        # existência pelo índice em memória do "Descobrir": sem consulta
+        if played_at < oldest or music_id not in discover_sampler:
+            ignored += 1
+            continue
+        rows.append({
+            "user_id": user_id,
+            "music_id": music_id,
+            "played_at": played_at,
+            "hour": played_at.replace(minute=0, second=0, microsecond=0),
+            "ms_played": ms_played,
+        })
+    return rows, ignored
+
+
+@app.route("/api/plays", methods=["POST"])
+def api_plays():
+    """
+    Registra execuções do usuário logado: um evento, uma lista ou
+    {"events": [...]} em JSON (ou um evento em formulário). Só enfileira:
+    a gravação é em lote, fora do request.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify(error="Você precisa estar logado para registrar execuções."), 401
+
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = request.form.to_dict()
+    try:
+        rows, ignored = parse_play_events(payload, user_id, utc_now())
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    if rows:
+        play_buffer.add(rows)
+    return jsonify(accepted=len(rows), ignored=ignored), 202
+
+
+@app.errorhandler(PlayBufferFull)
+def play_buffer_full(exc):
+    # banco atrasado: recusa na hora, o cliente reenvia depois
+    response = jsonify(error="Servidor ocupado no momento. Reenvie as execuções em instantes.")
+    response.status_code = 503
+    response.headers["Retry-After"] = "5"
+    return response
+
+
+def _merge_hourly(table, key_names, rows, increments):
+    """
+    Soma ``rows`` (dicts com a chave e os valores) em ``table``: um UPDATE
+    em lote (executemany) nas linhas que já existem e INSERTs de várias
+    linhas nas novas. ``increments``: coluna -> expressão do SET, com os
+    valores em bindparam("b_<coluna>").
+    """
+    if not rows:
+        return
+    lead = key_names[0]
+    leads = sorted({row[lead] for row in rows})
+    hours = [row["hour"] for row in rows]
+    existing = set()
+    for start in range(0, len(leads), BULK_CHUNK_SIZE):
+        existing.update(tuple(key) for key in db.session.execute(
+            db.select(*(table.c[name] for name in key_names)).where(
+                table.c[lead].in_(leads[start:start + BULK_CHUNK_SIZE]),
+                table.c.hour.between(min(hours), max(hours)),
+            )
+        ))
+
+    old, new = [], []
+    for row in rows:
+        (old if tuple(row[name] for name in key_names) in existing else new).append(row)
+    if old:
+        db.session.execute(
+            table.update()
+            .where(*(table.c[name] == bindparam(f"b_{name}") for name in key_names))
+            .values(increments),
+            [{f"b_{column}": value for column, value in row.items()} for row in old],
+        )
+    for start in range(0, len(new), PLAY_INSERT_ROWS):
+        db.session.execute(table.insert().values(new[start:start + PLAY_INSERT_ROWS]))
+
+
+def _rollup_range(after, until):
+    """Soma as execuções com id em (after, until]. Não faz commit."""
+    groups = (
+        db.session.query(
+            Play.user_id, Play.music_id, Play.hour,
+            func.count(), func.max(Play.played_at),
+        )
+        # execuções de músicas/usuários removidos ficam de fora
+        .join(Music, Music.id == Play.music_id)
+        .join(User, User.id == Play.user_id)
+        .filter(Play.id > after, Play.id <= until)
+        .group_by(Play.user_id, Play.music_id, Play.hour)
+        .all()
+    )
+    by_music = Counter()
+    for _, music_id, hour, n, _ in groups:
+        by_music[(music_id, hour)] += n
+
+    users = UserPlayHour.__table__
+    _merge_hourly(
+        users, ("user_id", "hour", "music_id"),
+        [{"user_id": u, "hour": h, "music_id": m, "plays": n, "last_played_at": last}
+         for u, m, h, n, last in groups],
+        {
+            "plays": users.c.plays + bindparam("b_plays"),
+            "last_played_at": case(
+                (users.c.last_played_at < bindparam("b_last_played_at"),
+                 bindparam("b_last_played_at")),
+                else_=users.c.last_played_at,
+            ),
+        },
+    )
+    musics = MusicPlayHour.__table__
+    _merge_hourly(
+        musics, ("music_id", "hour"),
+        [{"music_id": m, "hour": h, "plays": n} for (m, h), n in by_music.items()],
+        {"plays": musics.c.plays + bindparam("b_plays")},
+    )
+    return sum(n for *_, n, _ in groups)
+
+
+def _swap_rollup_state(old, new):
+    """Troca o progresso do rollup se ninguém mexeu nele (transação atual)."""
+    if old is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(AppMeta(key=PLAYS_ROLLUP_KEY, value=new))
+            return True
+        except IntegrityError:
+            return False
+    result = db.session.execute(
+        update(AppMeta)
+        .where(AppMeta.key == PLAYS_ROLLUP_KEY, AppMeta.value == old)
+        .values(value=new)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+def rollup_plays(chunk_size=PLAYS_ROLLUP_CHUNK):
+    """
+    Soma as execuções novas em user_play_hours/music_play_hours e apaga as
+    já somadas com mais de PLAYS_RETENTION_DAYS. Devolve quantas foram
+    somadas (None se outro rollup estava rodando).
+
+    O progresso fica em app_meta como "somado:visto". Cada rodada vai só
+    até o maior id visto na rodada anterior: um INSERT que já tinha um id
+    menor reservado terminou desde então, então nada fica para trás por
+    causa de uma transação ainda aberta. A troca do progresso é condicional
+    e bloqueia a linha, e duas rodadas nunca somam o mesmo intervalo.
+    """
+    state = db.session.scalar(db.select(AppMeta.value).where(AppMeta.key == PLAYS_ROLLUP_KEY))
+    done, seen = map(int, state.split(":")) if state else (0, 0)
+    total = 0
+    while True:
+        last = done + chunk_size >= seen
+        upper = seen if last else done + chunk_size
+        newest = (db.session.query(func.max(Play.id)).scalar() or 0) if last else seen
+        new_state = f"{upper}:{max(newest, upper)}"
+        if not _swap_rollup_state(state, new_state):
+            db.session.rollback()
+            return total or None
+        if upper > done:
+            total += _rollup_range(done, upper)
+        db.session.commit()
+        state, done, seen = new_state, upper, newest
+        if last:
+            break
+
+    retention = app.config["PLAYS_RETENTION_DAYS"]
+    if retention:
+        Play.query.filter(
+            Play.id <= done, Play.played_at < utc_now() - timedelta(days=retention)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return total
+
+
+def start_plays_rollup(interval):
+    """Roda rollup_plays() a cada ``interval`` s."""
+    return start_periodic("plays-rollup", interval, rollup_plays)
+
+
+def recent_plays(user_id, k):
+    """Ids das músicas tocadas pelo usuário (segundo o rollup), da mais recente."""
+    since = utc_now() - timedelta(days=app.config["RECENT_PLAYS_DAYS"])
+    last_played = func.max(UserPlayHour.last_played_at)
+    return [
+        row[0] for row in
+        db.session.query(UserPlayHour.music_id, last_played)
+        .filter(UserPlayHour.user_id == user_id, UserPlayHour.hour >= since)
+        .group_by(UserPlayHour.music_id)
+        .order_by(last_played.desc(), UserPlayHour.music_id)
+        .limit(k)
+    ]
+
+
+@app.cli.command("rollup-plays")
+def rollup_plays_command():
+    """Soma as execuções novas nos totais por hora (rode duas vezes para pegar tudo)."""
+    started = time.perf_counter()
+    total = rollup_plays()
+    if total is None:
+        raise click.ClickException("Outro rollup está em andamento.")
+    print(f"{total} execuções somadas em {time.perf_counter() - started:.1f}s.")
+
+
+# -----------------------------
+# Recomendações (co-favoritos)
+# -----------------------------
+def favorite_pairs():
+    return db.session.query(Favorite.user_id, Favorite.music_id).yield_per(50000)
+
+
+def build_recommendations(chunk_size=IMPORT_CHUNK_SIZE):
+    """Recalcula a tabela music_neighbors inteira e recarrega a memória."""
+    counts, neighbors = build_neighbors(
+        favorite_pairs(),
+        top_k=app.config["RECS_TOP_K"],
+        block_items=app.config["RECS_BLOCK_ITEMS"],
+    )
+
+    def rows():
+        for music_id, n in counts.items():
+            yield {"music_id": music_id, "neighbor_id": music_id, "co_count": n}
+        for music_id, row in neighbors.items():
+            for neighbor_id, co_count in row:
+                yield {"music_id": music_id, "neighbor_id": neighbor_id, "co_count": co_count}
+
+    MusicNeighbor.query.delete(synchronize_session=False)
+    total = 0
+    for chunk in catalog_import.chunked(rows(), chunk_size):
+        db.session.execute(insert(MusicNeighbor), chunk)
+        total += len(chunk)
+    db.session.commit()
+
+    recommender.load(counts, neighbors)
+    return len(counts), total
+
+
+@app.cli.command("build-recommendations")
+def build_recommendations_command():
+    """Recalcula os vizinhos de cada música a partir de favorites."""
+    started = time.perf_counter()
+    items, rows = build_recommendations()
+    print(
+        f"Recomendações: {items} músicas, {rows} linhas em music_neighbors "
+        f"({time.perf_counter() - started:.1f}s)."
+    )
+
+
+@app.cli.command("rebuild-charts")
+@click.option("--chunk-size", default=10000, show_default=True,
+              help="Músicas por UPDATE (faixa de ids).")
+def rebuild_charts_command(chunk_size):
+    """Recalcula musics.favorite_count a partir de favorites (paradas Em alta)."""
+    started = time.perf_counter()
+    total = rebuild_favorite_counts(chunk_size)
+    print(f"Contagens de favoritos recalculadas: {total} músicas "
+          f"({time.perf_counter() - started:.1f}s).")
+
+
+@app.cli.command("eval-recommendations")
+@click.option("--users", default=1000, show_default=True,
+              help="Usuários sorteados para a avaliação.")
+@click.option("--k", default=10, show_default=True, help="Tamanho da lista recomendada.")
+@click.option("--seed", default=42, show_default=True)
+def eval_recommendations_command(users, k, seed):
+    """
+    Avaliação offline (leave-one-out): esconde um favorito de cada usuário
+    sorteado, calcula os vizinhos sem ele e mede se ele volta no top-k.
+    """
+    import random
+
+    rng = random.Random(seed)
+    by_user = {}
+    for user_id, music_id in favorite_pairs():
+        by_user.setdefault(user_id, []).append(music_id)
+
+    eligible = [u for u, favs in by_user.items() if len(favs) >= 2]
+    if not eligible:
+        raise click.ClickException("Nenhum usuário com 2 ou mais favoritos.")
+    sample = rng.sample(eligible, min(users, len(eligible)))
+    held_out = {u: rng.choice(by_user[u]) for u in sample}
+
+    train = (
+        (u, m) for u, favs in by_user.items() for m in favs
+        if held_out.get(u) != m
+    )
+    started = time.perf_counter()
+    counts, neighbors = build_neighbors(
+        train, top_k=app.config["RECS_TOP_K"], block_items=app.config["RECS_BLOCK_ITEMS"]
+    )
+    build_seconds = time.perf_counter() - started
+
+    model = Recommender(None, top_k=app.config["RECS_TOP_K"])
+    model.load(counts, neighbors)
+
+    hits = 0
+    recommended = set()
+    started = time.perf_counter()
+    for u in sample:
+        seeds = [m for m in by_user[u] if m != held_out[u]]
+        recs = model.recommend(seeds, k)
+        recommended.update(recs)
+        hits += held_out[u] in recs
+    serve_ms = (time.perf_counter() - started) * 1000 / len(sample)
+
+    total_pairs = sum(len(f) for f in by_user.values())
+    print(f"favoritos: {total_pairs}, usuários avaliados: {len(sample)}")
+    print(f"montagem dos vizinhos: {build_seconds:.2f}s ({len(neighbors)} músicas com vizinhos)")
+    print(f"hit rate@{k}: {hits / len(sample):.3f}")
+    print(f"cobertura do catálogo: {len(recommended) / max(len(counts), 1):.3f}")
+    print(f"tempo por recomendação: {serve_ms:.2f} ms")
+
+
+# -----------------------------
+# Inicialização e servidor de produção
+# -----------------------------
+BOOTSTRAP_KEY = "bootstrap"
+
+
+def bootstrap_fingerprint():
+    """Muda quando os modelos, as migrações ou o seed mudam."""
+    return startup.fingerprint(db.metadata, schema_migrator.head, SEED_TRACKS, ADMIN_EMAIL)
+
+
+def _stored_fingerprint(timer):
+    """
+    Impressão digital gravada no último bootstrap (None se não houver). O
+    banco (SQL Server) só é criado se a conexão com ele falhar.
+    """
+    with timer.step("conexão"):
+        try:
+            conn = db.engine.connect()
+        except DBAPIError:
+            if DATABASE_URL:
+                raise
+            conn = None
+    if conn is None:
+        with timer.step("criação do banco"):
+            ensure_mssql_database()
+        conn = db.engine.connect()
+    with conn:
+        try:
+            return conn.scalar(
+                db.select(AppMeta.value).where(AppMeta.key == BOOTSTRAP_KEY)
+            )
+        except DBAPIError:      # banco vazio ou anterior à migração 5
+            conn.rollback()
+            return None
+
+
+def forget_bootstrap():
+    """Faz o próximo bootstrap rodar por inteiro (ex.: depois de um downgrade)."""
+    with db.engine.begin() as conn:
+        if inspect(conn).has_table(AppMeta.__tablename__):
+            conn.execute(AppMeta.__table__.delete().where(AppMeta.key == BOOTSTRAP_KEY))
+
+
+def bootstrap(force=False):
+    """
+    Prepara banco, admin e seed (mestre do `flask serve` ou dev). Se a
+    impressão digital gravada bate com a atual, nada disso roda: só uma
+    consulta. Devolve o StartupTimer com o tempo de cada etapa.
+    """
+    timer = startup.StartupTimer()
+    wanted = bootstrap_fingerprint()
+    with app.app_context():
+        if not force and _stored_fingerprint(timer) == wanted:
+            for name in ("migrações", "admin", "seed"):
+                timer.skip(name)
+            return timer
+        if force and not DATABASE_URL:
+            with timer.step("criação do banco"):
+                ensure_mssql_database()
+        with timer.step("migrações"):
+            upgrade_schema()
+        with timer.step("admin"):
+            get_or_create_admin_user()
+        with timer.step("seed"):
+            seed_default_musics()
+        db.session.merge(AppMeta(key=BOOTSTRAP_KEY, value=wanted))
+        db.session.commit()
+    return timer
+
+
+def warm_indexes():
+    """Carrega os índices em memória antes do fork (páginas compartilhadas)."""
+    with app.app_context():
+        availability_index.reload()
+        discover_sampler.reload()
+        search_index.rebuild()
+        charts.reload()
+
+
+def after_fork(slot):
+    """Roda em cada processo filho do `flask serve`, logo após o fork."""
+    with app.app_context():
+        for engine in db.engines.values():
+            # conexões abertas pelo mestre não podem ser usadas pelo filho
+            engine.dispose(close=False)
+    password_hasher.after_fork()
+    play_buffer.after_fork()
+    replica_router.after_fork()
+    if slot == 0 and app.config["STATS_RECONCILE_INTERVAL"]:
+        start_stats_reconciler(app.config["STATS_RECONCILE_INTERVAL"])
+    if slot == 0 and app.config["PLAYS_ROLLUP_INTERVAL"]:
+        start_plays_rollup(app.config["PLAYS_ROLLUP_INTERVAL"])
+
+
+def before_worker_exit(slot):
+    """Roda em cada processo filho ao encerrar, depois dos requests em andamento."""
+    play_buffer.close()
+
+
+@app.cli.command("serve")
+@click.option("--host", default=os.getenv("SERVE_HOST", "127.0.0.1"), show_default=True)
+@click.option("--port", default=int(os.getenv("SERVE_PORT", "8000")), show_default=True)
+@click.option("--workers", default=int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 2))),
+              show_default=True, help="Processos (fork).")
+@click.option("--threads", default=int(os.getenv("SERVE_THREADS", "8")),
+              show_default=True, help="Threads por processo.")
+@click.option("--graceful-timeout", default=30, show_default=True,
+              help="Segundos para terminar os requests em andamento ao encerrar/recarregar.")
+def serve_command(host, port, workers, threads, graceful_timeout):
+    """Servidor de produção: N processos × T threads (TERM encerra, HUP recarrega)."""
+    if not hasattr(os, "fork"):
+        raise click.ClickException("`flask serve` precisa de fork (Linux/macOS).")
+    from serving import PreforkServer
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+    timer = bootstrap()
+    with timer.step("índices"):
+        warm_indexes()
+    # nada de conexões ou processos de hash do mestre passando para os filhos
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    password_hasher.shutdown()
+    print(f"Bootstrap em {timer.report()}.")
+
+    PreforkServer(
+        app, host=host, port=port, workers=workers, threads=threads,
+        graceful_timeout=graceful_timeout, post_fork=after_fork,
+        worker_exit=before_worker_exit,
+    ).run()
+
+
+@app.cli.command("bootstrap")
+@click.option("--force", is_flag=True, help="Roda tudo mesmo sem mudanças.")
+def bootstrap_command(force):
+    """Prepara banco, admin e seed (pula se nada mudou) e mostra os tempos."""
+    print(f"Bootstrap em {bootstrap(force).report()}.")
+
+
 @app.cli.command("init-db")
 def init_db():
-    """Cria as tabelas no banco SQL Server."""
-    db.create_all()
-    print("Banco criado com sucesso!")
+    """Cria o banco (SQL Server) e aplica todas as migrações."""
+    if not DATABASE_URL:
+        ensure_mssql_database()
+    upgrade_schema(on_step=_print_migration)
+    print(f"Banco criado com sucesso! (versão {schema_migrator.current(db.engine)})")
+
+
+def _print_migration(direction, migration):
+    arrow = "↑" if direction == "upgrade" else "↓"
+    print(f"  {arrow} {migration.version}: {migration.description}")
+
+
+@app.cli.command("db-upgrade")
+@click.option("--to", "target", type=int, help="Versão final (padrão: a mais recente).")
+def db_upgrade_command(target):
+    """Aplica as migrações pendentes."""
+    done = upgrade_schema(target, on_step=_print_migration)
+    print(f"{len(done)} migrações aplicadas; versão atual: {schema_migrator.current(db.engine)}.")
+
+
+@app.cli.command("db-downgrade")
+@click.option("--to", "target", type=int, required=True,
+              help="Versão final (0 remove todas as tabelas).")
+def db_downgrade_command(target):
+    """Desfaz as migrações acima de --to."""
+    if target == 0:
+        click.confirm("Isso apaga todas as tabelas e os dados. Continuar?", abort=True)
+    done = schema_migrator.downgrade(db.engine, target, on_step=_print_migration)
+    forget_bootstrap()
+    print(f"{len(done)} migrações desfeitas; versão atual: {schema_migrator.current(db.engine)}.")
+
+
+def sync_replicas():
+    """Copia o primário para cada réplica (SQLite: cópia local, para testes)."""
+    for key in replica_router.keys:
+        try:
+            with db.engine.connect() as source, db.engines[key].connect() as target:
+                source.connection.driver_connection.backup(target.connection.driver_connection)
+        except DBAPIError as exc:
+            app.logger.warning("Réplica %s não copiada: %s", key, exc)
+    return replica_router.check_now()
+
+
+@app.cli.command("sync-replicas")
+def sync_replicas_command():
+    """Copia o banco primário para as réplicas (só SQLite, para testes locais)."""
+    if not replica_router.keys:
+        raise click.ClickException("Nenhuma réplica configurada (DATABASE_REPLICA_URLS).")
+    if db.engine.dialect.name != "sqlite":
+        raise click.ClickException("Só para SQLite: fora dele a replicação é do próprio banco.")
+    healthy = sync_replicas()
+    print(f"{len(replica_router.keys)} réplicas copiadas; no rodízio: {', '.join(healthy) or 'nenhuma'}.")
+
+
+@app.cli.command("db-status")
+def db_status_command():
+    """Lista as migrações e quais já foram aplicadas."""
+    for migration, applied in schema_migrator.status(db.engine):
+        print(f"  [{'x' if applied else ' '}] {migration.version}: {migration.description}")
+
+
+def _advisor_sessions():
+    """Um usuário de cada papel, de preferência com dados (favoritos, músicas)."""
+    listener = (
+        db.session.query(User.id, User.nickname, User.role)
+        .join(Favorite, Favorite.user_id == User.id)
+        .filter(User.role == "listener").first()
+        or db.session.query(User.id, User.nickname, User.role)
+        .filter(User.role == "listener").first()
+    )
+    artist = (
+        db.session.query(User.id, User.nickname, User.role)
+        .join(Music, Music.artist_id == User.id).first()
+    )
+    admin = (
+        db.session.query(User.id, User.nickname, User.role)
+        .filter(User.role == "admin").first()
+    )
+    return {"listener": listener, "artist": artist, "admin": admin}
+
+
+# rotas exercitadas pelo index-advisor: (papel logado, caminho)
+ADVISOR_ROUTES = [
+    (None, "/home"),
+    ("listener", "/home"),
+    ("listener", "/api/favorites"),
+    ("artist", "/home"),
+    ("admin", "/home"),
+    ("admin", "/admin/api/users"),
+    ("admin", "/admin/api/users?after=1"),
+    ("admin", "/admin/api/uploads"),
+    ("admin", "/admin/api/uploads?after=1"),
+    (None, "/search?q=a"),
+    (None, "/api/search?q=a"),
+    (None, "/api/musics"),
+    (None, "/api/musics?order=genre"),
+    (None, "/api/availability?email=ninguem@harmonic.com"),
+]
+
+
+@app.cli.command("index-advisor")
+@click.option("--apply", "apply_", is_flag=True, help="Cria os índices sugeridos.")
+@click.option("--verbose", is_flag=True, help="Mostra o plano de cada comando.")
+def index_advisor_command(apply_, verbose):
+    """Roda as rotas principais, explica os comandos SQL e sugere índices."""
+    users = _advisor_sessions()
+    client = app.test_client()
+
+    with index_advisor.capture(db.engine) as captured:
+        for role, path in ADVISOR_ROUTES:
+            user = users.get(role)
+            if role and user is None:
+                continue
+            with client.session_transaction() as sess:
+                sess.clear()
+                if user:
+                    sess.update(user_id=user.id, user_name=user.nickname, user_role=user.role)
+            status = client.get(path).status_code
+            if status >= 400:
+                click.echo(f"  {path} ({role or 'anônimo'}): HTTP {status}", err=True)
+
+    try:
+        report, suggestions = index_advisor.advise(db.engine, captured)
+    except NotImplementedError as exc:
+        raise click.ClickException(str(exc))
+
+    print(f"{len(captured)} formatos de comando capturados em {len(ADVISOR_ROUTES)} rotas.")
+    if verbose:
+        for shape, count, plan in report:
+            print(f"\n{count}× {shape}")
+            for line in plan:
+                print(f"    {line}")
+
+    if not suggestions:
+        print("Nenhum índice faltando.")
+        return
+    print("\nÍndices sugeridos:")
+    for suggestion in suggestions:
+        include = f" INCLUDE ({', '.join(suggestion.include)})" if suggestion.include else ""
+        print(f"  {suggestion.table}({', '.join(suggestion.columns)}){include}  <- {suggestion.reason}")
+        for shape in suggestion.statements[:3]:
+            print(f"      {shape[:160]}")
+    print("\nPara uma migração:")
+    for suggestion in suggestions:
+        print(f"    {suggestion.migration_line()}")
+
+    if apply_:
+        index_advisor.apply(db.engine, db.metadata, suggestions)
+        print(f"{len(suggestions)} índices criados (registre-os numa migração).")
+
+
+@app.cli.command("import-catalog")
+@click.argument("path")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]),
+              help="Formato do arquivo (padrão: pela extensão).")
+@click.option("--chunk-size", default=IMPORT_CHUNK_SIZE, show_default=True,
+              help="Linhas por lote (uma consulta + um INSERT por lote).")
+@click.option("--artist-email", default="harmonic.seed@system.local", show_default=True,
+              help="Usuário dono das músicas importadas.")
+def import_catalog_command(path, fmt, chunk_size, artist_email):
+    """Importa um catálogo CSV/JSONL (use '-' para ler da entrada padrão)."""
+    owner = User.query.filter_by(email=artist_email).first()
+    if owner is None:
+        if artist_email != "harmonic.seed@system.local":
+            raise click.ClickException(f"Usuário {artist_email} não encontrado.")
+        owner = get_or_create_seed_artist()
+
+    try:
+        fmt = catalog_import.detect_format(path, fmt)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+
+    errors = []
+    invalid = 0
+
+    def on_error(exc):
+        nonlocal invalid
+        invalid += 1
+        if len(errors) < 20:
+            errors.append(exc)
+
+    started = time.perf_counter()
+
+    def on_progress(inserted, skipped):
+        elapsed = time.perf_counter() - started
+        rate = (inserted + skipped) / elapsed if elapsed else 0
+        click.echo(f"  {inserted} inseridas, {skipped} já existiam ({rate:,.0f} linhas/s)", err=True)
+
+    with catalog_import.open_source(path) as stream:
+        rows = catalog_import.iter_valid_rows(
+            catalog_import.iter_records(stream, fmt), on_error
+        )
+        inserted, skipped = import_catalog(rows, owner.id, chunk_size, on_progress)
+
+    elapsed = time.perf_counter() - started
+    total = inserted + skipped + invalid
+    for exc in errors:
+        click.echo(f"  inválida: {exc}", err=True)
+    print(
+        f"Importação concluída: {inserted} inseridas, {skipped} duplicadas, "
+        f"{invalid} inválidas em {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} linhas/s)."
+    )
+
+
+@app.cli.command("export")
+@click.argument("table", type=click.Choice(sorted(EXPORT_TABLES)))
+@click.option("--output", "-o", default="-", show_default=True,
+              help="Arquivo de saída ('-' = saída padrão; .gz comprime).")
+@click.option("--format", "fmt", type=click.Choice(sorted(exports.CONTENT_TYPES)),
+              help="Formato (padrão: pela extensão, senão csv).")
+@click.option("--after", default=0, show_default=True, help="Começa depois deste id.")
+@click.option("--until", type=int, help="Para neste id (inclusive).")
+@click.option("--include-sensitive", is_flag=True, help="Inclui CPF e hash de senha (users).")
+@click.option("--resume", is_flag=True,
+              help="Continua um arquivo (sem .gz) a partir do último id gravado.")
+def export_command(table, output, fmt, after, until, include_sensitive, resume):
+    """Exporta musics, users ou favorites em CSV/JSONL, em streaming."""
+    compress = output.endswith(".gz")
+    if fmt is None:
+        try:
+            fmt = catalog_import.detect_format(output[:-3] if compress else output)
+        except ValueError:
+            fmt = "csv"
+
+    header = True
+    if resume:
+        if output == "-" or compress:
+            raise click.ClickException("--resume precisa de um arquivo sem compressão.")
+        if os.path.exists(output):
+            last = exports.last_exported_id(output, fmt)
+            header = last is None and os.path.getsize(output) == 0
+            after = max(after, last or 0)
+            click.echo(f"Retomando depois do id {after}.", err=True)
+
+    names, rows = export_rows(table, include_sensitive, after, until)
+    exported = 0
+    last_id = None
+
+    def counted():
+        nonlocal exported, last_id
+        for row in rows:
+            exported += 1
+            last_id = row[0]
+            yield row
+
+    chunks = exports.encode(fmt, names, counted(), header=header)
+    if compress:
+        chunks = exports.gzip_chunks(chunks)
+
+    started = time.perf_counter()
+    if output == "-":
+        out = click.get_binary_stream("stdout")
+    else:
+        out = open(output, "ab" if resume else "wb")
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if output == "-":
+            out.flush()
+        else:
+            out.close()
+
+    click.echo(
+        f"{exported} linhas de {table} em {time.perf_counter() - started:.1f}s"
+        + (f" (último id {last_id}; continue com --after {last_id})" if last_id else ""),
+        err=True,
+    )
+
+
+@app.cli.command("backfill-genres")
+@click.option("--chunk-size", default=IMPORT_CHUNK_SIZE, show_default=True,
+              help="Músicas por lote (um commit por lote).")
+def backfill_genres_command(chunk_size):
+    """Refaz music_genres a partir de musics.genre e recalcula as facetas."""
+    started = time.perf_counter()
+
+    def on_progress(musics, links):
+        click.echo(f"  {musics} músicas, {links} ligações", err=True)
+
+    musics, links = backfill_music_genres(chunk_size, on_progress=on_progress)
+    print(f"Gêneros: {musics} músicas, {links} ligações, {len(genre_facets())} gêneros "
+          f"({time.perf_counter() - started:.1f}s).")
+
+
+@app.cli.command("build-assets")
+@click.option("--self-host-fonts", is_flag=True,
+              help="Baixa as fontes do Google Fonts e serve localmente.")
+def build_assets_command(self_host_fonts):
+    """Gera static/dist com nomes por hash, .gz/.br e WebP."""
+    files = assets.build(app.static_folder, self_host_fonts=self_host_fonts)
+    for rel_path, entry in sorted(files.items()):
+        extras = [k for k in ("gzip", "br", "webp") if entry.get(k)]
+        print(f"  {rel_path} -> {entry['file']} {' '.join(extras)}")
+    print(f"{len(files)} arquivos em static/dist (reinicie o app para usar o novo manifest).")
+
+
+@app.cli.command("reconcile-stats")
+def reconcile_stats_command():
+    """Recalcula os contadores do painel admin a partir das tabelas."""
+    fresh = reconcile_stats()
+    print(f"Estatísticas reconciliadas ({len(fresh)} contadores).")
 
 
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
-        get_or_create_admin_user()
-        seed_default_musics()
+    # com debug=True o reloader roda este arquivo duas vezes: no processo
+    # que vigia os arquivos e no filho que atende (WERKZEUG_RUN_MAIN); o
+    # bootstrap e as tarefas periódicas só no filho
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        print(f"Bootstrap em {bootstrap().report()}.")
+        if app.config["STATS_RECONCILE_INTERVAL"]:
+            start_stats_reconciler(app.config["STATS_RECONCILE_INTERVAL"])
+        if app.config["PLAYS_ROLLUP_INTERVAL"]:
+            start_plays_rollup(app.config["PLAYS_ROLLUP_INTERVAL"])
+        atexit.register(play_buffer.close)
     app.run(debug=True)
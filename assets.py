@@ -0,0 +1,196 @@
+"""
+Pipeline dos arquivos estáticos (css, js, imagens e, opcionalmente, fontes).
+
+``build()`` copia ``static/`` para ``static/dist/`` com o hash do conteúdo no
+nome (``css/style.3f2a9c1b7d4e.css``), gera variantes .gz e .br dos textos,
+otimiza os PNG, cria uma versão WebP deles e grava um ``manifest.json``.
+Como o nome muda sempre que o conteúdo muda, o navegador pode guardar esses
+arquivos "para sempre" (Cache-Control: immutable).
+
+O app carrega o manifest uma vez na inicialização (``Manifest.load``) e o
+``url_for('static', ...)`` dos templates passa a apontar para a versão com
+hash. Sem manifest (dev), tudo continua servido de ``static/`` normalmente.
+"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import urllib.request
+
+try:
+    import brotli
+except ImportError:   # opcional: sem ele só geramos .gz
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:   # opcional: sem ele os PNG são copiados como estão
+    Image = None
+
+mimetypes.add_type("font/woff2", ".woff2")
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html"}
+
+GOOGLE_FONTS_URL = (
+    "https://fonts.googleapis.com/css2?family=Inter:wght@400;600;800;900&display=swap"
+)
+# o Google devolve woff2 só para navegadores que ele reconhece
+_FONTS_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+_FONT_URL_RE = re.compile(r"url\((https://fonts\.gstatic\.com/[^)]+)\)")
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _hashed_name(rel_path, data, ext=None):
+    stem, orig_ext = os.path.splitext(rel_path)
+    return f"{stem}.{_digest(data)}{ext or orig_ext}".replace(os.sep, "/")
+
+
+def _write(out_dir, rel_path, data):
+    path = os.path.join(out_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _optimize_png(data):
+    """(png otimizado, webp) — ou (data, None) sem Pillow."""
+    if Image is None:
+        return data, None
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        png = io.BytesIO()
+        img.save(png, "PNG", optimize=True)
+        webp = io.BytesIO()
+        img.save(webp, "WEBP", quality=90, method=6)
+    png = png.getvalue()
+    return (png if len(png) < len(data) else data), webp.getvalue()
+
+
+def _add_file(out_dir, files, rel_path, data):
+    rel_path = rel_path.replace(os.sep, "/")
+    ext = os.path.splitext(rel_path)[1].lower()
+    entry = {}
+
+    if ext == ".png":
+        data, webp = _optimize_png(data)
+        if webp and len(webp) < len(data):
+            entry["webp"] = _hashed_name(rel_path, webp, ".webp")
+            _write(out_dir, entry["webp"], webp)
+
+    entry["file"] = _hashed_name(rel_path, data)
+    _write(out_dir, entry["file"], data)
+
+    if ext in COMPRESSIBLE:
+        gz = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(gz) < len(data):
+            entry["gzip"] = True
+            _write(out_dir, entry["file"] + ".gz", gz)
+        if brotli is not None:
+            br = brotli.compress(data, quality=11)
+            if len(br) < len(data):
+                entry["br"] = True
+                _write(out_dir, entry["file"] + ".br", br)
+
+    files[rel_path] = entry
+    return entry
+
+
+def _fetch(url):
+    req = urllib.request.Request(url, headers={"User-Agent": _FONTS_USER_AGENT})
+    with urllib.request.urlopen(req, timeout=15) as resp:
+        return resp.read()
+
+
+def _self_host_fonts(out_dir, files, fonts_url):
+    """Baixa o CSS do Google Fonts e os .woff2 e reescreve as URLs."""
+    css = _fetch(fonts_url).decode("utf-8")
+
+    def replace(match):
+        font = _fetch(match.group(1))
+        entry = _add_file(out_dir, files, f"fonts/{os.path.basename(match.group(1))}", font)
+        # o CSS fica na mesma pasta fonts/, então a URL relativa basta
+        return f"url({os.path.basename(entry['file'])})"
+
+    css = _FONT_URL_RE.sub(replace, css)
+    _add_file(out_dir, files, "fonts/fonts.css", css.encode("utf-8"))
+
+
+def build(static_dir, self_host_fonts=False, fonts_url=GOOGLE_FONTS_URL):
+    """Gera ``static/dist`` e o manifest; devolve o dicionário de arquivos."""
+    out_dir = os.path.join(static_dir, DIST_DIR)
+    files = {}
+
+    for root, dirs, names in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != out_dir]
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                _add_file(out_dir, files, os.path.relpath(path, static_dir), f.read())
+
+    if self_host_fonts:
+        _self_host_fonts(out_dir, files, fonts_url)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump({"files": files}, f, indent=2, sort_keys=True)
+    return files
+
+
+class Manifest:
+    def __init__(self, dist_dir, files):
+        self.dist_dir = dist_dir
+        self.files = files
+        # nome com hash -> entrada, para resolver as requisições
+        self._by_hashed = {}
+        for rel_path, entry in files.items():
+            self._by_hashed[entry["file"]] = (rel_path, entry)
+            if "webp" in entry:
+                self._by_hashed[entry["webp"]] = (entry["webp"], {"file": entry["webp"]})
+
+    @classmethod
+    def load(cls, static_dir):
+        """Lê o manifest gerado por build(); None se não existir."""
+        dist_dir = os.path.join(static_dir, DIST_DIR)
+        try:
+            with open(os.path.join(dist_dir, MANIFEST_NAME), encoding="utf-8") as f:
+                files = json.load(f)["files"]
+        except FileNotFoundError:
+            return None
+        return cls(dist_dir, files)
+
+    def lookup(self, rel_path):
+        entry = self.files.get(rel_path)
+        return entry["file"] if entry else None
+
+    def has(self, rel_path):
+        return rel_path in self.files
+
+    def variant(self, hashed, accept_encoding="", accept=""):
+        """
+        Escolhe o arquivo a servir para ``hashed``.
+        Devolve (arquivo em dist, mimetype, content-encoding) ou None.
+        """
+        found = self._by_hashed.get(hashed)
+        if found is None:
+            return None
+        rel_path, entry = found
+        mimetype = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+
+        if "webp" in entry and "image/webp" in accept:
+            return entry["webp"], "image/webp", None
+        if entry.get("br") and "br" in accept_encoding:
+            return entry["file"] + ".br", mimetype, "br"
+        if entry.get("gzip") and "gzip" in accept_encoding:
+            return entry["file"] + ".gz", mimetype, "gzip"
+        return entry["file"], mimetype, None
@@ -0,0 +1,165 @@
+"""
+Verificação de disponibilidade de e-mail, CPF e nickname.
+
+Os formulários de cadastro e de perfil perguntam "esse e-mail já existe?"
+enquanto o usuário digita. Para não ir ao banco a cada tecla, mantemos em
+memória, por campo:
+
+* um filtro de Bloom: se ele diz "não tem", a chave está livre (caso comum);
+* uma lista ordenada das chaves com o dono de cada uma, consultada só
+  quando o Bloom diz "talvez" (confirma e descarta falsos positivos).
+
+As chaves são normalizadas do mesmo jeito que as rotas gravam no banco
+(e-mail em minúsculas, os demais só sem espaços nas pontas). O índice é
+recarregado periodicamente (``max_age``) para pegar escritas de outros
+workers; o banco continua sendo quem garante a unicidade no cadastro.
+"""
+import bisect
+import hashlib
+import math
+import threading
+import time
+
+FIELDS = ("email", "cpf", "nickname")
+
+
+def normalize(field, value):
+    value = (value or "").strip()
+    return value.lower() if field == "email" else value
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1024)
+        self.num_bits = int(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # double hashing: k posições a partir de dois hashes de 64 bits
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class _FieldIndex:
+    """Bloom + chaves ordenadas (com o id do dono) de um campo."""
+
+    def __init__(self, pairs):
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.owners = [owner for _, owner in pairs]
+        self.bloom = BloomFilter(len(self.keys) * 2)
+        for key in self.keys:
+            self.bloom.add(key)
+
+    def owner(self, key):
+        if key not in self.bloom:
+            return None
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.owners[i]
+        return None
+
+    def add(self, key, owner):
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            self.owners[i] = owner
+            return
+        self.keys.insert(i, key)
+        self.owners.insert(i, owner)
+        if self.bloom.count >= self.bloom.capacity:
+            # filtro cheio: a taxa de falso positivo subiria, refaz maior
+            self.bloom = BloomFilter(len(self.keys) * 2)
+            for k in self.keys:
+                self.bloom.add(k)
+        else:
+            self.bloom.add(key)
+
+    def remove(self, key, owner):
+        # o Bloom não remove; a chave só some da lista (vira falso positivo)
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key and self.owners[i] == owner:
+            del self.keys[i]
+            del self.owners[i]
+
+
+class AvailabilityIndex:
+    def __init__(self, load_rows, max_age=300):
+        # load_rows: gera (user_id, email, cpf, nickname) de todos os usuários
+        self._load_rows = load_rows
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._fields = {}
+        self._by_user = {}   # user_id -> (email, cpf, nickname) normalizados
+
+    def reload(self):
+        by_user = {}
+        for user_id, *values in self._load_rows():
+            by_user[user_id] = tuple(normalize(f, v) for f, v in zip(FIELDS, values))
+        fields = {
+            field: _FieldIndex((keys[n], user_id) for user_id, keys in by_user.items())
+            for n, field in enumerate(FIELDS)
+        }
+        with self._lock:
+            self._fields = fields
+            self._by_user = by_user
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self._max_age:
+            self.reload()
+
+    # -----------------------------
+    # Atualização (após o commit)
+    # -----------------------------
+    def set_user(self, user_id, email, cpf, nickname):
+        """Registra os valores atuais do usuário (insert ou update)."""
+        keys = tuple(normalize(f, v) for f, v in zip(FIELDS, (email, cpf, nickname)))
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            old = self._by_user.get(user_id)
+            for n, field in enumerate(FIELDS):
+                if old and old[n] != keys[n]:
+                    self._fields[field].remove(old[n], user_id)
+                self._fields[field].add(keys[n], user_id)
+            self._by_user[user_id] = keys
+
+    def remove_user(self, user_id):
+        with self._lock:
+            old = self._by_user.pop(user_id, None)
+            if old is None:
+                return
+            for n, field in enumerate(FIELDS):
+                self._fields[field].remove(old[n], user_id)
+
+    # -----------------------------
+    # Consulta
+    # -----------------------------
+    def is_available(self, field, value, user_id=None):
+        """
+        True se ``value`` está livre para ``field`` (ou já pertence a
+        ``user_id``, caso do formulário de perfil).
+        """
+        self._ensure_loaded()
+        key = normalize(field, value)
+        with self._lock:
+            owner = self._fields[field].owner(key)
+        return owner is None or owner == user_id
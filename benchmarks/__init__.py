@@ -0,0 +1 @@
+"""Benchmarks do Harmonic (rodam contra um SQLite local, sem SQL Server)."""
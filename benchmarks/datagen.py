@@ -0,0 +1,159 @@
+"""
+Gerador de dados sintéticos (usuários, músicas e favoritos) num SQLite.
+
+Usa os próprios modelos do app (User/Music/Favorite) com INSERT em lote.
+Os usuários se chamam bench<i> (e-mail bench<i>@bench.local, senha
+"senha123"); um em cada ``ARTIST_EVERY`` é artista. Os favoritos seguem uma
+cauda longa (poucas músicas concentram a maior parte).
+
+    python -m benchmarks.datagen --scale 100k --db /tmp/harmonic-100k.db
+"""
+import argparse
+import os
+import random
+import time
+
+from sqlalchemy import func, insert, text
+
+from benchmarks.search_index import GENRES, fake_word
+from catalog_import import chunked
+
+BENCH_PASSWORD = "senha123"
+ARTIST_EVERY = 10
+
+# usuários, músicas, favoritos
+SCALES = {
+    "1k":   (100,     1_000,      1_000),
+    "10k":  (1_000,   10_000,     10_000),
+    "100k": (5_000,   100_000,    100_000),
+    "1m":   (50_000,  1_000_000,  1_000_000),
+    "10m":  (500_000, 10_000_000, 10_000_000),
+}
+
+
+def setup_app(db_path):
+    """Importa o app apontando para ``db_path`` e aplica as migrações."""
+    # timeout: várias threads escrevendo esperam o lock em vez de falhar
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}?timeout=30"
+    import app as harmonic
+
+    with harmonic.app.app_context():
+        harmonic.upgrade_schema()
+        with harmonic.db.engine.connect() as conn:
+            # WAL fica gravado no arquivo: leitores não bloqueiam o escritor
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        harmonic.get_or_create_admin_user()
+    return harmonic
+
+
+def _next_id(harmonic, model):
+    return (harmonic.db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _insert(harmonic, model, rows, chunk_size, label, on_progress):
+    total = 0
+    for chunk in chunked(rows, chunk_size):
+        harmonic.db.session.execute(insert(model), chunk)
+        harmonic.db.session.commit()
+        total += len(chunk)
+        if on_progress:
+            on_progress(label, total)
+    return total
+
+
+def generate(harmonic, users, musics, favorites, seed=42, chunk_size=10_000,
+             on_progress=None):
+    """Insere os dados e recalcula os contadores. Devolve as contagens."""
+    rng = random.Random(seed)
+    db = harmonic.db
+    db.session.execute(text("PRAGMA synchronous=OFF"))
+
+    # um hash só, reaproveitado: gerar hashes não é o que medimos
+    password_hash = harmonic.password_hasher.hash(BENCH_PASSWORD)
+    first_user = _next_id(harmonic, harmonic.User)
+
+    def user_rows():
+        for i in range(users):
+            yield {
+                "id": first_user + i, "first_name": "Bench", "last_name": str(i),
+                "cpf": f"b{i:010d}", "email": f"bench{i}@bench.local",
+                "nickname": f"bench{i}", "password_hash": password_hash,
+                "role": "artist" if i % ARTIST_EVERY == 0 else "listener",
+            }
+
+    users = _insert(harmonic, harmonic.User, user_rows(), chunk_size, "usuários", on_progress)
+
+    artists = [first_user + i for i in range(0, users, ARTIST_EVERY)]
+    first_music = _next_id(harmonic, harmonic.Music)
+    vocabulary = [fake_word(rng) for _ in range(max(musics // 5, 100))]
+
+    def music_rows():
+        for i in range(musics):
+            artist_id = rng.choice(artists)
+            yield {
+                "id": first_music + i,
+                "title": " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))).title(),
+                "genre": rng.choice(GENRES),
+                "artist_name": f"bench{artist_id - first_user}",
+                "artist_id": artist_id,
+                "cover_url": None,
+            }
+
+    musics = _insert(harmonic, harmonic.Music, music_rows(), chunk_size, "músicas", on_progress)
+
+    def favorite_rows():
+        per_user, extra = divmod(min(favorites, users * musics), users)
+        for i in range(users):
+            wanted = min(per_user + (i < extra), musics)
+            picked = set()
+            while len(picked) < wanted:
+                # cauda longa, com o ponto de partida espalhado pelo catálogo
+                picked.add((int(rng.paretovariate(1.2) * 7) + i * 31) % musics)
+            for m in sorted(picked):
+                yield {"user_id": first_user + i, "music_id": first_music + m}
+
+    favorites = _insert(harmonic, harmonic.Favorite, favorite_rows(), chunk_size,
+                        "favoritos", on_progress)
+
+    harmonic.reconcile_stats()
+    harmonic.rebuild_favorite_counts(chunk_size)
+    harmonic.backfill_music_genres(chunk_size)
+    return {"users": users, "musics": musics, "favorites": favorites}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", required=True, help="arquivo SQLite (é criado)")
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--users", type=int, help="sobrepõe a escala")
+    parser.add_argument("--musics", type=int, help="sobrepõe a escala")
+    parser.add_argument("--favorites", type=int, help="sobrepõe a escala")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-recs", action="store_true",
+                        help="não monta a tabela de recomendações")
+    args = parser.parse_args()
+
+    users, musics, favorites = SCALES[args.scale]
+    users = args.users or users
+    musics = args.musics or musics
+    favorites = args.favorites if args.favorites is not None else favorites
+
+    harmonic = setup_app(args.db)
+    started = time.perf_counter()
+
+    def on_progress(label, n):
+        print(f"\r  {label}: {n:,}", end="", flush=True)
+
+    with harmonic.app.app_context():
+        generate(harmonic, users, musics, favorites, seed=args.seed, on_progress=on_progress)
+        print()
+        if not args.skip_recs:
+            items, rows = harmonic.build_recommendations()
+            print(f"  recomendações: {items:,} músicas, {rows:,} linhas")
+
+    print(f"{users:,} usuários, {musics:,} músicas e {favorites:,} favoritos "
+          f"em {time.perf_counter() - started:.1f}s -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Vazão de login com e sem o pool de hash de senhas.
+
+Simula uma rajada de logins (várias threads fazendo POST /login) enquanto
+outra thread mede a latência de uma página que não usa senha (/inicio).
+
+    python -m benchmarks.login_pool --threads 16 --logins 20
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+
+def setup_app(db_path):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    import app as harmonic
+
+    with harmonic.app.app_context():
+        harmonic.upgrade_schema()
+    return harmonic
+
+
+def create_users(harmonic, n):
+    with harmonic.app.app_context():
+        # um hash só, reaproveitado: criar os usuários não é o que medimos
+        password_hash = harmonic.password_hasher.hash("senha123")
+        harmonic.db.session.add_all(
+            harmonic.User(
+                first_name="Bench", last_name=str(i), cpf=f"bench{i:09d}",
+                email=f"bench{i}@bench.local", nickname=f"bench{i}",
+                role="listener", password_hash=password_hash,
+            )
+            for i in range(n)
+        )
+        harmonic.db.session.commit()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_burst(harmonic, threads, logins):
+    flask_app = harmonic.app
+    ok = rejected = 0
+    lock = threading.Lock()
+    done = threading.Event()
+    page_latencies = []
+
+    def login_worker(worker):
+        nonlocal ok, rejected
+        client = flask_app.test_client()
+        for i in range(logins):
+            user = f"bench{(worker * logins + i) % threads}"
+            resp = client.post("/login", data={"username": user, "password": "senha123"})
+            with lock:
+                if resp.headers.get("Location", "").endswith("/home"):
+                    ok += 1
+                else:
+                    rejected += 1
+
+    def page_worker():
+        client = flask_app.test_client()
+        while not done.is_set():
+            t0 = time.perf_counter()
+            client.get("/inicio")
+            page_latencies.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.01)
+
+    prober = threading.Thread(target=page_worker)
+    prober.start()
+    workers = [threading.Thread(target=login_worker, args=(w,)) for w in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    return {
+        "logins_ok": ok,
+        "logins_rejected": rejected,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(ok / elapsed, 1),
+        "page_p50_ms": round(percentile(page_latencies, 0.50), 2),
+        "page_p95_ms": round(percentile(page_latencies, 0.95), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=20, help="logins por thread")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="processos do pool")
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        harmonic = setup_app(os.path.join(tmp, "bench.db"))
+        from passwords import PasswordHasher
+
+        method = harmonic.app.config["PASSWORD_HASH_METHOD"]
+        harmonic.password_hasher = PasswordHasher(method, workers=0)
+        create_users(harmonic, args.threads)
+
+        results = {}
+        results["sem pool"] = run_burst(harmonic, args.threads, args.logins)
+
+        harmonic.password_hasher = PasswordHasher(
+            method, workers=args.workers, max_pending=args.max_pending
+        )
+        results["com pool"] = run_burst(harmonic, args.threads, args.logins)
+        harmonic.password_hasher.shutdown()
+
+    for name, r in results.items():
+        print(
+            f"{name:>9}: {r['logins_per_second']:>7} logins/s "
+            f"({r['logins_ok']} ok, {r['logins_rejected']} recusados) | "
+            f"/inicio p50 {r['page_p50_ms']} ms, p95 {r['page_p95_ms']} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Custo de reordenar playlists (posições fracionárias, positions.py).
+
+Para playlists de vários tamanhos mede a latência de mover um item para
+um lugar sorteado, com os comandos SQL e as linhas gravadas por
+movimento, e compara com a ordem por inteiros (mover desloca todas as
+linhas entre a origem e o destino). Mede também a inclusão de todos os
+favoritos na playlist (um INSERT ... SELECT).
+
+    python -m benchmarks.playlists --sizes 1000,10000,100000 --moves 500
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import event, insert, text
+
+from benchmarks import datagen
+from catalog_import import chunked
+
+INT_TABLE = "bench_int_items"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def create_musics(harmonic, n, artist_id, chunk_size=10_000):
+    rows = ({"title": f"Faixa {i}", "artist_id": artist_id, "genre": "Pop"} for i in range(n))
+    for chunk in chunked(rows, chunk_size):
+        harmonic.db.session.execute(insert(harmonic.Music), chunk)
+    harmonic.db.session.commit()
+    return [row[0] for row in harmonic.db.session.query(harmonic.Music.id).order_by(harmonic.Music.id)]
+
+
+def favorite_all(harmonic, user_id, music_ids, chunk_size=10_000):
+    rows = ({"user_id": user_id, "music_id": m} for m in music_ids)
+    for chunk in chunked(rows, chunk_size):
+        harmonic.db.session.execute(insert(harmonic.Favorite), chunk)
+    harmonic.db.session.commit()
+
+
+def copy_as_integers(harmonic, playlist_id):
+    """A mesma playlist numa tabela com posição inteira 1..n (a alternativa)."""
+    session = harmonic.db.session
+    session.execute(text(f"DROP TABLE IF EXISTS {INT_TABLE}"))
+    session.execute(text(
+        f"CREATE TABLE {INT_TABLE} (playlist_id INTEGER, music_id INTEGER, "
+        f"position INTEGER, PRIMARY KEY (playlist_id, music_id))"
+    ))
+    session.execute(text(f"CREATE INDEX ix_{INT_TABLE} ON {INT_TABLE} (playlist_id, position)"))
+    session.execute(text(
+        f"INSERT INTO {INT_TABLE} SELECT playlist_id, music_id, "
+        f"row_number() OVER (ORDER BY position) FROM playlist_items WHERE playlist_id = :p"
+    ), {"p": playlist_id})
+    session.commit()
+
+
+def move_as_integer(session, playlist_id, music_id, target):
+    """Move com renumeração: desloca a faixa entre origem e destino. Devolve as linhas gravadas."""
+    current = session.execute(text(
+        f"SELECT position FROM {INT_TABLE} WHERE playlist_id = :p AND music_id = :m"
+    ), {"p": playlist_id, "m": music_id}).scalar()
+    if target < current:
+        shift = (f"UPDATE {INT_TABLE} SET position = position + 1 WHERE playlist_id = :p "
+                 f"AND position >= :t AND position < :c")
+    else:
+        shift = (f"UPDATE {INT_TABLE} SET position = position - 1 WHERE playlist_id = :p "
+                 f"AND position > :c AND position <= :t")
+    written = session.execute(text(shift), {"p": playlist_id, "t": target, "c": current}).rowcount
+    written += session.execute(text(
+        f"UPDATE {INT_TABLE} SET position = :t WHERE playlist_id = :p AND music_id = :m"
+    ), {"p": playlist_id, "m": music_id, "t": target}).rowcount
+    session.commit()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="tamanhos das playlists, separados por vírgula")
+    parser.add_argument("--moves", type=int, default=500)
+    parser.add_argument("--db", help="arquivo SQLite (padrão: temporário)")
+    args = parser.parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        harmonic = datagen.setup_app(args.db or os.path.join(tmp, "bench.db"))
+        # a renumeração por inteiros é lenta de propósito: sem log de consulta lenta
+        logging.getLogger("harmonic.sql").setLevel(logging.ERROR)
+        app, db = harmonic.app, harmonic.db
+
+        with app.app_context():
+            admin = harmonic.get_or_create_admin_user()
+            music_ids = create_musics(harmonic, sizes[-1], admin.id)
+
+            # comandos SQL e linhas gravadas (UPDATE) de cada movimento
+            counts = {"sql": 0, "written": 0}
+
+            @event.listens_for(db.engine, "after_cursor_execute")
+            def count_statement(conn, cursor, statement, *args):
+                counts["sql"] += 1
+                if statement.lstrip().upper().startswith("UPDATE"):
+                    counts["written"] += max(cursor.rowcount, 0)
+
+            rng = random.Random(7)
+            favorited = 0
+            print(f"{'itens':>8} | {'favoritos':>9} | {'fracionária p50/p99':>20} "
+                  f"{'SQL':>4} {'linhas':>6} | {'inteiros p50/p99':>18} {'linhas':>8}")
+            for size in sizes:
+                favorite_all(harmonic, admin.id, music_ids[favorited:size])
+                favorited = size
+
+                playlist = harmonic.Playlist(user_id=admin.id, name=f"bench {size}")
+                db.session.add(playlist)
+                db.session.commit()
+
+                t0 = time.perf_counter()
+                added = harmonic.add_favorites_to_playlist(playlist.id, admin.id)
+                db.session.commit()
+                bulk_ms = (time.perf_counter() - t0) * 1000
+                assert added == size, (added, size)
+
+                items = music_ids[:size]
+                latencies, sql_counts, written = [], [], []
+                for _ in range(args.moves):
+                    music_id, anchor = rng.sample(items, 2)
+                    counts.update(sql=0, written=0)
+                    t0 = time.perf_counter()
+                    harmonic.move_playlist_item(playlist.id, music_id, after=anchor)
+                    db.session.commit()
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                    sql_counts.append(counts["sql"])
+                    written.append(counts["written"])
+
+                copy_as_integers(harmonic, playlist.id)
+                int_latencies, int_written = [], []
+                for _ in range(args.moves):
+                    t0 = time.perf_counter()
+                    int_written.append(move_as_integer(
+                        db.session, playlist.id, rng.choice(items), rng.randint(1, size)
+                    ))
+                    int_latencies.append((time.perf_counter() - t0) * 1000)
+
+                longest = db.session.execute(text(
+                    "SELECT max(length(position)) FROM playlist_items WHERE playlist_id = :p"
+                ), {"p": playlist.id}).scalar()
+                print(f"{size:>8,} | {bulk_ms:>7.0f}ms | "
+                      f"{percentile(latencies, 0.5):>8.2f} / {percentile(latencies, 0.99):>6.2f} ms "
+                      f"{sum(sql_counts) / len(sql_counts):>4.1f} {sum(written) / len(written):>6.0f} | "
+                      f"{percentile(int_latencies, 0.5):>7.2f} / {percentile(int_latencies, 0.99):>6.2f} ms "
+                      f"{sum(int_written) / len(int_written):>8,.0f}"
+                      f"   (maior chave: {longest} caracteres)")
+
+
+if __name__ == "__main__":
+    main()
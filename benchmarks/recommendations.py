@@ -0,0 +1,72 @@
+"""
+Custo do motor de recomendações (recommend.py) com favoritos sintéticos.
+
+Mede o tempo e o pico de memória para montar a tabela de vizinhos, a
+latência de uma recomendação e de uma atualização incremental.
+
+    python -m benchmarks.recommendations --favorites 2000000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from recommend import Recommender, build_neighbors
+
+
+def fake_pairs(n_favorites, n_users, n_items, seed=42):
+    # popularidade com cauda longa: poucas músicas concentram os favoritos
+    rng = random.Random(seed)
+    for _ in range(n_favorites):
+        yield rng.randrange(n_users), int(rng.paretovariate(1.2) * 7) % n_items
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--favorites", type=int, default=500000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--block-items", type=int, default=4096)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    counts, neighbors = build_neighbors(
+        fake_pairs(args.favorites, args.users, args.items),
+        top_k=args.top_k, block_items=args.block_items,
+    )
+    build_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"montagem: {build_seconds:.1f}s, pico de memória {peak / 2**20:.0f} MiB, "
+          f"{len(neighbors):,} músicas com vizinhos")
+
+    model = Recommender(None, top_k=args.top_k)
+    model.load(counts, neighbors)
+
+    rng = random.Random(7)
+    items = list(counts)
+    latencies = []
+    for _ in range(1000):
+        seeds = rng.sample(items, min(len(items), rng.randint(1, 50)))
+        t0 = time.perf_counter()
+        model.recommend(seeds, 10)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    print(f"recomendar: p50 {percentile(latencies, 0.5):.2f} ms, "
+          f"p99 {percentile(latencies, 0.99):.2f} ms")
+
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        seeds = rng.sample(items, min(len(items), 20))
+        model.favorite_changed(seeds[0], seeds[1:], 1)
+    print(f"atualização incremental: {(time.perf_counter() - t0):.3f} ms por favorito")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Carga nas rotas do app: vazão, latência (p50/p95/p99) e SQL por request.
+
+Sobe o app contra um SQLite local (gerado por benchmarks.datagen se ainda
+não existir) e dispara os cenários com várias threads, pelo test client do
+Flask ou por HTTP de verdade (servidor werkzeug em outra thread). O
+resultado pode ser salvo em JSON e comparado com o de outro commit.
+
+    python -m benchmarks.routes --scale 10k --db /tmp/harmonic-10k.db \\
+        --driver http --concurrency 8 --requests 500 --out depois.json \\
+        --compare antes.json
+"""
+import argparse
+import http.cookiejar
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+
+from benchmarks import datagen
+
+SQL_HEADER = "X-Bench-SQL"
+ADMIN_LOGIN = ("admin", "admin123")
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def install_sql_counter(harmonic):
+    """Conta os comandos SQL de cada request e devolve no header X-Bench-SQL."""
+    from flask import g, has_request_context
+    from sqlalchemy import event
+
+    with harmonic.app.app_context():
+        engine = harmonic.db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*args):
+        if has_request_context():
+            g.bench_sql = g.get("bench_sql", 0) + 1
+
+    @harmonic.app.after_request
+    def sql_header(resp):
+        resp.headers[SQL_HEADER] = str(g.get("bench_sql", 0))
+        return resp
+
+
+# -----------------------------
+# Drivers (test client / HTTP)
+# -----------------------------
+class TestClientDriver:
+    name = "testclient"
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+
+    def session(self):
+        client = self.flask_app.test_client()
+
+        def request(method, path, data=None):
+            resp = client.open(path, method=method, data=data)
+            return resp.status_code, resp.headers.get(SQL_HEADER)
+
+        return request
+
+    def close(self):
+        pass
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # medimos a rota em si, não a página para onde ela redireciona
+    def redirect_request(self, *args):
+        return None
+
+
+class HttpDriver:
+    name = "http"
+
+    def __init__(self, flask_app):
+        from werkzeug.serving import make_server
+
+        self.server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def session(self):
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect
+        )
+
+        def request(method, path, data=None):
+            body = urllib.parse.urlencode(data).encode("ascii") if data is not None else None
+            req = urllib.request.Request(self.base_url + path, data=body, method=method)
+            try:
+                with opener.open(req, timeout=60) as resp:
+                    resp.read()
+                    return resp.status, resp.headers.get(SQL_HEADER)
+            except urllib.error.HTTPError as exc:
+                exc.read()
+                return exc.code, exc.headers.get(SQL_HEADER)
+
+        return request
+
+    def close(self):
+        self.server.shutdown()
+
+
+# -----------------------------
+# Cenários
+# -----------------------------
+class BenchData:
+    """Ids e credenciais sorteáveis, lidos do banco uma vez."""
+
+    def __init__(self, harmonic, sample=1000):
+        User, Music = harmonic.User, harmonic.Music
+        with harmonic.app.app_context():
+            session = harmonic.db.session
+            bench = session.query(User.id, User.email, User.role).filter(
+                User.email.like("bench%@bench.local")
+            )
+            self.listeners = [u for u in bench.filter(User.role == "listener").limit(sample)]
+            self.artists = [u for u in bench.filter(User.role == "artist").limit(sample)]
+            self.min_music, self.max_music = session.query(
+                func.min(Music.id), func.max(Music.id)
+            ).one()
+            self.max_user = session.query(func.max(User.id)).scalar()
+        if not self.listeners or not self.artists:
+            raise SystemExit("Banco sem usuários bench*: gere com benchmarks.datagen.")
+
+
+def login(request, email, password=datagen.BENCH_PASSWORD):
+    status, _ = request("POST", "/login", {"username": email, "password": password})
+    if status != 302:
+        raise RuntimeError(f"login de {email} falhou ({status})")
+
+
+def _bench_user_form(user):
+    # mesmos valores gerados por datagen: a atualização não muda nada visível
+    i = user.email[len("bench"):-len("@bench.local")]
+    return {"id": user.id, "first_name": "Bench", "last_name": i,
+            "nickname": f"bench{i}", "role": user.role}
+
+
+SCENARIOS = {
+    # nome: (quem loga antes, função que monta o request)
+    "login": (None, lambda d, rng, w: (
+        "POST", "/login",
+        {"username": rng.choice(d.listeners).email, "password": datagen.BENCH_PASSWORD},
+    )),
+    "home": ("listener", lambda d, rng, w: ("GET", "/home", None)),
+    "favorite": ("listener", lambda d, rng, w: (
+        "POST", f"/favorite/{rng.randint(d.min_music, d.max_music)}", None,
+    )),
+    "plays": ("listener", lambda d, rng, w: (
+        "POST", "/api/plays", {"music_id": rng.randint(d.min_music, d.max_music)},
+    )),
+    "crud_msc": ("artist", lambda d, rng, w: (
+        "POST", "/crud_msc",
+        {"title": f"Bench {w}-{rng.getrandbits(48):x}", "genre": "Pop", "artist_name": ""},
+    )),
+    "home_admin": ("admin", lambda d, rng, w: ("GET", "/home", None)),
+    "admin_users": ("admin", lambda d, rng, w: (
+        "GET", f"/admin/api/users?after={rng.randint(0, d.max_user)}", None,
+    )),
+    "admin_update_user": ("admin", lambda d, rng, w: (
+        "POST", "/admin/update_user", _bench_user_form(rng.choice(d.listeners)),
+    )),
+}
+
+
+def run_scenario(driver, data, name, concurrency, total_requests, seed=1):
+    login_as, make_request = SCENARIOS[name]
+    latencies, sql_counts = [], []
+    errors = 0
+    lock = threading.Lock()
+    counter = itertools.count()
+    # o relógio só começa depois que todas as threads fizeram login
+    ready = threading.Barrier(concurrency + 1)
+
+    def worker(w):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + w)
+        request = driver.session()
+        if login_as == "admin":
+            login(request, *ADMIN_LOGIN)
+        elif login_as:
+            users = data.listeners if login_as == "listener" else data.artists
+            login(request, users[w % len(users)].email)
+        ready.wait()
+
+        while next(counter) < total_requests:
+            method, path, form = make_request(data, rng, w)
+            t0 = time.perf_counter()
+            status, sql = request(method, path, form)
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if sql is not None:
+                    sql_counts.append(int(sql))
+                if status >= 400:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(concurrency)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "sql_per_request": round(sum(sql_counts) / len(sql_counts), 2) if sql_counts else None,
+        "sql_max": max(sql_counts) if sql_counts else None,
+    }
+
+
+# -----------------------------
+# Relatório
+# -----------------------------
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    base = (baseline or {}).get("scenarios", {})
+    print(f"{'cenário':>18} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL/req':>8} {'erros':>6}")
+    for name, r in results["scenarios"].items():
+        line = (f"{name:>18} {r['throughput_rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+                f"{r['p99_ms']:>8} {r['sql_per_request'] if r['sql_per_request'] is not None else '-':>8} "
+                f"{r['errors']:>6}")
+        old = base.get(name)
+        if old and old.get("p95_ms") and old.get("throughput_rps"):
+            line += (f"   p95 {100 * (r['p95_ms'] / old['p95_ms'] - 1):+.0f}%, "
+                     f"req/s {100 * (r['throughput_rps'] / old['throughput_rps'] - 1):+.0f}%")
+            if old.get("sql_per_request") is not None and r["sql_per_request"] is not None:
+                line += f", SQL {r['sql_per_request'] - old['sql_per_request']:+.1f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", required=True, help="SQLite (gerado se não existir)")
+    parser.add_argument("--replica",
+                        help="SQLite de uma réplica de leitura (copiada do --db antes de rodar; "
+                             "SQL/req passa a contar só o primário)")
+    parser.add_argument("--scale", choices=datagen.SCALES, default="1k",
+                        help="escala usada ao gerar o banco")
+    parser.add_argument("--driver", choices=("testclient", "http"), default="testclient")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="requests por cenário")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="lista separada por vírgulas")
+    parser.add_argument("--out", help="salva o resultado em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    fresh = not os.path.exists(args.db)
+    if args.replica:
+        os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{args.replica}?timeout=30"
+    harmonic = datagen.setup_app(args.db)
+    if fresh:
+        print(f"gerando dados ({args.scale}) em {args.db}...")
+        with harmonic.app.app_context():
+            datagen.generate(harmonic, *datagen.SCALES[args.scale])
+            harmonic.build_recommendations()
+    if args.replica:
+        with harmonic.app.app_context():
+            if not harmonic.sync_replicas():
+                raise SystemExit(f"réplica {args.replica} indisponível")
+
+    install_sql_counter(harmonic)
+    data = BenchData(harmonic)
+    with harmonic.app.app_context():
+        rows = {
+            "users": harmonic.User.query.count(),
+            "musics": harmonic.Music.query.count(),
+            "favorites": harmonic.Favorite.query.count(),
+        }
+
+    driver = (HttpDriver if args.driver == "http" else TestClientDriver)(harmonic.app)
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "driver": driver.name,
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "rows": rows,
+            "python": platform.python_version(),
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            results["scenarios"][name] = run_scenario(
+                driver, data, name, args.concurrency, args.requests
+            )
+    finally:
+        driver.close()
+        harmonic.password_hasher.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(f"{rows['users']:,} usuários, {rows['musics']:,} músicas, "
+          f"{rows['favorites']:,} favoritos | {driver.name}, {args.concurrency} threads")
+    print_results(results, baseline)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"resultado salvo em {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Latência do índice de busca em memória (search.SearchIndex).
+
+Gera um catálogo sintético só em memória (sem banco) e mede p50/p99 de
+consultas exatas, por prefixo, aproximadas e com várias palavras.
+
+    python -m benchmarks.search_index --tracks 1000000
+"""
+import argparse
+import random
+import time
+
+from search import SearchIndex
+
+SYLLABLES = ["ma", "ri", "lu", "sa", "jo", "ão", "ne", "vi", "da", "ca", "ro",
+             "mé", "li", "to", "ba", "gu", "ça", "fe", "na", "zé", "pi", "lo"]
+GENRES = ["Pop", "Rap", "Funk", "Sertanejo", "R&B", "Trap", "MPB Pop",
+          "Pagode", "Eletrônica", "Funk Melody", "Pop/Dance", "Reggaeton"]
+
+
+def fake_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def fake_rows(n, seed=42):
+    rng = random.Random(seed)
+    artists = [f"{fake_word(rng).title()} {fake_word(rng).title()}" for _ in range(max(n // 20, 10))]
+    vocabulary = [fake_word(rng) for _ in range(max(n // 5, 100))]
+    for music_id in range(1, n + 1):
+        title = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))).title()
+        yield music_id, title, rng.choice(artists), rng.choice(GENRES)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tracks", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = list(fake_rows(args.tracks))
+    index = SearchIndex(lambda: rows)
+
+    started = time.perf_counter()
+    index.rebuild()
+    print(f"índice de {len(index):,} músicas montado em {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    samples = [rng.choice(rows) for _ in range(args.queries)]
+    kinds = {
+        "exata": lambda r: r[1].split()[0],
+        "prefixo": lambda r: r[1].split()[0][:3],
+        "aproximada": lambda r: r[2].split()[0][:-1] + "x",
+        "título + artista": lambda r: f"{r[1].split()[0]} {r[2].split()[-1]}",
+        "gênero": lambda r: r[3],
+    }
+
+    for name, make_query in kinds.items():
+        latencies = []
+        for row in samples:
+            query = make_query(row)
+            t0 = time.perf_counter()
+            index.search(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        print(f"{name:>17}: p50 {percentile(latencies, 0.5):.2f} ms, "
+              f"p99 {percentile(latencies, 0.99):.2f} ms")
+
+    t0 = time.perf_counter()
+    for music_id in range(args.tracks + 1, args.tracks + 1001):
+        index.add(music_id, "Nova Música", "Artista Novo", "Pop")
+    print(f"inclusão incremental: {(time.perf_counter() - t0):.3f} ms por música")
+
+
+if __name__ == "__main__":
+    main()
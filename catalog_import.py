@@ -0,0 +1,102 @@
+"""
+Leitura em streaming de catálogos de músicas (CSV ou JSONL).
+
+Só cuida de ler, validar e agrupar as linhas em lotes; a gravação no banco
+fica em ``app.import_catalog``. Nada aqui carrega o arquivo inteiro na
+memória.
+"""
+import csv
+import io
+import json
+import sys
+from itertools import islice
+
+# limites das colunas de Music
+FIELD_LIMITS = {
+    "title": 160,
+    "genre": 80,
+    "cover_url": 4096,
+    "artist_name": 120,
+}
+
+
+class InvalidRow(ValueError):
+    """Linha do catálogo que não pode ser importada."""
+
+    def __init__(self, line, message):
+        super().__init__(f"linha {line}: {message}")
+        self.line = line
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    lower = path.lower()
+    if lower.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if lower.endswith(".csv"):
+        return "csv"
+    raise ValueError(f"Não sei o formato de {path!r}; use --format csv|jsonl.")
+
+
+def open_source(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+def iter_records(stream, fmt):
+    """Gera (número_da_linha, dict) a partir de CSV com cabeçalho ou JSONL."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_num, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_num, InvalidRow(line_num, f"JSON inválido ({exc.msg})")
+    else:
+        raise ValueError(f"Formato desconhecido: {fmt!r}")
+
+
+def clean_record(line_num, record):
+    """Normaliza uma linha; levanta InvalidRow se não der para importar."""
+    if isinstance(record, InvalidRow):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRow(line_num, "esperado um objeto com os campos da música")
+
+    row = {}
+    for field, limit in FIELD_LIMITS.items():
+        value = record.get(field)
+        value = str(value).strip() if value is not None else ""
+        if len(value) > limit:
+            raise InvalidRow(line_num, f"{field} passa de {limit} caracteres")
+        row[field] = value or None
+
+    if not row["title"]:
+        raise InvalidRow(line_num, "title é obrigatório")
+    return row
+
+
+def iter_valid_rows(records, on_error):
+    """Filtra as linhas válidas; as inválidas são passadas para ``on_error``."""
+    for line_num, record in records:
+        try:
+            yield clean_record(line_num, record)
+        except InvalidRow as exc:
+            on_error(exc)
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,154 @@
+"""
+Paradas "Em alta": as músicas mais favoritadas, no geral e por gênero.
+
+O total de favoritos fica desnormalizado em ``musics.favorite_count``
+(atualizado na mesma transação de cada favorito). Em memória guardamos só o
+topo de cada parada: uma lista ordenada de (-favoritos, id) com um pouco de
+folga além do K exibido. Cada mudança de contagem acha a posição por busca
+binária (O(log K) comparações) e mexe em no máximo K entradas.
+
+A carga completa é uma consulta só (os primeiros de cada gênero, por
+ROW_NUMBER); a parada geral sai da união dessas listas.
+
+Invariante: toda música fora da lista tem no máximo tantos favoritos quanto
+a última da lista. Uma música da lista que cai abaixo disso é retirada (não
+dá para saber quem passou na frente); se a lista fica menor que K, a
+parada é recarregada do banco na próxima leitura.
+"""
+import bisect
+import heapq
+import threading
+import time
+from collections import defaultdict
+
+ALL = ""    # chave da parada geral
+
+
+class TopChart:
+    def __init__(self, size, capacity, rows=()):
+        # rows: (music_id, favoritos) dos ``capacity`` primeiros, do banco
+        self.size = size
+        self.capacity = capacity
+        self._entries = sorted((-count, music_id) for music_id, count in rows if count > 0)
+        self._counts = {music_id: -neg for neg, music_id in self._entries}
+        # com menos linhas que a capacidade, o banco não tem mais ninguém
+        self.complete = len(self._entries) < capacity
+
+    @property
+    def stale(self):
+        return not self.complete and len(self._entries) < self.size
+
+    def update(self, music_id, count):
+        """Registra a contagem atual (absoluta) de ``music_id``."""
+        key = (-count, music_id)
+        # quem está fora da lista vem depois da última entrada (desempate por id)
+        floor = self._entries[-1] if self._entries else None
+        old = self._counts.pop(music_id, None)
+        if old is not None:
+            del self._entries[bisect.bisect_left(self._entries, (-old, music_id))]
+
+        if count <= 0:
+            return
+        if not self.complete and (floor is None or key > floor):
+            return  # não dá para saber se passou alguém de fora: fica de fora
+
+        bisect.insort(self._entries, key)
+        self._counts[music_id] = count
+        if len(self._entries) > self.capacity:
+            _, dropped = self._entries.pop()
+            del self._counts[dropped]
+            self.complete = False
+
+    def top(self, k=None):
+        """[(music_id, favoritos)] do mais favoritado para o menos."""
+        k = self.size if k is None else min(k, self.size)
+        return [(music_id, -neg) for neg, music_id in self._entries[:k]]
+
+
+class Charts:
+    def __init__(self, load_tops, load_top, size=50, reserve=50, max_age=120):
+        # load_tops(n): (gênero, music_id, favoritos) dos n primeiros de cada
+        # gênero, numa consulta só; load_top(genre, n): n primeiros
+        # (music_id, favoritos) de um gênero (ALL = geral), para recarregar
+        # uma parada sozinha
+        self._load_tops = load_tops
+        self._load_top = load_top
+        self.size = size
+        self._capacity = size + reserve
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._charts = {}
+        self._loaded_at = None
+
+    # -----------------------------
+    # Carga
+    # -----------------------------
+    def _load_chart(self, genre):
+        return TopChart(self.size, self._capacity, self._load_top(genre, self._capacity))
+
+    def reload(self):
+        by_genre = defaultdict(list)
+        for genre, music_id, count in self._load_tops(self._capacity):
+            by_genre[genre].append((music_id, count))
+        # a parada geral sai da união: quem está no topo geral está no topo
+        # do próprio gênero (músicas sem gênero formam um grupo também)
+        everything = heapq.nsmallest(
+            self._capacity,
+            (row for rows in by_genre.values() for row in rows),
+            key=lambda row: (-row[1], row[0]),
+        )
+        charts = {ALL: TopChart(self.size, self._capacity, everything)}
+        for genre, rows in by_genre.items():
+            if genre:
+                charts[genre] = TopChart(self.size, self._capacity, rows)
+        with self._lock:
+            self._charts = charts
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self._max_age:
+            self.reload()
+
+    # -----------------------------
+    # Atualização (após o commit)
+    # -----------------------------
+    def update(self, rows):
+        """rows: (music_id, gênero, favoritos) com as contagens novas."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for music_id, genre, count in rows:
+                self._charts[ALL].update(music_id, count)
+                if genre:
+                    chart = self._charts.get(genre)
+                    if chart is None:
+                        chart = self._charts[genre] = TopChart(self.size, self._capacity)
+                    chart.update(music_id, count)
+
+    # -----------------------------
+    # Leitura
+    # -----------------------------
+    def genres(self):
+        self._ensure_loaded()
+        with self._lock:
+            return sorted(g for g, chart in self._charts.items() if g and chart.top(1))
+
+    def top(self, genre=ALL, k=None):
+        """[(music_id, favoritos)]; gênero desconhecido devolve lista vazia."""
+        self._ensure_loaded()
+        with self._lock:
+            chart = self._charts.get(genre)
+            stale = chart is not None and chart.stale
+        if stale:
+            chart = self._load_chart(genre)
+            with self._lock:
+                self._charts[genre] = chart
+        if chart is None:
+            return []
+        with self._lock:
+            return chart.top(k)
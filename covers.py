@@ -0,0 +1,247 @@
+"""
+Cache local das capas das músicas.
+
+As capas apontam para vários hosts de terceiros, muitas vezes em tamanho
+original (2048px). Aqui baixamos cada URL uma vez, guardamos o original
+pelo hash do conteúdo (arquivos iguais vindos de URLs diferentes ocupam um
+só lugar) e geramos miniaturas nos tamanhos usados pelos cards.
+
+Estrutura em disco (``root``):
+
+    urls/<sha256 da url>          -> hash do conteúdo daquela URL
+    originals/<hash[:2]>/<hash>   -> bytes originais
+    thumbs/<tam>/<hash>.<fmt>     -> miniaturas (jpeg/webp)
+
+O download é feito por um "fetcher" plugável (qualquer objeto com
+``fetch(url) -> bytes``), o que permite usar um servidor HTTP local nos
+testes. Downloads simultâneos da mesma URL são agrupados em um só.
+"""
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+try:
+    from PIL import Image
+except ImportError:   # sem Pillow servimos só o original
+    Image = None
+
+THUMB_FORMATS = {
+    "jpeg": ("image/jpeg", "jpg"),
+    "webp": ("image/webp", "webp"),
+}
+
+
+class CoverFetchError(RuntimeError):
+    """Não foi possível baixar ou ler a capa."""
+
+
+class UrlFetcher:
+    """
+    Baixa por HTTP(S) com timeout e limite de tamanho.
+
+    Por padrão recusa hosts que resolvem para IPs internos (loopback, rede
+    privada, link-local), inclusive após redirecionamentos: quem cadastra a
+    música escolhe a URL. ``allow_private=True`` libera (ex.: servidor local
+    nos testes).
+    """
+
+    def __init__(self, timeout=5.0, max_bytes=10 * 2**20, user_agent="Harmonic/1.0",
+                 allow_private=False):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.user_agent = user_agent
+        self.allow_private = allow_private
+        self._opener = urllib.request.build_opener(_CheckedRedirectHandler(self))
+
+    def check_url(self, url):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise CoverFetchError(f"URL não suportada: {url!r}")
+        if self.allow_private:
+            return
+        try:
+            infos = socket.getaddrinfo(parts.hostname, parts.port or 443)
+        except OSError as exc:
+            raise CoverFetchError(f"Host inválido em {url}: {exc}") from exc
+        for info in infos:
+            if not ipaddress.ip_address(info[4][0]).is_global:
+                raise CoverFetchError(f"Host interno não permitido: {parts.hostname}")
+
+    def fetch(self, url):
+        self.check_url(url)
+        req = urllib.request.Request(url, headers={"User-Agent": self.user_agent})
+        try:
+            with self._opener.open(req, timeout=self.timeout) as resp:
+                data = resp.read(self.max_bytes + 1)
+        except OSError as exc:
+            raise CoverFetchError(f"Falha ao baixar {url}: {exc}") from exc
+        if len(data) > self.max_bytes:
+            raise CoverFetchError(f"Capa maior que {self.max_bytes} bytes: {url}")
+        return data
+
+
+class _CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        self.fetcher.check_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def sniff_image_type(head):
+    """Tipo da imagem pelos primeiros bytes; None se não for imagem conhecida."""
+    if head.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class CoverStore:
+    def __init__(self, root, fetcher=None, sizes=(240, 480), failure_ttl=300):
+        # fetcher: objeto com fetch(url) -> bytes (padrão: UrlFetcher)
+        self.root = root
+        self.fetcher = fetcher or UrlFetcher()
+        self.sizes = tuple(sizes)
+        self.failure_ttl = failure_ttl
+        self._inflight = {}    # url -> threading.Event
+        self._failures = {}    # url -> momento da última falha
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Originais
+    # -----------------------------
+    def _url_path(self, url):
+        return os.path.join(self.root, "urls", _sha256(url.encode("utf-8")))
+
+    def _original_path(self, digest):
+        return os.path.join(self.root, "originals", digest[:2], digest)
+
+    def _cached_digest(self, url):
+        try:
+            with open(self._url_path(url), encoding="ascii") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def original(self, url):
+        """Hash do conteúdo de ``url``, baixando uma única vez."""
+        digest = self._cached_digest(url)
+        if digest:
+            return digest
+
+        with self._lock:
+            failed_at = self._failures.get(url)
+            if failed_at and time.monotonic() - failed_at < self.failure_ttl:
+                raise CoverFetchError(f"Falha recente ao baixar {url}")
+            event = self._inflight.get(url)
+            leader = event is None
+            if leader:
+                event = self._inflight[url] = threading.Event()
+
+        if not leader:
+            # outro request já está baixando essa URL: espera o resultado
+            event.wait(self.fetcher_timeout())
+            digest = self._cached_digest(url)
+            if not digest:
+                raise CoverFetchError(f"Falha ao baixar {url}")
+            return digest
+
+        try:
+            data = self.fetcher.fetch(url)
+            if sniff_image_type(data[:12]) is None:
+                raise CoverFetchError(f"Conteúdo de {url} não é uma imagem")
+            digest = _sha256(data)
+            path = self._original_path(digest)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+            _write_atomic(self._url_path(url), digest.encode("ascii"))
+            return digest
+        except CoverFetchError:
+            with self._lock:
+                self._failures[url] = time.monotonic()
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+            event.set()
+
+    def fetcher_timeout(self):
+        return getattr(self.fetcher, "timeout", 10.0) + 1.0
+
+    # -----------------------------
+    # Miniaturas
+    # -----------------------------
+    def thumbnail(self, digest, size, fmt="jpeg"):
+        """Caminho da miniatura (gerada na primeira vez)."""
+        _, ext = THUMB_FORMATS[fmt]
+        path = os.path.join(self.root, "thumbs", str(size), f"{digest}.{ext}")
+        if os.path.exists(path):
+            return path
+
+        try:
+            with Image.open(self._original_path(digest)) as img:
+                img = img.convert("RGB")
+                img.thumbnail((size, size), Image.LANCZOS)
+                out = io.BytesIO()
+                if fmt == "webp":
+                    img.save(out, "WEBP", quality=80, method=4)
+                else:
+                    img.save(out, "JPEG", quality=82, optimize=True, progressive=True)
+        except (OSError, ValueError) as exc:
+            raise CoverFetchError(f"Capa ilegível ({digest}): {exc}") from exc
+
+        _write_atomic(path, out.getvalue())
+        return path
+
+    def get(self, url, size=None, fmt="jpeg"):
+        """
+        Devolve (caminho, mimetype, etag) da capa no tamanho pedido.
+        Sem Pillow (ou sem ``size``) devolve o original.
+        """
+        digest = self.original(url)
+        if size and Image is not None:
+            size = min(self.sizes, key=lambda s: abs(s - size))
+            mimetype, _ = THUMB_FORMATS[fmt]
+            return self.thumbnail(digest, size, fmt), mimetype, f"{digest[:32]}-{size}-{fmt}"
+        path = self._original_path(digest)
+        with open(path, "rb") as f:
+            mimetype = sniff_image_type(f.read(12))
+        return path, mimetype, digest[:32]
+
+    def warm(self, url):
+        """Baixa o original e gera as miniaturas (para rodar fora do request)."""
+        digest = self.original(url)
+        if Image is not None:
+            for size in self.sizes:
+                for fmt in THUMB_FORMATS:
+                    self.thumbnail(digest, size, fmt)
+        return digest
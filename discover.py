@@ -0,0 +1,115 @@
+"""
+Sorteio de músicas para a seção "Descobrir" da home.
+
+Em vez de ``ORDER BY NEWID()`` (que gera um GUID e ordena a tabela inteira
+a cada acesso), mantemos em memória um array compacto com os ids de
+``musics`` e sorteamos posições dele. Depois basta buscar as linhas pela
+chave primária.
+"""
+import os
+import random
+import threading
+import time
+from array import array
+
+# vitrine, não segurança: Random comum (SystemRandom faz uma syscall por
+# sorteio); ressemeado em cada processo filho para os workers não sortearem
+# a mesma sequência
+_rng = random.Random()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_rng.seed)
+
+
+class DiscoverSampler:
+    """Array de ids em memória com inserção, remoção e sorteio em O(1)."""
+
+    def __init__(self, load_ids, max_age=300):
+        # load_ids: função que devolve todos os ids de músicas do banco
+        # max_age: segundos até recarregar tudo (corrige alterações feitas
+        #          por outros processos/workers)
+        self._load_ids = load_ids
+        self._max_age = max_age
+        self._ids = array("q")
+        self._pos = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Carga / atualização
+    # -----------------------------
+    def reload(self):
+        """Recarrega todos os ids a partir do banco."""
+        ids = array("q", self._load_ids())
+        pos = {music_id: i for i, music_id in enumerate(ids)}
+        with self._lock:
+            self._ids = ids
+            self._pos = pos
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Força uma recarga completa no próximo sorteio."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self._max_age:
+            self.reload()
+
+    def add(self, music_id):
+        with self._lock:
+            if self._loaded_at is None or music_id in self._pos:
+                return
+            self._pos[music_id] = len(self._ids)
+            self._ids.append(music_id)
+
+    def remove(self, music_id):
+        # troca com o último e remove do fim: O(1)
+        with self._lock:
+            i = self._pos.pop(music_id, None)
+            if i is None:
+                return
+            last = self._ids.pop()
+            if last != music_id:
+                self._ids[i] = last
+                self._pos[last] = i
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, music_id):
+        self._ensure_loaded()
+        return music_id in self._pos
+
+    # -----------------------------
+    # Sorteio
+    # -----------------------------
+    def sample(self, k=10, exclude=None):
+        """
+        Sorteia até ``k`` ids distintos, ignorando os de ``exclude``. O
+        número de sorteios é limitado: com quase tudo excluído pode voltar
+        menos que ``k``.
+        """
+        self._ensure_loaded()
+        exclude = exclude or ()
+
+        with self._lock:
+            ids = self._ids
+            n = len(ids)
+            attempts = k * 8
+            if n <= attempts:
+                # catálogo pequeno: varrer custa o mesmo que sortear
+                rest = [music_id for music_id in ids if music_id not in exclude]
+                return _rng.sample(rest, min(k, len(rest)))
+
+            chosen = []
+            seen = set()
+            while len(chosen) < k and attempts:
+                attempts -= 1
+                music_id = ids[_rng.randrange(n)]
+                if music_id in seen or music_id in exclude:
+                    continue
+                seen.add(music_id)
+                chosen.append(music_id)
+
+        return chosen
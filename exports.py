@@ -0,0 +1,107 @@
+"""
+Exportação em streaming (CSV ou JSONL, com gzip opcional).
+
+Só cuida de transformar linhas em bytes; as consultas ficam em
+``app.export_rows``. As linhas chegam em ordem de id e os pedaços saem
+com algumas dezenas de KB: a memória não cresce com o tamanho da tabela,
+e uma exportação interrompida continua de onde parou pelo último id
+gravado (``after``).
+"""
+import csv
+import io
+import json
+import os
+import zlib
+
+CHUNK_BYTES = 64 * 1024
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+def iter_csv(columns, rows, header=True):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_jsonl(columns, rows, header=True):
+    # JSONL não tem cabeçalho: cada linha traz os nomes
+    parts = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+WRITERS = {"csv": iter_csv, "jsonl": iter_jsonl}
+
+
+def encode(fmt, columns, rows, header=True):
+    """Pedaços (bytes) do arquivo no formato ``fmt``."""
+    try:
+        writer = WRITERS[fmt]
+    except KeyError:
+        raise ValueError(f"Formato desconhecido: {fmt!r}") from None
+    return writer(columns, rows, header=header)
+
+
+def gzip_chunks(chunks, level=6):
+    """Comprime os pedaços conforme passam (um membro gzip)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)   # 31: cabeçalho gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# -----------------------------
+# Retomada (CLI)
+# -----------------------------
+def last_exported_id(path, fmt):
+    """
+    Id da última linha completa de um arquivo sem compressão; corta uma
+    linha final pela metade (exportação interrompida). None se não houver
+    linha de dados.
+    """
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        tail = b""
+        # volta em blocos até achar as duas últimas quebras de linha
+        while pos > 0 and tail.count(b"\n") < 2:
+            step = min(CHUNK_BYTES, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+        complete = tail[:tail.rfind(b"\n") + 1]
+        if len(complete) < len(tail):
+            f.truncate(pos + len(complete))
+        lines = complete.splitlines()
+        if not lines:
+            return None
+        last = lines[-1].decode("utf-8")
+
+    if fmt == "jsonl":
+        return int(json.loads(last)["id"])
+    value = next(csv.reader([last]))[0]
+    return int(value) if value.isdigit() else None    # só o cabeçalho
+
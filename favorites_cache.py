@@ -0,0 +1,61 @@
+"""
+Cache em memória dos ids favoritados por usuário.
+
+A home só precisa saber "essa música é favorita?" para desenhar a estrela;
+guardamos esse conjunto por usuário (LRU limitado) em vez de refazer o join
+com favorites a cada página. As rotas que escrevem em favorites atualizam o
+cache depois do commit; o TTL cobre escritas feitas por outros workers.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class FavoriteSetCache:
+    def __init__(self, load_ids, max_users=10000, ttl=60):
+        # load_ids(user_id): ids das músicas favoritas desse usuário
+        self._load_ids = load_ids
+        self._max_users = max_users
+        self._ttl = ttl
+        self._entries = OrderedDict()   # user_id -> (carregado_em, frozenset)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """frozenset com os ids favoritados por ``user_id``."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[0] <= self._ttl:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        ids = frozenset(self._load_ids(user_id))
+        self._store(user_id, ids, now)
+        return ids
+
+    def _store(self, user_id, ids, loaded_at):
+        with self._lock:
+            self._entries[user_id] = (loaded_at, ids)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._max_users:
+                self._entries.popitem(last=False)
+
+    def update(self, user_id, added=(), removed=()):
+        """Aplica uma escrita já confirmada (commit) ao conjunto do usuário."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            loaded_at, ids = entry
+            self._entries[user_id] = (loaded_at, (ids | frozenset(added)) - frozenset(removed))
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
@@ -0,0 +1,156 @@
+"""
+Cache do HTML renderizado de seções da home.
+
+Cada fragmento é guardado com uma chave que inclui as versões das entidades
+de que depende (ex.: "favorites:42"). As rotas que escrevem incrementam a
+versão (``bump``); a chave muda e o fragmento antigo simplesmente deixa de
+ser lido até sair do cache. Não há invalidação explícita.
+
+Backends:
+
+* ``MemoryBackend``: LRU em processo limitado por bytes (padrão);
+* ``RedisBackend``: compartilhado entre workers (precisa do pacote redis).
+
+O HTML pode ficar em cada processo, as versões não: um ``bump`` feito no
+worker que atendeu a escrita tem de valer para todos. Por isso o
+``MemoryBackend`` recebe onde guardar as versões (o app usa a tabela de
+contadores); as versões só em memória (``LocalVersions``) servem apenas
+para um processo único.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class LocalVersions:
+    """Versões em memória: só valem dentro de um processo."""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_versions(self, names):
+        with self._lock:
+            return [self._versions.get(name, 0) for name in names]
+
+    def incr(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+
+class MemoryBackend:
+    def __init__(self, max_bytes=32 * 2**20, versions=None):
+        # versions: get_versions(names)/incr(name) compartilhados entre os
+        # processos; sem ele, LocalVersions (um processo só)
+        self.max_bytes = max_bytes
+        self.versions = versions or LocalVersions()
+        self._entries = OrderedDict()   # chave -> (expira_em, valor, bytes)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def get_versions(self, names):
+        return self.versions.get_versions(names)
+
+    def incr(self, name):
+        return self.versions.incr(name)
+
+    def info(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size,
+                    "max_bytes": self.max_bytes}
+
+
+class RedisBackend:
+    def __init__(self, url, prefix="harmonic:"):
+        import redis   # opcional: só quem configura FRAGMENT_CACHE_URL precisa
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        value = self._redis.get(self._prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._redis.set(self._prefix + key, value.encode("utf-8"), ex=int(ttl))
+
+    def get_versions(self, names):
+        values = self._redis.mget([f"{self._prefix}v:{n}" for n in names])
+        return [int(v) if v is not None else 0 for v in values]
+
+    def incr(self, name):
+        return self._redis.incr(f"{self._prefix}v:{name}")
+
+    def info(self):
+        return {"backend": "redis"}
+
+
+class FragmentCache:
+    def __init__(self, backend, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+        self._stats = defaultdict(lambda: [0, 0])   # seção -> [hits, misses]
+        self._lock = threading.Lock()
+
+    def bump(self, *names):
+        """Invalida os fragmentos que dependem dessas entidades."""
+        for name in names:
+            self.backend.incr(name)
+
+    def get_or_render(self, section, owner, depends_on, render):
+        """
+        Devolve o HTML de ``section`` para ``owner`` (ex.: id do usuário),
+        chamando ``render()`` só quando alguma dependência mudou.
+        """
+        versions = self.backend.get_versions(depends_on)
+        key = f"frag:{section}:{owner}:" + ".".join(map(str, versions))
+
+        html = self.backend.get(key)
+        with self._lock:
+            self._stats[section][0 if html is not None else 1] += 1
+        if html is not None:
+            return html
+
+        html = str(render())
+        self.backend.set(key, html, self.ttl)
+        return html
+
+    def stats(self):
+        with self._lock:
+            sections = {
+                section: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+                }
+                for section, (hits, misses) in self._stats.items()
+            }
+        return {"sections": sections, "backend": self.backend.info()}
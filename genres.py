@@ -0,0 +1,56 @@
+"""
+Taxonomia de gêneros: do texto livre de ``musics.genre`` para gêneros
+canônicos.
+
+"Trap/R&B" vira dois gêneros (Trap e R&B); "Sertanejo Pop" continua um só.
+Grafias diferentes do mesmo gênero ("pop", "POP ", "Eletronica",
+"Eletrônica") caem no mesmo slug, que é a chave da tabela ``genres``;
+alguns apelidos comuns (``ALIASES``) apontam para o gênero de referência.
+"""
+import re
+import unicodedata
+
+# separadores de vários gêneros num mesmo texto
+_SEPARATORS = re.compile(r"\s*(?:/|,|;|\+|\|)\s*")
+_NON_SLUG = re.compile(r"[^a-z0-9]+")
+_SPACES = re.compile(r"\s+")
+
+# slug do apelido -> (slug, nome) do gênero de referência
+ALIASES = {
+    "rnb": ("r-b", "R&B"),
+    "r-and-b": ("r-b", "R&B"),
+    "hiphop": ("hip-hop", "Hip-Hop"),
+    "edm": ("eletronica", "Eletrônica"),
+    "electronic": ("eletronica", "Eletrônica"),
+    "eletro": ("eletronica", "Eletrônica"),
+    "afro-pop": ("afropop", "Afropop"),
+}
+
+
+def slugify(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_SLUG.sub("-", text.lower()).strip("-")
+
+
+def canonical(name):
+    """(slug, nome) de um gênero só; None se não sobrar nada."""
+    name = _SPACES.sub(" ", name).strip()
+    slug = slugify(name)
+    if not slug:
+        return None
+    if slug in ALIASES:
+        return ALIASES[slug]
+    return slug, name
+
+
+def split_genres(raw):
+    """[(slug, nome)] sem repetição, na ordem em que aparecem em ``raw``."""
+    result = []
+    seen = set()
+    for part in _SEPARATORS.split(raw or ""):
+        genre = canonical(part)
+        if genre and genre[0] not in seen:
+            seen.add(genre[0])
+            result.append(genre)
+    return result
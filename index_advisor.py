@@ -0,0 +1,256 @@
+"""
+Conselheiro de índices.
+
+Captura os comandos SQL que o app realmente executa (ouvindo a engine
+enquanto as rotas rodam), pede o plano de cada "formato" de comando ao
+banco configurado e aponta as tabelas lidas por inteiro que teriam um
+índice útil:
+
+* SQLite: ``EXPLAIN QUERY PLAN``; um ``SCAN <tabela>`` sem índice, com
+  colunas da tabela no WHERE/JOIN, vira sugestão (igualdades primeiro,
+  depois uma coluna de intervalo);
+* SQL Server: ``SET SHOWPLAN_XML ON``; o próprio otimizador lista os
+  índices que faltam (``MissingIndex``), com colunas de INCLUDE.
+
+O comando não é executado ao pedir o plano. Sugestões que já são cobertas
+por um índice existente (mesmas colunas iniciais) são descartadas.
+"""
+import re
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+
+from sqlalchemy import Index, event, inspect
+
+from instrumentation import normalize_statement
+
+SHOWPLAN_NS = {"p": "http://schemas.microsoft.com/sqlserver/2004/07/showplan"}
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE)\s+\"?(\w+)\"?(?:\s+(?:AS\s+)?\"?(\w+)\"?)?", re.IGNORECASE
+)
+_PREDICATE = re.compile(
+    r"\"?(\w+)\"?\.\"?(\w+)\"?\s*(=|!=|<>|>=|<=|>|<|\bNOT IN\b|\bIN\b|\bLIKE\b|\bIS\b)",
+    re.IGNORECASE,
+)
+_JOIN_RHS = re.compile(r"=\s*\"?(\w+)\"?\.\"?(\w+)\"?")
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS (\w+))?$")
+_KEYWORDS = {"WHERE", "ON", "JOIN", "LEFT", "INNER", "ORDER", "GROUP", "LIMIT", "SET",
+             "OUTER", "CROSS", "UNION", "HAVING", "OFFSET"}
+
+
+class Suggestion:
+    def __init__(self, table, columns, include=(), reason=""):
+        self.table = table
+        self.columns = tuple(columns)
+        self.include = tuple(include)
+        self.reason = reason
+        self.statements = []        # formatos de comando que pediram o índice
+
+    @property
+    def key(self):
+        return (self.table, self.columns, self.include)
+
+    @property
+    def name(self):
+        return f"ix_{self.table}_{'_'.join(self.columns)}"
+
+    def migration_line(self):
+        return f'ops.create_index("{self.table}", "{self.name}", {list(self.columns)!r})'
+
+    def __repr__(self):
+        return f"<Suggestion {self.table}({', '.join(self.columns)})>"
+
+
+# -----------------------------
+# Captura
+# -----------------------------
+class CapturedStatements:
+    """Um exemplo (com parâmetros) e a contagem de cada formato de comando."""
+
+    def __init__(self):
+        self.samples = {}   # formato -> (statement, parameters)
+        self.counts = {}    # formato -> n
+
+    def add(self, statement, parameters):
+        shape = normalize_statement(statement)
+        self.counts[shape] = self.counts.get(shape, 0) + 1
+        self.samples.setdefault(shape, (statement, parameters))
+
+    def __len__(self):
+        return len(self.samples)
+
+
+@contextmanager
+def capture(engine):
+    captured = CapturedStatements()
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and _EXPLAINABLE.match(statement):
+            captured.add(statement, parameters)
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+
+# -----------------------------
+# Planos
+# -----------------------------
+def _aliases(statement):
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(statement):
+        aliases[table.lower()] = table
+        if alias and alias.upper() not in _KEYWORDS:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def _predicate_columns(statement, alias):
+    """(igualdades, intervalos) da tabela ``alias`` no WHERE/ON do comando."""
+    equality, ranges = [], []
+    # só depois do FROM (o UPDATE não tem FROM: o comando inteiro)
+    parts = re.split(r"\bFROM\b", statement, maxsplit=1, flags=re.IGNORECASE)
+    body = parts[-1]
+    for ref, column, op in _PREDICATE.findall(body):
+        if ref.lower() != alias.lower():
+            continue
+        target = equality if op.strip().upper() in ("=", "IN", "IS") else ranges
+        if column not in equality and column not in target:
+            target.append(column)
+    for ref, column in _JOIN_RHS.findall(body):
+        # lado direito de um JOIN ... ON a.x = b.y
+        if ref.lower() == alias.lower() and column not in equality:
+            equality.append(column)
+    return equality, ranges
+
+
+def explain_sqlite(conn, statement, parameters):
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).all()
+    plan = [row[-1] for row in rows]
+    aliases = _aliases(statement)
+    suggestions = []
+    for detail in plan:
+        match = _SQLITE_SCAN.match(detail.strip())
+        if not match:
+            continue
+        name = match.group(2) or match.group(1)
+        table = aliases.get(name.lower(), match.group(1))
+        equality, ranges = _predicate_columns(statement, name)
+        columns = equality + ranges[:1]
+        if columns:
+            suggestions.append(Suggestion(table, columns, reason=detail))
+    return plan, suggestions
+
+
+def explain_mssql(conn, statement, parameters):
+    conn.exec_driver_sql("SET SHOWPLAN_XML ON")
+    try:
+        xml = conn.exec_driver_sql(statement, parameters or ()).scalar()
+    finally:
+        conn.exec_driver_sql("SET SHOWPLAN_XML OFF")
+    root = ET.fromstring(xml)
+
+    plan = sorted({
+        op.get("PhysicalOp") for op in root.iterfind(".//p:RelOp", SHOWPLAN_NS)
+    })
+    suggestions = []
+    for group in root.iterfind(".//p:MissingIndexGroup", SHOWPLAN_NS):
+        impact = group.get("Impact")
+        for missing in group.iterfind("p:MissingIndex", SHOWPLAN_NS):
+            usage = {"EQUALITY": [], "INEQUALITY": [], "INCLUDE": []}
+            for column_group in missing.iterfind("p:ColumnGroup", SHOWPLAN_NS):
+                usage[column_group.get("Usage")] += [
+                    c.get("Name").strip("[]")
+                    for c in column_group.iterfind("p:Column", SHOWPLAN_NS)
+                ]
+            suggestions.append(Suggestion(
+                missing.get("Table").strip("[]"),
+                usage["EQUALITY"] + usage["INEQUALITY"],
+                include=usage["INCLUDE"],
+                reason=f"MissingIndex (impacto estimado {impact}%)",
+            ))
+    return plan, suggestions
+
+
+EXPLAINERS = {"sqlite": explain_sqlite, "mssql": explain_mssql}
+
+
+def explain(conn, statement, parameters):
+    explainer = EXPLAINERS.get(conn.dialect.name)
+    if explainer is None:
+        raise NotImplementedError(f"Planos não suportados para {conn.dialect.name}.")
+    return explainer(conn, statement, parameters)
+
+
+# -----------------------------
+# Análise
+# -----------------------------
+def _existing_prefixes(inspector, table):
+    prefixes = []
+    pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+    if pk:
+        prefixes.append(tuple(pk))
+    for index in inspector.get_indexes(table):
+        prefixes.append(tuple(c for c in index["column_names"] if c))
+    for unique in inspector.get_unique_constraints(table):
+        prefixes.append(tuple(unique["column_names"]))
+    return prefixes
+
+
+def _covered(suggestion, prefixes):
+    # um índice que começa pelas mesmas colunas (em qualquer ordem entre as
+    # igualdades) já atende a consulta
+    wanted = suggestion.columns
+    for existing in prefixes:
+        head = existing[:len(wanted)]
+        if head == wanted or (len(head) == len(wanted) and set(head) == set(wanted)):
+            return True
+    return False
+
+
+def advise(engine, captured):
+    """
+    Explica cada formato capturado. Devolve (relatório, sugestões): o
+    relatório tem (formato, execuções, plano) e as sugestões já vêm sem
+    duplicatas e sem as que um índice existente cobre.
+    """
+    report = []
+    by_key = {}
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        prefixes = {}
+        for shape, (statement, parameters) in captured.samples.items():
+            try:
+                plan, suggestions = explain(conn, statement, parameters)
+            except NotImplementedError:
+                raise
+            except Exception as exc:     # comando que o EXPLAIN não aceita
+                report.append((shape, captured.counts[shape], [f"erro: {exc}"]))
+                continue
+            report.append((shape, captured.counts[shape], plan))
+            for suggestion in suggestions:
+                if suggestion.table not in prefixes:
+                    prefixes[suggestion.table] = _existing_prefixes(inspector, suggestion.table)
+                if _covered(suggestion, prefixes[suggestion.table]):
+                    continue
+                kept = by_key.setdefault(suggestion.key, suggestion)
+                kept.statements.append(shape)
+        conn.rollback()
+    return report, list(by_key.values())
+
+
+def apply(engine, metadata, suggestions):
+    """Cria os índices sugeridos (nomes ix_<tabela>_<colunas>)."""
+    with engine.begin() as conn:
+        for suggestion in suggestions:
+            table = metadata.tables[suggestion.table]
+            options = {}
+            if suggestion.include and conn.dialect.name == "mssql":
+                options["mssql_include"] = list(suggestion.include)
+            index = Index(suggestion.name, *(table.c[c] for c in suggestion.columns),
+                          **options)
+            table.indexes.discard(index)   # não fica nos modelos (ver SchemaOps.create_index)
+            index.create(conn)
@@ -0,0 +1,211 @@
+"""
+Instrumentação por request: SQL, templates e tempo total.
+
+Liga-se aos eventos do SQLAlchemy (todas as engines) e ao ciclo de vida do
+Flask para medir, em cada request:
+
+* quantos comandos SQL rodaram e quanto tempo passaram no banco;
+* quanto tempo levou a renderização dos templates;
+* comandos com o mesmo "formato" repetidos muitas vezes (provável N+1).
+
+Os números vão no header ``Server-Timing`` (aparece no DevTools do
+navegador) e são agregados por endpoint em histogramas, exportados no
+formato texto do Prometheus. Comandos lentos vão para o logger
+``harmonic.sql`` com o SQL normalizado (literais trocados por ``?``).
+
+Os agregados são por processo: com vários workers, cada um expõe os seus.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_SPACES = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+logger = logging.getLogger("harmonic.sql")
+
+
+def normalize_statement(statement):
+    """SQL sem literais e com listas IN colapsadas: o "formato" do comando."""
+    statement = _SPACES.sub(" ", statement).strip()
+    statement = _LITERALS.sub("?", statement)
+    return _IN_LIST.sub("(?, ...)", statement)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # o último é o +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+class _RequestStats:
+    __slots__ = ("started", "queries", "db_seconds", "template_seconds",
+                 "template_stack", "shapes")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_stack = []
+        self.shapes = Counter()
+
+
+class RequestMetrics:
+    def __init__(self, slow_query_ms=100, n_plus_one_threshold=5):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(lambda: {
+            "duration": Histogram(DURATION_BUCKETS),
+            "db": Histogram(DURATION_BUCKETS),
+            "templates": Histogram(DURATION_BUCKETS),
+            "queries": Histogram(QUERY_BUCKETS),
+        })
+        self._slow_queries = Counter()    # endpoint -> n
+        self._n_plus_one = Counter()      # endpoint -> n
+        # os eventos valem para todas as engines: com mais de uma instância
+        # (ex.: dois apps no mesmo processo), cada uma guarda os seus números
+        # (no g e no conn.info) com esta chave
+        self._g_key = f"_request_stats_{id(self)}"
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        # no nível da classe: vale para todas as engines (inclusive binds)
+        event.listen(Engine, "before_cursor_execute", self._before_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_execute)
+
+    # -----------------------------
+    # Coleta
+    # -----------------------------
+    def _stats(self):
+        return g.get(self._g_key) if has_request_context() else None
+
+    def _start_request(self):
+        setattr(g, self._g_key, _RequestStats())
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(self._g_key, []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info[self._g_key].pop()
+        stats = self._stats()
+        endpoint = request.endpoint if stats is not None else None
+
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            stats.shapes[normalize_statement(statement)] += 1
+
+        if elapsed >= self.slow_query_seconds:
+            with self._lock:
+                self._slow_queries[endpoint or "-"] += 1
+            logger.warning("consulta lenta (%.1f ms) em %s: %s",
+                           elapsed * 1000, endpoint or "-", normalize_statement(statement))
+
+    def _template_started(self, sender, template, context, **extra):
+        stats = self._stats()
+        if stats is not None:
+            stats.template_stack.append(time.perf_counter())
+
+    def _template_finished(self, sender, template, context, **extra):
+        stats = self._stats()
+        if stats is None or not stats.template_stack:
+            return
+        started = stats.template_stack.pop()
+        if not stats.template_stack:
+            # só o template externo conta (os incluídos já estão dentro dele)
+            stats.template_seconds += time.perf_counter() - started
+
+    def _finish_request(self, response):
+        stats = g.pop(self._g_key, None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        endpoint = request.endpoint or "-"
+
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+            f"tpl;dur={stats.template_seconds * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}",
+        )
+
+        repeated = [(shape, n) for shape, n in stats.shapes.items()
+                    if n >= self.n_plus_one_threshold]
+        for shape, n in repeated:
+            logger.warning("provável N+1 em %s: %d× %s", endpoint, n, shape)
+
+        with self._lock:
+            hist = self._endpoints[endpoint]
+            hist["duration"].observe(total)
+            hist["db"].observe(stats.db_seconds)
+            hist["templates"].observe(stats.template_seconds)
+            hist["queries"].observe(stats.queries)
+            if repeated:
+                self._n_plus_one[endpoint] += 1
+        return response
+
+    # -----------------------------
+    # Exportação (Prometheus, formato texto)
+    # -----------------------------
+    def render_prometheus(self):
+        histograms = (
+            ("duration", "harmonic_request_duration_seconds", "Tempo total do request."),
+            ("db", "harmonic_request_db_seconds", "Tempo gasto no banco por request."),
+            ("templates", "harmonic_request_template_seconds", "Tempo renderizando templates."),
+            ("queries", "harmonic_request_queries", "Comandos SQL por request."),
+        )
+        counters = (
+            (self._slow_queries, "harmonic_slow_queries_total", "Comandos SQL lentos."),
+            (self._n_plus_one, "harmonic_n_plus_one_requests_total",
+             "Requests com comandos repetidos (provável N+1)."),
+        )
+        lines = []
+        with self._lock:
+            for key, name, help_text in histograms:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for endpoint, hist in sorted(self._endpoints.items()):
+                    lines.extend(hist[key].lines(name, f'endpoint="{_escape(endpoint)}"'))
+            for values, name, help_text in counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for endpoint, n in sorted(values.items()):
+                    lines.append(f'{name}{{endpoint="{_escape(endpoint)}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,178 @@
+"""
+Migrações versionadas do esquema.
+
+Cada migração tem um número de versão, uma descrição e dois passos
+(``upgrade``/``downgrade``) que recebem um ``SchemaOps`` ligado à conexão.
+As versões aplicadas ficam na tabela ``schema_migrations``; cada migração
+roda na sua própria transação, junto com o registro da versão.
+
+Bancos criados antes das migrações (``db.create_all()``) e bancos novos
+partem da mesma migração 1, que cria as tabelas dos modelos que faltarem.
+Por isso as operações do ``SchemaOps`` são idempotentes: criar um índice
+que já existe (ou remover um que não existe) não faz nada.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table, inspect, select,
+)
+
+VERSION_TABLE = "schema_migrations"
+
+
+class Migration:
+    def __init__(self, version, description, upgrade, downgrade):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+        self.downgrade = downgrade
+
+    def __repr__(self):
+        return f"<Migration {self.version}: {self.description}>"
+
+
+class SchemaOps:
+    """Operações de DDL idempotentes sobre uma conexão."""
+
+    def __init__(self, conn, metadata):
+        self.conn = conn
+        self.metadata = metadata    # metadata dos modelos (para achar tabelas)
+
+    def _inspector(self):
+        # novo a cada chamada: o inspector guarda cache do que já leu
+        return inspect(self.conn)
+
+    def has_table(self, table):
+        return self._inspector().has_table(table)
+
+    def has_index(self, table, name):
+        return any(ix["name"] == name for ix in self._inspector().get_indexes(table))
+
+    def has_column(self, table, column):
+        return any(c["name"] == column for c in self._inspector().get_columns(table))
+
+    def create_tables(self, names=None):
+        tables = None
+        if names is not None:
+            tables = [self.metadata.tables[name] for name in names]
+        self.metadata.create_all(self.conn, tables=tables, checkfirst=True)
+
+    def drop_tables(self, names=None):
+        tables = None
+        if names is not None:
+            tables = [self.metadata.tables[name] for name in names]
+        self.metadata.drop_all(self.conn, tables=tables, checkfirst=True)
+
+    def create_index(self, table, name, columns, unique=False):
+        if self.has_index(table, name):
+            return False
+        sa_table = self.metadata.tables[table]
+        index = Index(name, *(sa_table.c[col] for col in columns), unique=unique)
+        # o Index se prende à tabela dos modelos; solto, um create_all
+        # posterior (ou o mesmo passo depois de um downgrade) não o duplica
+        sa_table.indexes.discard(index)
+        index.create(self.conn)
+        return True
+
+    def drop_index(self, table, name):
+        if not self.has_index(table, name):
+            return False
+        sa_table = self.metadata.tables[table]
+        index = next((ix for ix in sa_table.indexes if ix.name == name), None)
+        if index is None:
+            # índice que não está (mais) nos modelos: só o nome importa
+            index = Index(name, *sa_table.primary_key.columns)
+            index.table = sa_table
+        index.drop(self.conn)
+        return True
+
+    def add_column(self, table, column):
+        """``column`` é um ``Column`` novo (sem tabela); devolve True se criou."""
+        if self.has_column(table, column.name):
+            return False
+        ddl_type = column.type.compile(dialect=self.conn.dialect)
+        sql = f"ALTER TABLE {table} ADD {column.name} {ddl_type}"
+        if column.server_default is not None:
+            sql += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            sql += " NOT NULL"
+        self.conn.exec_driver_sql(sql)
+        return True
+
+    def drop_column(self, table, column):
+        if not self.has_column(table, column):
+            return False
+        self.conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+        return True
+
+
+class Migrator:
+    def __init__(self, migrations, metadata):
+        versions = [m.version for m in migrations]
+        if versions != sorted(set(versions)):
+            raise ValueError("As versões das migrações devem ser crescentes e únicas.")
+        self.migrations = list(migrations)
+        self.metadata = metadata
+        self._versions = Table(
+            VERSION_TABLE, MetaData(),
+            Column("version", Integer, primary_key=True, autoincrement=False),
+            Column("description", String(200), nullable=False),
+            Column("applied_at", DateTime, nullable=False),
+        )
+
+    @property
+    def head(self):
+        return self.migrations[-1].version if self.migrations else 0
+
+    def applied(self, engine):
+        """Versões já aplicadas (conjunto)."""
+        with engine.connect() as conn:
+            if not inspect(conn).has_table(VERSION_TABLE):
+                return set()
+            return set(conn.scalars(select(self._versions.c.version)))
+
+    def current(self, engine):
+        return max(self.applied(engine), default=0)
+
+    def status(self, engine):
+        """[(migração, aplicada?)] em ordem de versão."""
+        applied = self.applied(engine)
+        return [(m, m.version in applied) for m in self.migrations]
+
+    def upgrade(self, engine, target=None, on_step=None):
+        """Aplica as migrações pendentes até ``target`` (padrão: a última)."""
+        target = self.head if target is None else target
+        self._versions.create(engine, checkfirst=True)
+        applied = self.applied(engine)
+        done = []
+        for migration in self.migrations:
+            if migration.version > target or migration.version in applied:
+                continue
+            with engine.begin() as conn:
+                migration.upgrade(SchemaOps(conn, self.metadata))
+                conn.execute(self._versions.insert().values(
+                    version=migration.version,
+                    description=migration.description,
+                    applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                ))
+            done.append(migration)
+            if on_step:
+                on_step("upgrade", migration)
+        return done
+
+    def downgrade(self, engine, target, on_step=None):
+        """Desfaz as migrações aplicadas acima de ``target``, da mais nova para a mais velha."""
+        applied = self.applied(engine)
+        done = []
+        for migration in reversed(self.migrations):
+            if migration.version <= target or migration.version not in applied:
+                continue
+            with engine.begin() as conn:
+                migration.downgrade(SchemaOps(conn, self.metadata))
+                conn.execute(self._versions.delete().where(
+                    self._versions.c.version == migration.version
+                ))
+            done.append(migration)
+            if on_step:
+                on_step("downgrade", migration)
+        return done
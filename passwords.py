@@ -0,0 +1,116 @@
+"""
+Hash de senhas fora da thread do request.
+
+O scrypt/pbkdf2 do werkzeug é caro de propósito. Rodando direto na thread
+do request, uma rajada de logins ocupa todos os workers e trava páginas que
+nem usam senha. Aqui o cálculo vai para um pool de processos com limite de
+fila: se o pool estiver cheio, recusamos na hora (HasherBusy) em vez de
+enfileirar indefinidamente.
+
+Cada cálculo ocupa uma vaga até terminar de fato (mesmo que o request já
+tenha desistido por timeout). Os processos do pool nascem por "spawn": um
+fork do servidor, que tem várias threads, pode herdar um lock preso.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(RuntimeError):
+    """Pool de hash saturado; o cliente deve tentar de novo mais tarde."""
+
+
+def _method_prefix(password_hash):
+    # formato do werkzeug: "<método>$<salt>$<hash>"
+    return password_hash.split("$", 1)[0]
+
+
+class PasswordHasher:
+    def __init__(self, method="scrypt", workers=2, max_pending=32, timeout=10.0):
+        # workers=0 calcula na própria thread (útil em dev/testes)
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._current_prefix = None
+
+    def _get_pool(self):
+        # criado sob demanda: cada processo (inclusive após fork) tem o seu
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._pool
+
+    def _discard_pool(self, pool):
+        # processo do pool morreu: o pool não aceita mais nada, o próximo
+        # cálculo cria outro
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+
+        slots = self._slots   # after_fork troca o semáforo; libera no mesmo
+        if not slots.acquire(blocking=False):
+            raise HasherBusy("Muitas verificações de senha em andamento.")
+        pool = None
+        try:
+            pool = self._get_pool()
+            future = pool.submit(fn, *args)
+        except BaseException as exc:
+            slots.release()
+            if isinstance(exc, BrokenProcessPool):
+                self._discard_pool(pool)
+                raise HasherBusy("Pool de hash reiniciado.") from None
+            raise
+        # a vaga volta quando o cálculo termina, não quando o request desiste
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # pool atrasado: tira da fila se ainda não começou e
+            # trata como pool cheio (mesma resposta de "tente de novo")
+            future.cancel()
+            raise HasherBusy("Verificação de senha demorou demais.") from None
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise HasherBusy("Pool de hash reiniciado.") from None
+
+    def hash(self, raw_password):
+        return self._run(generate_password_hash, raw_password, self.method)
+
+    def verify(self, password_hash, raw_password):
+        return self._run(check_password_hash, password_hash, raw_password)
+
+    def needs_rehash(self, password_hash):
+        """True se o hash foi gerado com parâmetros diferentes dos atuais."""
+        if self._current_prefix is None:
+            sample = generate_password_hash("", self.method)
+            self._current_prefix = _method_prefix(sample)
+        return _method_prefix(password_hash) != self._current_prefix
+
+    def after_fork(self):
+        """No processo filho: esquece o pool herdado do pai (cria outro sob demanda)."""
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
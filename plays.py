@@ -0,0 +1,132 @@
+"""
+Execuções ("plays") com escrita adiada.
+
+O /api/plays só valida os eventos e os põe num buffer em memória; uma
+thread por processo grava em lote (INSERT de várias linhas) quando junta
+``batch_size`` eventos ou quando o mais antigo espera ``flush_ms``, o que
+vier primeiro. Nenhum request espera o banco.
+
+A fila tem limite: cheia (banco lento ou fora do ar), ``add`` recusa na
+hora com PlayBufferFull e o cliente reenvia depois, em vez de a memória
+crescer sem fim. Eventos ainda no buffer se perdem se o processo morrer
+sem ``close()`` — para contagem de execuções, aceitável.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("harmonic.plays")
+
+
+class PlayBufferFull(RuntimeError):
+    """Buffer de execuções cheio; o cliente deve reenviar mais tarde."""
+
+
+class PlayBuffer:
+    def __init__(self, write_rows, batch_size=1000, flush_ms=250, max_pending=50000,
+                 retry_delay=1.0):
+        # write_rows(rows): grava a lista de dicts numa transação (ou levanta)
+        self._write_rows = write_rows
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+        self._reset()
+
+    def _reset(self):
+        self._rows = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+        self.accepted = self.rejected = self.written = 0
+        self.batches = self.failures = self.dropped = 0
+
+    # -----------------------------
+    # Entrada (threads dos requests)
+    # -----------------------------
+    def add(self, rows):
+        """Enfileira ``rows`` inteiras ou nenhuma (PlayBufferFull)."""
+        with self._cond:
+            if len(self._rows) + len(rows) > self.max_pending:
+                self.rejected += len(rows)
+                raise PlayBufferFull("Muitas execuções aguardando gravação.")
+            if self._thread is None or not self._thread.is_alive():
+                self._closing = False
+                self._thread = threading.Thread(
+                    target=self._run, name="play-writer", daemon=True
+                )
+                self._thread.start()
+            self._rows.extend(rows)
+            self.accepted += len(rows)
+            self._cond.notify()
+
+    def __len__(self):
+        return len(self._rows)
+
+    # -----------------------------
+    # Gravação (thread própria)
+    # -----------------------------
+    def _next_batch(self):
+        with self._cond:
+            while not self._rows and not self._closing:
+                self._cond.wait()
+            # lote cheio ou prazo do evento mais antigo (a partir de agora)
+            deadline = time.monotonic() + self.flush_ms / 1000
+            while len(self._rows) < self.batch_size and not self._closing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(self.batch_size, len(self._rows))
+            return [self._rows.popleft() for _ in range(n)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return      # fechando e sem nada pendente
+            try:
+                self._write_rows(batch)
+            except Exception:
+                logger.exception("Falha ao gravar %d execuções", len(batch))
+                with self._cond:
+                    self.failures += 1
+                    # volta para a frente da fila se couber; senão descarta
+                    if self._closing or len(self._rows) + len(batch) > self.max_pending:
+                        self.dropped += len(batch)
+                    else:
+                        self._rows.extendleft(reversed(batch))
+                time.sleep(self.retry_delay)
+                continue
+            with self._cond:
+                self.written += len(batch)
+                self.batches += 1
+
+    # -----------------------------
+    # Ciclo de vida
+    # -----------------------------
+    def close(self, timeout=10):
+        """Grava o que estiver pendente e para a thread (até ``timeout`` s)."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def after_fork(self):
+        """No processo filho: buffer e thread novos (os do pai não valem aqui)."""
+        self._reset()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._rows),
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "written": self.written,
+                "batches": self.batches,
+                "failures": self.failures,
+                "dropped": self.dropped,
+            }
@@ -0,0 +1,156 @@
+"""
+Chaves de ordenação fracionárias (posição dos itens de uma playlist).
+
+Cada chave é um número entre 0 e 1 escrito em base 36 sem o "0.": "i" é
+0,5; "i8" fica entre "i" e "j". A ordem das strings é a ordem dos números
+(nenhuma chave termina em "0"), então o ``ORDER BY position`` do banco
+ordena os itens e, para mover um item, basta gravar nele uma chave entre
+as dos vizinhos: uma linha alterada, qualquer que seja o tamanho da lista.
+
+Só dígitos e letras minúsculas: a ordem é a mesma no SQLite (binária) e
+nas collations case-insensitive do SQL Server.
+
+A primeira chave fica no meio ("i"); ir para o fim ou para o início soma
+ou subtrai um passo fixo nos primeiros ``WIDTH`` dígitos (a chave não
+cresce). Quando o bloco chega ao topo, ``key_after`` abre um bloco novo
+de ``WIDTH`` dígitos depois dele (mais ~840 mil passos a cada bloco).
+Inserções repetidas entre os mesmos vizinhos alongam a chave em ~1
+caractere a cada 5; quem grava confere ``MAX_LENGTH`` e, passando dele,
+renumera a lista (``spread``).
+"""
+from sqlalchemy import String, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+WIDTH = 8                   # dígitos usados pelos passos de inclusão no fim
+STEP = BASE ** 4            # ~840 mil passos para cada lado antes de apertar
+FIRST = BASE ** WIDTH // 2  # "i"
+MAX_LENGTH = 48             # acima disso, renumera (a coluna tem folga)
+BULK_DIGITS = 7             # até 10 milhões de itens numa inclusão em lote
+
+_VALUES = {c: i for i, c in enumerate(DIGITS)}
+
+
+def validate(key):
+    """ValueError se ``key`` não for uma chave válida."""
+    if not key or key[-1] == "0" or any(c not in _VALUES for c in key):
+        raise ValueError(f"Chave de posição inválida: {key!r}")
+
+
+def _format(n):
+    digits = []
+    for _ in range(WIDTH):
+        n, d = divmod(n, BASE)
+        digits.append(DIGITS[d])
+    return "".join(reversed(digits)).rstrip("0")
+
+
+def _head(key):
+    n = 0
+    for c in key[:WIDTH].ljust(WIDTH, "0"):
+        n = n * BASE + _VALUES[c]
+    return n
+
+
+def midpoint(a, b):
+    """
+    Chave estritamente entre ``a`` e ``b`` ("" = início, None = fim), a
+    mais curta possível.
+    """
+    if b is not None and a >= b:
+        raise ValueError(f"{a!r} não vem antes de {b!r}")
+    if b is not None:
+        # prefixo comum (a completado com zeros) fica como está
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n:
+            return b[:n] + midpoint(a[n:], b[n:])
+
+    low = _VALUES[a[0]] if a else 0
+    high = _VALUES[b[0]] if b is not None else BASE
+    if high - low > 1:
+        return DIGITS[(low + high + 1) // 2]
+    # dígitos vizinhos: b encurtado já basta ou desce uma casa depois de a
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[low] + midpoint(a[1:], None)
+
+
+def key_after(key):
+    """Chave depois de ``key`` ("" = lista vazia): inclusão/ida para o fim."""
+    if not key:
+        return _format(FIRST)
+    n = _head(key) + STEP
+    if n >= BASE ** WIDTH:
+        # bloco cheio: mantém os WIDTH primeiros dígitos e continua no próximo
+        return key[:WIDTH].ljust(WIDTH, "0") + key_after(key[WIDTH:])
+    return _format(n)
+
+
+def key_before(key):
+    """Chave antes de ``key`` (o primeiro item): ida para o início."""
+    n = _head(key) - STEP
+    if n <= 0:
+        return midpoint("", key)
+    return _format(n)
+
+
+def keys_after(key, n):
+    """``n`` chaves crescentes depois de ``key``."""
+    keys = []
+    for _ in range(n):
+        key = key_after(key)
+        keys.append(key)
+    return keys
+
+
+def spread(n):
+    """
+    ``n`` chaves curtas e espaçadas por igual (renumeração), na metade do
+    meio do espaço: sobra um quarto em cada ponta para inclusões no fim e
+    idas para o início.
+    """
+    gap = BASE ** WIDTH // 2 // (n + 1)
+    if gap > STEP:
+        gap -= gap % STEP   # múltiplo do passo: chaves de até 4 dígitos
+    start = BASE ** WIDTH // 4
+    return [_format(start + gap * (i + 1)) for i in range(n)]
+
+
+def bulk_key(prefix, expr):
+    """
+    Expressão SQL da chave do item de número ``expr`` (1, 2, ...) numa
+    inclusão em lote depois de ``prefix``: prefix + número com
+    ``BULK_DIGITS`` dígitos + "1" (nunca termina em "0").
+    """
+    return literal(prefix, String) + zero_pad(expr) + "1"
+
+
+class zero_pad(FunctionElement):
+    """Número inteiro como texto com ``BULK_DIGITS`` dígitos (zeros à esquerda)."""
+    type = String()
+    inherit_cache = True
+
+
+@compiles(zero_pad)
+def _zero_pad_default(element, compiler, **kw):
+    return "LPAD(CAST(%s AS VARCHAR(20)), %d, '0')" % (
+        compiler.process(element.clauses, **kw), BULK_DIGITS
+    )
+
+
+@compiles(zero_pad, "sqlite")
+def _zero_pad_sqlite(element, compiler, **kw):
+    return "substr('%s' || %s, -%d)" % (
+        "0" * BULK_DIGITS, compiler.process(element.clauses, **kw), BULK_DIGITS
+    )
+
+
+@compiles(zero_pad, "mssql")
+def _zero_pad_mssql(element, compiler, **kw):
+    return "RIGHT('%s' + CAST(%s AS VARCHAR(20)), %d)" % (
+        "0" * BULK_DIGITS, compiler.process(element.clauses, **kw), BULK_DIGITS
+    )
@@ -0,0 +1,247 @@
+"""
+Recomendações por co-favoritos ("quem favoritou X também favoritou Y").
+
+A matriz usuário × música vem da tabela ``favorites``. A co-ocorrência entre
+duas músicas é (X^T X)[i, j] e a diagonal é o total de favoritos de cada
+uma; a similaridade é o cosseno c_ij / sqrt(n_i * n_j). Guardamos só os
+``top_k`` vizinhos de cada música (com a contagem bruta, para poder somar
+e subtrair favoritos incrementalmente) e, para recomendar a um usuário,
+somamos as similaridades dos vizinhos das músicas que ele já favoritou.
+
+A tabela ``music_neighbors`` é a fonte da verdade: ``build_neighbors``
+monta a tabela inteira e cada favorito adicionado/removido grava os deltas
+dos pares nela, na mesma transação do favorito. O Recommender de cada
+processo aplica os mesmos deltas na memória na hora e recarrega a tabela a
+cada ``max_age`` (o que traz as escritas feitas pelos outros processos).
+
+Com numpy/scipy o cálculo é feito em blocos de linhas de X^T X (memória
+limitada pelo tamanho do bloco); sem eles há um caminho em Python puro,
+adequado só para catálogos pequenos.
+"""
+import heapq
+import math
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:   # dependências opcionais
+    np = sparse = None
+
+# favoritos por usuário considerados ao montar/atualizar pares (evita que
+# poucos usuários com milhares de favoritos dominem o custo quadrático)
+MAX_USER_FAVORITES = 500
+
+
+def build_neighbors(pairs, top_k=20, block_items=4096):
+    """
+    Calcula os vizinhos de cada música a partir de pares (user_id, music_id).
+
+    Devolve (counts, neighbors): counts[música] = nº de favoritos e
+    neighbors[música] = [(vizinha, co_favoritos), ...] (até ``top_k``).
+    """
+    if np is not None:
+        return _build_numpy(pairs, top_k, block_items)
+    return _build_python(pairs, top_k)
+
+
+def _build_numpy(pairs, top_k, block_items):
+    users = array("q")
+    items = array("q")
+    for user_id, music_id in pairs:
+        users.append(user_id)
+        items.append(music_id)
+    if not items:
+        return {}, {}
+
+    user_ids, user_idx = np.unique(np.frombuffer(users, dtype=np.int64), return_inverse=True)
+    item_ids, item_idx = np.unique(np.frombuffer(items, dtype=np.int64), return_inverse=True)
+    del users, items
+
+    x = sparse.csr_matrix(
+        (np.ones(len(item_idx), dtype=np.float32), (user_idx, item_idx)),
+        shape=(len(user_ids), len(item_ids)),
+    )
+    x.data[:] = 1   # favorito duplicado conta uma vez
+    xt = x.T.tocsr()
+    n = np.asarray(x.sum(axis=0)).ravel()
+
+    counts = {int(item_ids[i]): int(n[i]) for i in range(len(item_ids))}
+    neighbors = {}
+    for start in range(0, len(item_ids), block_items):
+        block = (xt[start:start + block_items] @ x).tocsr()
+        for row in range(block.shape[0]):
+            i = start + row
+            lo, hi = block.indptr[row], block.indptr[row + 1]
+            cols = block.indices[lo:hi]
+            co = block.data[lo:hi]
+            keep = cols != i
+            cols, co = cols[keep], co[keep]
+            if not len(cols):
+                continue
+            sim = co / np.sqrt(n[i] * n[cols])
+            if len(cols) > top_k:
+                best = np.argpartition(-sim, top_k)[:top_k]
+                cols, co, sim = cols[best], co[best], sim[best]
+            order = np.argsort(-sim)
+            neighbors[int(item_ids[i])] = [
+                (int(item_ids[cols[k]]), int(co[k])) for k in order
+            ]
+    return counts, neighbors
+
+
+def _build_python(pairs, top_k):
+    by_user = defaultdict(set)
+    for user_id, music_id in pairs:
+        by_user[user_id].add(music_id)
+
+    counts = defaultdict(int)
+    co = defaultdict(lambda: defaultdict(int))
+    for favs in by_user.values():
+        favs = sorted(favs)[-MAX_USER_FAVORITES:]
+        for i in favs:
+            counts[i] += 1
+            for j in favs:
+                if i != j:
+                    co[i][j] += 1
+
+    neighbors = {}
+    for i, row in co.items():
+        best = heapq.nlargest(
+            top_k, row.items(),
+            key=lambda kv: kv[1] / math.sqrt(counts[i] * counts[kv[0]])
+        )
+        neighbors[i] = best
+    return dict(counts), neighbors
+
+
+def favorite_pair_changes(favorites, added=(), removed=()):
+    """
+    Gera (música, outras favoritas, delta) para um lote de favoritos
+    adicionados/removidos, na ordem em que os pares devem ser contados:
+    cada par de dentro do lote entra uma vez só. ``favorites`` são as
+    favoritas do usuário já com o lote aplicado; as outras vêm limitadas
+    às ``MAX_USER_FAVORITES`` de id maior, em ordem crescente.
+    """
+    others = set(favorites) - set(added)
+    for music_id in added:
+        yield music_id, sorted(others)[-MAX_USER_FAVORITES:], 1
+        others.add(music_id)
+    others |= set(removed)
+    for music_id in removed:
+        others.discard(music_id)
+        yield music_id, sorted(others)[-MAX_USER_FAVORITES:], -1
+
+
+class Recommender:
+    """Tabela de vizinhos em memória, com atualização incremental."""
+
+    def __init__(self, load_table, top_k=20, max_age=900):
+        # load_table: gera (music_id, neighbor_id, co_count); a linha com
+        # neighbor_id == music_id guarda o total de favoritos da música
+        self._load_table = load_table
+        self.top_k = top_k
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._counts = {}
+        self._neighbors = {}   # música -> (array ids, array co_counts)
+
+    def load(self, counts, neighbors):
+        packed = {
+            i: (array("q", (j for j, _ in row)), array("q", (c for _, c in row)))
+            for i, row in neighbors.items()
+        }
+        with self._lock:
+            self._counts = dict(counts)
+            self._neighbors = packed
+            self._loaded_at = time.monotonic()
+
+    def reload(self):
+        counts = {}
+        neighbors = defaultdict(list)
+        for music_id, neighbor_id, co_count in self._load_table():
+            if music_id == neighbor_id:
+                counts[music_id] = co_count
+            else:
+                neighbors[music_id].append((neighbor_id, co_count))
+        self.load(counts, neighbors)
+
+    def invalidate(self):
+        """Força recarregar a tabela na próxima recomendação."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self._max_age:
+            self.reload()
+
+    def __len__(self):
+        return len(self._neighbors)
+
+    # -----------------------------
+    # Atualização incremental
+    # -----------------------------
+    def _bump_pair(self, i, j, delta):
+        ids, co = self._neighbors.get(i, (None, None))
+        if ids is None:
+            if delta <= 0:
+                return
+            ids, co = self._neighbors[i] = (array("q"), array("q"))
+        try:
+            k = ids.index(j)
+        except ValueError:
+            # par novo: só entra se ainda houver espaço; a reconstrução
+            # periódica corrige o que ficar de fora
+            if delta > 0 and len(ids) < self.top_k:
+                ids.append(j)
+                co.append(delta)
+            return
+        co[k] += delta
+        if co[k] <= 0:
+            del ids[k]
+            del co[k]
+
+    def favorite_changed(self, music_id, user_favorites, delta):
+        """
+        Aplica um favorito adicionado (delta=1) ou removido (delta=-1).
+        ``user_favorites``: as outras músicas favoritas do usuário.
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._counts[music_id] = max(self._counts.get(music_id, 0) + delta, 0)
+            others = [m for m in user_favorites if m != music_id]
+            for other in sorted(others)[-MAX_USER_FAVORITES:]:
+                self._bump_pair(music_id, other, delta)
+                self._bump_pair(other, music_id, delta)
+
+    # -----------------------------
+    # Consulta
+    # -----------------------------
+    def recommend(self, user_favorites, k=10, max_seeds=200):
+        """Músicas mais parecidas com as favoritas do usuário (ids)."""
+        self._ensure_loaded()
+        user_favorites = set(user_favorites)
+        if not user_favorites:
+            return []
+
+        scores = defaultdict(float)
+        with self._lock:
+            counts = self._counts
+            # favoritos mais recentes (ids maiores) primeiro
+            for i in sorted(user_favorites)[-max_seeds:]:
+                ids, co = self._neighbors.get(i, ((), ()))
+                n_i = counts.get(i, 0)
+                for j, c in zip(ids, co):
+                    if j in user_favorites:
+                        continue
+                    n_j = counts.get(j, 0)
+                    if n_i and n_j:
+                        scores[j] += c / math.sqrt(n_i * n_j)
+
+        return heapq.nlargest(k, scores, key=scores.get)
@@ -0,0 +1,189 @@
+"""
+Leitura em réplicas (read/write splitting).
+
+Cada réplica é um bind do Flask-SQLAlchemy ("replica_1", ...). O
+RoutingSession escolhe, comando a comando, onde cada um roda:
+
+* só requests GET/HEAD leem das réplicas; POSTs, CLI e threads em segundo
+  plano (que leem para depois escrever) ficam no primário;
+* a sessão que escreveu (flush ou INSERT/UPDATE/DELETE direto) fica no
+  primário até o fim da transação;
+* quem escreveu há menos de ``window`` segundos lê do primário
+  (read-your-writes): a marca vai no cookie de sessão, então vale em
+  qualquer processo;
+* cada transação usa uma réplica só (round-robin entre as saudáveis), e as
+  leituras de um request veem o mesmo estado.
+
+Uma réplica só entra no rodízio depois de uma verificação (conexão e
+``check(engine)``, ex.: esquema na versão atual), refeita em segundo plano
+a cada ``check_interval`` s. Erro de conexão tira a réplica na hora (o
+request que deu com o erro falha; os seguintes já vão para outra). Sem
+réplica saudável, tudo vai para o primário.
+
+Caches em memória preenchidos a partir de uma réplica podem guardar dados
+com o atraso dela até expirarem.
+"""
+import itertools
+import logging
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import has_request_context, request, session as cookie_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+logger = logging.getLogger("harmonic.replicas")
+
+READ_METHODS = ("GET", "HEAD")
+PRIMARY_UNTIL = "_primary_until"    # chave no cookie de sessão
+
+
+class ReplicaRouter:
+    def __init__(self, keys, window=5, check_interval=10, check=None):
+        self.keys = list(keys)
+        self.window = window
+        self.check_interval = check_interval
+        self._check = check
+        self._engines = {}
+        self._healthy = []          # trocada inteira (leitura sem lock)
+        self._rr = itertools.count()
+        self._checking = threading.Lock()
+        self._next_check = 0.0
+        self.failures = dict.fromkeys(self.keys, 0)
+
+    def attach(self, engines):
+        """Recebe as engines dos binds e passa a observar os erros delas."""
+        for key in self.keys:
+            engine = self._engines[key] = engines[key]
+            event.listen(engine, "handle_error", self._error_listener(key))
+
+    def _error_listener(self, key):
+        def handle_error(context):
+            # erro ao conectar ou conexão caída: sai do rodízio na hora
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(key, context.original_exception)
+        return handle_error
+
+    # -----------------------------
+    # Escolha
+    # -----------------------------
+    def pick(self):
+        """Chave de uma réplica saudável (round-robin) ou None (primário)."""
+        if not self.keys:
+            return None
+        if time.monotonic() >= self._next_check:
+            self._check_in_background()
+        healthy = self._healthy
+        if not healthy:
+            return None
+        return healthy[next(self._rr) % len(healthy)]
+
+    def wants_primary(self):
+        """True fora de requests de leitura ou dentro da janela read-your-writes."""
+        if not has_request_context() or request.method not in READ_METHODS:
+            return True
+        return cookie_session.get(PRIMARY_UNTIL, 0) > time.time()
+
+    def wrote(self):
+        """Abre a janela read-your-writes do usuário do request atual."""
+        if has_request_context() and self.window:
+            cookie_session[PRIMARY_UNTIL] = time.time() + self.window
+
+    # -----------------------------
+    # Saúde
+    # -----------------------------
+    def mark_down(self, key, exc=None):
+        if key in self._healthy:
+            self._healthy = [k for k in self._healthy if k != key]
+            logger.warning("réplica %s fora do rodízio: %s", key, exc)
+        self.failures[key] += 1
+
+    def _probe(self, key):
+        engine = self._engines[key]
+        try:
+            with engine.connect() as conn:
+                conn.execute(sa.text("SELECT 1"))
+            return self._check is None or self._check(engine)
+        except Exception as exc:
+            logger.warning("réplica %s indisponível: %s", key, exc)
+            return False
+
+    def check_now(self):
+        """Verifica todas as réplicas (bloqueia) e atualiza o rodízio."""
+        self._next_check = time.monotonic() + self.check_interval
+        healthy = [key for key in self.keys if self._probe(key)]
+        for key in set(healthy) - set(self._healthy):
+            logger.info("réplica %s no rodízio", key)
+        self._healthy = healthy
+        return healthy
+
+    def _check_in_background(self):
+        if not self._checking.acquire(blocking=False):
+            return      # outra thread já está verificando
+
+        def run():
+            try:
+                self.check_now()
+            finally:
+                self._checking.release()
+
+        self._next_check = time.monotonic() + self.check_interval
+        threading.Thread(target=run, name="replica-check", daemon=True).start()
+
+    def after_fork(self):
+        """No processo filho: verificação nova (a thread do pai não veio junto)."""
+        self._checking = threading.Lock()
+        self._next_check = 0.0
+
+    def stats(self):
+        return {
+            "replicas": self.keys,
+            "healthy": list(self._healthy),
+            "failures": dict(self.failures),
+        }
+
+
+class RoutingSession(Session):
+    """Session do Flask-SQLAlchemy que lê das réplicas quando pode."""
+
+    def __init__(self, db, router=None, **kwargs):
+        super().__init__(db, **kwargs)
+        # sem réplicas configuradas, é a Session comum
+        self.router = router if router is not None and router.keys else None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.router is not None:
+            key = self._replica_key(clause)
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_key(self, clause):
+        if isinstance(clause, sa.UpdateBase):
+            self.info["wrote"] = True
+            return None
+        if self._flushing or self.info.get("wrote") or self.router.wants_primary():
+            return None
+        # uma réplica por transação (None = primário)
+        if "replica" not in self.info:
+            self.info["replica"] = self.router.pick()
+        return self.info["replica"]
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _committed(session):
+    if session.info.pop("wrote", False) and session.router is not None:
+        session.router.wrote()
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _transaction_ended(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("replica", None)
+        session.info.pop("wrote", None)
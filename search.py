@@ -0,0 +1,323 @@
+"""
+Índice de busca em memória do catálogo (título, artista e gênero).
+
+O banco usa a collation ``Latin1_General_100_CI_AI_SC``, então o usuário
+espera que "Luisa Sonza" ache "Luísa Sonza" e "jao" ache "Jão". Aqui o texto
+é "dobrado" (sem acento, minúsculo) e indexado por palavra:
+
+* palavra exata e prefixo: lista ordenada de palavras + bisect;
+* busca aproximada: trigramas das palavras -> palavras que os contêm.
+
+Os trigramas indexam palavras (poucas, mesmo com milhões de músicas), não
+músicas; cada palavra aponta para o conjunto de músicas que a usam.
+
+Só a primeira carga segura as buscas. Depois, a reconstrução (a cada
+``max_age`` ou após ``invalidate``) roda numa thread, uma por vez, e as
+buscas seguem no índice anterior até a troca.
+"""
+import bisect
+import functools
+import logging
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger("harmonic.search")
+
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+# peso de cada campo no ranking
+FIELD_WEIGHTS = (1.0, 0.9, 0.6)   # título, artista, gênero
+
+MAX_PREFIX_WORDS = 64      # palavras expandidas por prefixo
+MAX_FUZZY_WORDS = 32       # palavras aceitas por similaridade
+MIN_FUZZY_SIMILARITY = 0.25
+MAX_FUZZY_SCAN = 2000      # palavras comparadas por similaridade
+MAX_CANDIDATES = 500       # músicas pontuadas por consulta
+
+
+class _StripMarks(dict):
+    """Tabela de ``str.translate`` que apaga acentos combinantes (preenchida sob demanda)."""
+
+    def __missing__(self, code):
+        self[code] = None if unicodedata.combining(chr(code)) else code
+        return self[code]
+
+
+_STRIP_MARKS = _StripMarks()
+
+
+def fold(value):
+    """Remove acentos e caixa: "Jão" -> "jao"."""
+    if not value:
+        return ""
+    if value.isascii():
+        return value.lower()
+    decomposed = unicodedata.normalize("NFKD", value)
+    return decomposed.translate(_STRIP_MARKS).casefold()
+
+
+def words(value):
+    return [sys.intern(w) for w in _WORD_RE.findall(fold(value))]
+
+
+@functools.lru_cache(maxsize=100_000)
+def _name_words(value):
+    # artistas e gêneros se repetem muito: dobra cada nome uma vez só
+    return tuple(words(value))
+
+
+def trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, load_rows, max_age=900):
+        # load_rows: função que gera (id, title, artist_name, genre) do banco
+        # max_age: segundos até reconstruir (pega mudanças de outros workers)
+        self._load_rows = load_rows
+        self._max_age = max_age
+        self._lock = threading.RLock()
+        self._first_load = threading.Lock()
+        self._built_at = None
+        self._loaded = False
+        self._rebuilding = False
+        self._pending = None     # mudanças durante uma reconstrução, para reaplicar
+        self._clear()
+
+    def _clear(self):
+        self._docs = {}          # id -> (palavras do título, do artista, do gênero)
+        self._word_docs = {}     # palavra -> set(ids)
+        self._sorted_words = []  # para busca por prefixo
+        self._gram_words = {}    # trigrama -> set(palavras)
+
+    # -----------------------------
+    # Construção / atualização
+    # -----------------------------
+    def rebuild(self):
+        with self._lock:
+            self._pending = []
+        try:
+            fresh = SearchIndex(self._load_rows, self._max_age)
+            for row in self._load_rows():
+                fresh._add(*row, sort=False)
+            # palavras novas entram direto no dicionário; ordena uma vez no
+            # fim (insort a cada palavra deixaria a carga quadrática)
+            fresh._sorted_words = sorted(fresh._word_docs)
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            # o que mudou enquanto a carga lia o banco pode não estar nela
+            for music_id, fields in self._pending:
+                fresh._remove(music_id)
+                if fields is not None:
+                    fresh._add(music_id, *fields)
+            self._pending = None
+            self._docs = fresh._docs
+            self._word_docs = fresh._word_docs
+            self._sorted_words = fresh._sorted_words
+            self._gram_words = fresh._gram_words
+            self._built_at = time.monotonic()
+            self._loaded = True
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _ensure_built(self):
+        built_at = self._built_at
+        if built_at is not None and time.monotonic() - built_at <= self._max_age:
+            return
+        if not self._loaded:
+            # primeira carga: um request monta, os outros esperam por ela
+            with self._first_load:
+                if not self._loaded:
+                    self.rebuild()
+            return
+        # índice velho: uma reconstrução por vez, em segundo plano; até a
+        # troca, as buscas continuam no índice atual
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, name="search-rebuild",
+                         daemon=True).start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Falha ao reconstruir o índice de busca")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def add(self, music_id, title, artist_name, genre):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((music_id, (title, artist_name, genre)))
+            if not self._loaded:
+                return   # será carregado inteiro na primeira busca
+            self._remove(music_id)
+            self._add(music_id, title, artist_name, genre)
+
+    def remove(self, music_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((music_id, None))
+            self._remove(music_id)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _add(self, music_id, title, artist_name, genre, sort=True):
+        fields = (tuple(words(title)), _name_words(artist_name), _name_words(genre))
+        self._docs[music_id] = fields
+        for field in fields:
+            for word in field:
+                docs = self._word_docs.get(word)
+                if docs is None:
+                    docs = self._word_docs[word] = set()
+                    if sort:
+                        bisect.insort(self._sorted_words, word)
+                    for gram in trigrams(word):
+                        self._gram_words.setdefault(gram, set()).add(word)
+                docs.add(music_id)
+
+    def _remove(self, music_id):
+        fields = self._docs.pop(music_id, None)
+        if fields is None:
+            return
+        for field in fields:
+            for word in field:
+                docs = self._word_docs.get(word)
+                if docs is None:
+                    continue
+                docs.discard(music_id)
+                if docs:
+                    continue
+                del self._word_docs[word]
+                i = bisect.bisect_left(self._sorted_words, word)
+                if i < len(self._sorted_words) and self._sorted_words[i] == word:
+                    del self._sorted_words[i]
+                for gram in trigrams(word):
+                    grams = self._gram_words.get(gram)
+                    if grams is not None:
+                        grams.discard(word)
+                        if not grams:
+                            del self._gram_words[gram]
+
+    # -----------------------------
+    # Busca
+    # -----------------------------
+    def _match_word(self, query_word):
+        """Palavras do índice parecidas com ``query_word`` -> nota (0..1]."""
+        matches = {}
+        if query_word in self._word_docs:
+            matches[query_word] = 1.0
+
+        # prefixo: "sonz" -> "sonza"
+        i = bisect.bisect_left(self._sorted_words, query_word)
+        for word in self._sorted_words[i:i + MAX_PREFIX_WORDS]:
+            if not word.startswith(query_word):
+                break
+            if word not in matches:
+                matches[word] = 0.5 + 0.4 * len(query_word) / len(word)
+
+        # aproximada por trigramas: "luiza" -> "luisa" (só se não achou exata)
+        if len(query_word) >= 3 and query_word not in matches:
+            query_grams = trigrams(query_word)
+            postings = sorted(
+                (self._gram_words[gram] for gram in query_grams if gram in self._gram_words),
+                key=len,
+            )
+            # trigramas raros primeiro; quando a lista do trigrama não cabe
+            # no limite, só conta nas palavras já vistas (o custo fica em
+            # ~MAX_FUZZY_SCAN por trigrama, por mais comum que ele seja)
+            shared = {}
+            for gram_words in postings:
+                room = MAX_FUZZY_SCAN - len(shared)
+                if len(gram_words) <= room:
+                    for word in gram_words:
+                        shared[word] = shared.get(word, 0) + 1
+                    continue
+                for word in shared:
+                    if word in gram_words:
+                        shared[word] += 1
+                for word in gram_words:
+                    if room <= 0:
+                        break
+                    if word not in shared:
+                        shared[word] = 1
+                        room -= 1
+            fuzzy = []
+            for word, n in shared.items():
+                if word in matches:
+                    continue
+                # Jaccard; uma palavra com k letras tem ~k trigramas
+                similarity = n / (len(query_grams) + len(word) - n)
+                if similarity >= MIN_FUZZY_SIMILARITY:
+                    fuzzy.append((similarity, word))
+            fuzzy.sort(reverse=True)
+            for similarity, word in fuzzy[:MAX_FUZZY_WORDS]:
+                matches[word] = 0.6 * similarity
+
+        return matches
+
+    def search(self, query, limit=20):
+        """Devolve [(id, nota)] das músicas que casam com todas as palavras."""
+        self._ensure_built()
+        query_words = list(dict.fromkeys(words(query)))
+        if not query_words:
+            return []
+
+        with self._lock:
+            per_word = []
+            for query_word in query_words:
+                matches = self._match_word(query_word)
+                if not matches:
+                    return []
+                size = sum(len(self._word_docs[w]) for w in matches)
+                per_word.append((size, matches))
+
+            # candidatos vêm da palavra mais seletiva, melhores notas primeiro
+            per_word.sort(key=lambda item: item[0])
+            candidates = []
+            seen = set()
+            first = per_word[0][1]
+            for word in sorted(first, key=first.get, reverse=True):
+                for music_id in self._word_docs[word]:
+                    if music_id not in seen:
+                        seen.add(music_id)
+                        candidates.append(music_id)
+                        if len(candidates) >= MAX_CANDIDATES:
+                            break
+                else:
+                    continue
+                break
+
+            results = []
+            for music_id in candidates:
+                fields = self._docs[music_id]
+                total = 0.0
+                for _, matches in per_word:
+                    best = 0.0
+                    for weight, field in zip(FIELD_WEIGHTS, fields):
+                        for word in field:
+                            score = matches.get(word)
+                            if score and score * weight > best:
+                                best = score * weight
+                    if not best:
+                        break
+                    total += best
+                else:
+                    # títulos mais curtos primeiro no empate
+                    results.append((total - 0.001 * len(fields[0]), music_id))
+
+        results.sort(reverse=True)
+        return [(music_id, round(score, 3)) for score, music_id in results[:limit]]
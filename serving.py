@@ -0,0 +1,208 @@
+"""
+Servidor pre-fork para produção (``flask serve``).
+
+O processo mestre carrega o app uma vez, faz a preparação (banco, seed,
+índices em memória), abre o socket e cria N processos filhos com ``fork``.
+Cada filho atende com um pool fixo de threads e, logo após o fork, chama o
+``post_fork`` do app (descartar conexões herdadas do pool do SQLAlchemy,
+recriar o pool de hash de senhas, etc.). Ao encerrar, depois de esperar os
+requests, chama o ``worker_exit`` (gravar buffers pendentes).
+
+Sinais no mestre:
+
+* TERM/INT: para de aceitar conexões, espera os requests em andamento
+  (até ``graceful_timeout``) e encerra;
+* HUP: recarga sem queda — sobe filhos novos e manda os antigos terminarem
+  o que estão fazendo;
+* filho que morre sozinho é substituído.
+
+Só funciona onde existe ``os.fork`` (Linux/macOS).
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger("harmonic.serve")
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # conexões keep-alive ociosas não seguram o encerramento para sempre
+    timeout = 5
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor WSGI do werkzeug com um número fixo de threads."""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd=None):
+        super().__init__(host, port, app, handler=_RequestHandler, fd=fd)
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+        # com todas as threads ocupadas o accept espera: a conexão fica na
+        # fila do socket para outro processo pegar
+        self._free = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self._free.acquire()
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._free.release()
+
+    def drain(self, timeout):
+        """Espera os requests em andamento (até ``timeout`` segundos)."""
+        waiter = threading.Thread(target=self._executor.shutdown, kwargs={"wait": True})
+        waiter.start()
+        waiter.join(timeout)
+        return not waiter.is_alive()
+
+
+class PreforkServer:
+    def __init__(self, app, host="127.0.0.1", port=8000, workers=2, threads=8,
+                 graceful_timeout=30, post_fork=None, worker_exit=None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.post_fork = post_fork      # post_fork(slot) roda em cada filho
+        self.worker_exit = worker_exit  # worker_exit(slot) antes do filho sair
+        self._children = {}             # pid -> slot
+        self._retiring = set()          # pids da geração anterior (reload)
+        self._stopping = False
+        self._reload = False
+
+    # -----------------------------
+    # Mestre
+    # -----------------------------
+    def run(self):
+        self.socket = socket.create_server((self.host, self.port), backlog=2048)
+        self.socket.set_inheritable(True)
+        logger.info("escutando em http://%s:%s (%d processos × %d threads)",
+                    self.host, self.port, self.workers, self.threads)
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self._reload_workers()
+            self._reap()
+            time.sleep(0.2)
+
+        self._shutdown()
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_reload(self, signum, frame):
+        self._reload = True
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._worker(slot)
+            except BaseException:
+                logger.exception("processo %d (slot %d) falhou", os.getpid(), slot)
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = slot
+        logger.info("processo %d iniciado (slot %d)", pid, slot)
+
+    def _reap(self):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self._children.pop(pid, None)
+            if pid in self._retiring:
+                self._retiring.discard(pid)
+            elif slot is not None and not self._stopping:
+                logger.warning("processo %d saiu (status %d); recriando slot %d",
+                               pid, status, slot)
+                self._spawn(slot)
+
+    def _reload_workers(self):
+        old = list(self._children)
+        self._retiring.update(old)
+        for slot in range(self.workers):
+            self._spawn(slot)
+        for pid in old:
+            self._signal(pid, signal.SIGTERM)
+        logger.info("recarga: %d processos novos, %d terminando", self.workers, len(old))
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _shutdown(self):
+        logger.info("encerrando: aguardando os requests em andamento")
+        for pid in self._children:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self._children.pop(pid, None)
+            else:
+                time.sleep(0.1)
+        for pid in self._children:
+            self._signal(pid, signal.SIGKILL)
+        self.socket.close()
+
+    # -----------------------------
+    # Filho
+    # -----------------------------
+    def _worker(self, slot):
+        stop = []
+        signal.signal(signal.SIGTERM, lambda *args: stop.append(True))
+        # Ctrl+C chega ao grupo inteiro; quem decide o encerramento é o mestre
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        if self.post_fork:
+            self.post_fork(slot)
+
+        server = PooledWSGIServer(self.host, self.port, self.app, self.threads,
+                                  fd=self.socket.fileno())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        while not stop:
+            time.sleep(0.2)
+
+        server.shutdown()   # para de aceitar; os requests em andamento seguem
+        if not server.drain(self.graceful_timeout):
+            logger.warning("processo %d: requests ainda em andamento após %ss",
+                           os.getpid(), self.graceful_timeout)
+        if self.worker_exit:
+            self.worker_exit(slot)
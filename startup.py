@@ -0,0 +1,60 @@
+"""
+Partida rápida: impressão digital do esquema/seed e tempo de cada etapa.
+
+O bootstrap (criar o banco, aplicar as migrações, admin e seed) só precisa
+rodar quando algo mudou. Guardamos no próprio banco um hash dos modelos
+(tabelas, colunas, índices) e dos dados de seed; se o hash gravado é igual
+ao atual, o processo pula direto para servir.
+"""
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+
+
+def fingerprint(metadata, *parts):
+    """Hash estável das tabelas de ``metadata`` e de ``parts`` (JSON)."""
+    digest = hashlib.sha256()
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        digest.update(f"table {table.name}\n".encode("utf-8"))
+        for column in table.columns:
+            digest.update(
+                f"  {column.name} {column.type!r} null={column.nullable} "
+                f"pk={column.primary_key}\n".encode("utf-8")
+            )
+        for index in sorted(table.indexes, key=lambda ix: ix.name or ""):
+            columns = ",".join(c.name for c in index.columns)
+            digest.update(f"  index {index.name} ({columns}) unique={index.unique}\n".encode("utf-8"))
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class StartupTimer:
+    """Tempo de cada etapa da partida, para o relatório no log."""
+
+    def __init__(self):
+        self.steps = []         # (nome, segundos ou None se pulada)
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - started))
+
+    def skip(self, name):
+        self.steps.append((name, None))
+
+    @property
+    def total(self):
+        return time.perf_counter() - self._started
+
+    def report(self):
+        parts = [
+            f"{name} {seconds * 1000:.0f} ms" if seconds is not None else f"{name} (pulado)"
+            for name, seconds in self.steps
+        ]
+        return f"{self.total * 1000:.0f} ms: " + ", ".join(parts)
@@ -107,8 +107,159 @@ function openAdmin(section) {
   });
 
   document.getElementById(`admin-${section}`).style.display = "block";
+
+  // tabelas paginadas: carrega a primeira página só quando abrir
+  if (adminTables[section] && !adminTables[section].started) {
+    loadAdminPage(section);
+  }
+}
+
+// ---- TABELAS DO ADMIN (paginação por id) ----
+function td(text) {
+  const cell = document.createElement("td");
+  cell.textContent = text == null ? "" : text;
+  return cell;
+}
+
+function iconButton(label, className, onClick) {
+  const btn = document.createElement("button");
+  btn.className = className;
+  btn.textContent = label;
+  btn.addEventListener("click", onClick);
+  return btn;
+}
+
+const adminTables = {
+  users: {
+    started: false,
+    after: 0,
+    row(u) {
+      const tr = document.createElement("tr");
+      const pick = document.createElement("td");
+      if (u.can_delete) {
+        const box = document.createElement("input");
+        box.type = "checkbox";
+        box.className = "admin-user-pick";
+        box.value = u.id;
+        box.addEventListener("change", updateBulkSelection);
+        pick.appendChild(box);
+      }
+      tr.append(pick, td(u.id), td(`${u.first_name} ${u.last_name}`), td(u.email), td(u.nickname), td(u.role));
+
+      const actions = document.createElement("td");
+      actions.appendChild(iconButton("✏️", "hm-btn-icon", () =>
+        openEditModal(u.id, u.first_name, u.last_name, u.nickname, u.role)));
+      if (u.can_delete) {
+        actions.appendChild(iconButton("🗑️", "hm-btn-icon danger", () =>
+          openDeleteModal(u.id, u.nickname)));
+      }
+      tr.appendChild(actions);
+      return tr;
+    }
+  },
+  uploads: {
+    started: false,
+    after: 0,
+    row(m) {
+      const tr = document.createElement("tr");
+      tr.append(td(m.id), td(m.title), td(m.artist_name), td(m.uploader));
+      return tr;
+    }
+  }
+};
+
+async function loadAdminPage(section) {
+  const table = adminTables[section];
+  const box = document.getElementById(`admin-${section}`);
+  const tbody = document.getElementById(`admin-${section}-rows`);
+  const more = document.getElementById(`admin-${section}-more`);
+  table.started = true;
+  more.disabled = true;
+
+  try {
+    const resp = await fetch(`${box.dataset.api}?after=${table.after}`, {
+      headers: { "Accept": "application/json" }
+    });
+    if (!resp.ok) throw new Error(resp.status);
+    const page = await resp.json();
+
+    page.items.forEach(item => tbody.appendChild(table.row(item)));
+    table.after = page.next_after;
+    more.classList.toggle("hidden", page.next_after === null);
+  } catch (err) {
+    table.started = false;  // deixa tentar de novo
+    console.error("Falha ao carregar a tabela do admin:", err);
+  } finally {
+    more.disabled = false;
+  }
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  Object.keys(adminTables).forEach(section => {
+    const more = document.getElementById(`admin-${section}-more`);
+    if (more) more.addEventListener("click", () => loadAdminPage(section));
+  });
+});
+
+// ---- AÇÕES EM LOTE (usuários) ----
+function selectedUserIds() {
+  return Array.from(document.querySelectorAll(".admin-user-pick:checked"), box => Number(box.value));
 }
 
+function updateBulkSelection() {
+  const n = selectedUserIds().length;
+  document.getElementById("admin-users-selected").textContent = `${n} selecionados`;
+  document.getElementById("admin-bulk-role-btn").disabled = n === 0;
+  document.getElementById("admin-bulk-delete-btn").disabled = n === 0;
+}
+
+async function postBulk(url, payload) {
+  const resp = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", "Accept": "application/json" },
+    body: JSON.stringify(payload)
+  });
+  const data = await resp.json();
+  if (!resp.ok) throw new Error(data.error || resp.status);
+  return data;
+}
+
+// primeiro simula (dry_run) para mostrar o que será afetado; depois aplica
+async function runBulk(url, payload, describe) {
+  try {
+    const preview = await postBulk(url, { ...payload, dry_run: true });
+    if (!preview.users) {
+      alert("Nenhum usuário selecionado pode ser alterado.");
+      return;
+    }
+    if (!confirm(describe(preview))) return;
+    await postBulk(url, payload);
+    window.location.reload();
+  } catch (err) {
+    alert(`Falha na operação em lote: ${err.message}`);
+  }
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  const box = document.getElementById("admin-users");
+  if (!box) return;
+
+  document.getElementById("admin-users-all").addEventListener("change", e => {
+    document.querySelectorAll(".admin-user-pick").forEach(pick => { pick.checked = e.target.checked; });
+    updateBulkSelection();
+  });
+
+  document.getElementById("admin-bulk-delete-btn").addEventListener("click", () =>
+    runBulk(box.dataset.bulkDelete, { ids: selectedUserIds() }, r =>
+      `Excluir ${r.users} usuários, ${r.musics} músicas enviadas por eles e ${r.favorites} favoritos?`));
+
+  document.getElementById("admin-bulk-role-btn").addEventListener("click", () => {
+    const role = document.getElementById("admin-bulk-role").value;
+    runBulk(box.dataset.bulkRole, { ids: selectedUserIds(), role }, r =>
+      `Mudar a função de ${r.users} usuários para "${role}"?`);
+  });
+});
+
 function openEditModal(id, first, last, nick, role) {
   document.getElementById("edit_id").value = id;
   document.getElementById("edit_first").value = first;
@@ -132,4 +283,387 @@ function openDeleteModal(id, nickname) {
 
 function closeDeleteModal() {
   document.getElementById("deleteModal").style.display = "none";
-}
\ No newline at end of file
+}
+// ---- FAVORITOS SEM RECARREGAR A PÁGINA ----
+// O form continua funcionando sem JS (POST /favorite/<id> + redirect).
+function setFavoriteStars(musicId, favorited) {
+  document.querySelectorAll(`.hm-fav-form[data-music-id="${musicId}"] .hm-fav-btn`)
+    .forEach(btn => {
+      btn.textContent = favorited ? "★" : "☆";
+      btn.setAttribute("aria-pressed", favorited ? "true" : "false");
+    });
+}
+
+document.addEventListener("submit", async (e) => {
+  const form = e.target.closest(".hm-fav-form");
+  if (!form || !form.dataset.api) return;
+  e.preventDefault();
+
+  const btn = form.querySelector(".hm-fav-btn");
+  const wanted = btn.textContent.trim() !== "★";
+  btn.disabled = true;
+
+  try {
+    const resp = await fetch(form.dataset.api, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", "Accept": "application/json" },
+      body: JSON.stringify({ favorited: wanted })
+    });
+    if (resp.status === 401) {
+      form.submit();  // deixa o servidor redirecionar para o login
+      return;
+    }
+    if (!resp.ok) throw new Error(resp.status);
+    const data = await resp.json();
+    setFavoriteStars(data.music_id, data.favorited);
+  } catch (err) {
+    console.error("Falha ao favoritar:", err);
+  } finally {
+    btn.disabled = false;
+  }
+});
+
+// ---- DISPONIBILIDADE DE E-MAIL/CPF/NICKNAME (cadastro e perfil) ----
+(function () {
+  const inputs = document.querySelectorAll("input[data-availability]");
+  const messages = {
+    email: "Este e-mail já está em uso.",
+    cpf: "CPF já cadastrado.",
+    nickname: "Este nickname já está em uso."
+  };
+
+  inputs.forEach(input => {
+    const field = input.dataset.availability;
+    const hint = document.querySelector(`[data-availability-hint="${field}"]`);
+    let timer = null;
+
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      timer = setTimeout(async () => {
+        const value = input.value.trim();
+        if (!value) {
+          hint.classList.add("hidden");
+          return;
+        }
+        try {
+          const resp = await fetch(`/api/availability?${field}=${encodeURIComponent(value)}`);
+          if (!resp.ok) return;
+          const data = await resp.json();
+          if (input.value.trim() !== value) return;  // já digitou outra coisa
+          const free = data.available[field];
+          hint.textContent = free ? "" : messages[field];
+          hint.classList.toggle("hidden", free);
+        } catch (err) {
+          console.error("Falha ao checar disponibilidade:", err);
+        }
+      }, 300);
+    });
+  });
+})();
+
+// ---- "DESCOBRIR": MAIS MÚSICAS AO ROLAR ----
+// Os primeiros cards vêm sorteados do servidor; ao chegar perto do fim do
+// carrossel buscamos páginas de /api/musics (cursor) e acrescentamos cards.
+(function () {
+  const container = document.getElementById("carousel-discover");
+  if (!container || !container.dataset.pageApi) return;
+
+  const shown = new Set(
+    [...container.querySelectorAll(".hm-fav-form")].map(f => Number(f.dataset.musicId))
+  );
+  let cursor = null;
+  let done = false;
+  let loading = false;
+  let favorites = null;
+
+  function card(m) {
+    const div = document.createElement("div");
+    div.className = "hm-music-card";
+
+    let cover;
+    if (m.cover) {
+      cover = document.createElement("img");
+      cover.src = m.cover;
+      cover.alt = `Capa de ${m.title}`;
+      cover.loading = "lazy";
+      cover.className = "hm-music-cover";
+    } else {
+      cover = document.createElement("div");
+      cover.className = "hm-music-cover hm-music-cover--placeholder";
+      cover.textContent = "🎵";
+    }
+
+    const info = document.createElement("div");
+    info.className = "hm-music-info";
+    const title = document.createElement("div");
+    title.className = "hm-music-title";
+    title.textContent = m.title;
+    info.appendChild(title);
+    if (m.artist_name) {
+      const artist = document.createElement("div");
+      artist.className = "hm-music-artist";
+      artist.textContent = m.artist_name;
+      info.appendChild(artist);
+    }
+
+    const form = document.createElement("form");
+    form.method = "POST";
+    form.action = `/favorite/${m.id}`;
+    form.className = "hm-fav-form";
+    form.dataset.musicId = m.id;
+    form.dataset.api = `/api/favorites/${m.id}`;
+    const btn = document.createElement("button");
+    btn.type = "submit";
+    btn.className = "hm-fav-btn";
+    btn.textContent = favorites.has(m.id) ? "★" : "☆";
+    form.appendChild(btn);
+
+    div.append(cover, info, form);
+    return div;
+  }
+
+  async function loadMore() {
+    if (loading || done) return;
+    loading = true;
+    try {
+      if (favorites === null) {
+        const resp = await fetch(container.dataset.favoritesApi);
+        favorites = new Set(resp.ok ? (await resp.json()).ids : []);
+      }
+      const url = new URL(container.dataset.pageApi, window.location.origin);
+      if (cursor) url.searchParams.set("cursor", cursor);
+      const resp = await fetch(url);
+      if (!resp.ok) throw new Error(resp.status);
+      const page = await resp.json();
+
+      page.items.forEach(m => {
+        if (shown.has(m.id)) return;
+        shown.add(m.id);
+        container.appendChild(card(m));
+      });
+      cursor = page.next_cursor;
+      done = cursor === null;
+    } catch (err) {
+      console.error("Falha ao carregar mais músicas:", err);
+    } finally {
+      loading = false;
+    }
+  }
+
+  container.addEventListener("scroll", () => {
+    const remaining = container.scrollWidth - container.scrollLeft - container.clientWidth;
+    if (remaining < container.clientWidth) loadMore();
+  }, { passive: true });
+})();
+
+// ---- PLAYLIST: ARRASTAR PARA REORDENAR, CARREGAR MAIS, INCLUIR E REMOVER ----
+// Ao soltar um item mandamos só o vizinho de cima (after); o servidor grava
+// uma chave de posição nova nesse item e nada mais.
+(function () {
+  const list = document.getElementById("playlist-items");
+  if (!list) return;
+
+  const itemsApi = list.dataset.itemsApi;
+  const moreBtn = document.getElementById("playlist-more");
+  const counter = document.getElementById("playlist-count");
+  let nextAfter = list.dataset.nextAfter || null;
+  let dragged = null;
+
+  function postJSON(url, body) {
+    return fetch(url, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", "Accept": "application/json" },
+      body: JSON.stringify(body || {})
+    });
+  }
+
+  function bumpCount(delta) {
+    if (counter) counter.textContent = Number(counter.textContent) + delta;
+  }
+
+  function row(m) {
+    const li = document.createElement("li");
+    li.className = "hm-playlist-item";
+    li.draggable = true;
+    li.dataset.musicId = m.id;
+
+    const handle = document.createElement("span");
+    handle.className = "hm-playlist-handle";
+    handle.setAttribute("aria-hidden", "true");
+    handle.textContent = "☰";
+
+    let cover;
+    if (m.cover) {
+      cover = document.createElement("img");
+      cover.src = m.cover;
+      cover.alt = "";
+      cover.loading = "lazy";
+      cover.className = "hm-playlist-cover";
+    } else {
+      cover = document.createElement("div");
+      cover.className = "hm-playlist-cover hm-music-cover--placeholder";
+      cover.textContent = "🎵";
+    }
+
+    const info = document.createElement("div");
+    info.className = "hm-music-info";
+    const title = document.createElement("div");
+    title.className = "hm-music-title";
+    title.textContent = m.title;
+    info.appendChild(title);
+    if (m.artist_name) {
+      const artist = document.createElement("div");
+      artist.className = "hm-music-artist";
+      artist.textContent = m.artist_name;
+      info.appendChild(artist);
+    }
+
+    const remove = document.createElement("button");
+    remove.type = "button";
+    remove.className = "hm-playlist-remove";
+    remove.setAttribute("aria-label", "Remover da playlist");
+    remove.textContent = "✕";
+
+    li.append(handle, cover, info, remove);
+    return li;
+  }
+
+  // ---- arrastar e soltar ----
+  list.addEventListener("dragstart", (e) => {
+    dragged = e.target.closest(".hm-playlist-item");
+    if (!dragged) return;
+    dragged.classList.add("is-dragging");
+    const prev = dragged.previousElementSibling;
+    dragged.dataset.after = prev ? prev.dataset.musicId : "null";
+    e.dataTransfer.effectAllowed = "move";
+    e.dataTransfer.setData("text/plain", dragged.dataset.musicId);
+  });
+
+  list.addEventListener("dragover", (e) => {
+    if (!dragged) return;
+    e.preventDefault();
+    const over = e.target.closest(".hm-playlist-item");
+    if (!over || over === dragged) return;
+    const box = over.getBoundingClientRect();
+    const below = e.clientY > box.top + box.height / 2;
+    list.insertBefore(dragged, below ? over.nextSibling : over);
+  });
+
+  list.addEventListener("dragend", async () => {
+    if (!dragged) return;
+    const item = dragged;
+    dragged = null;
+    item.classList.remove("is-dragging");
+
+    const prev = item.previousElementSibling;
+    const after = prev ? Number(prev.dataset.musicId) : null;
+    if (item.dataset.after === String(after)) return;   // não saiu do lugar
+
+    try {
+      const resp = await postJSON(`${itemsApi}/${item.dataset.musicId}/move`, { after });
+      if (!resp.ok) throw new Error(resp.status);
+      item.dataset.after = String(after);
+    } catch (err) {
+      // conflito (outra aba mexeu na playlist) ou erro: volta ao estado do servidor
+      console.error("Falha ao mover item:", err);
+      window.location.reload();
+    }
+  });
+
+  // ---- remover ----
+  list.addEventListener("click", async (e) => {
+    const btn = e.target.closest(".hm-playlist-remove");
+    if (!btn) return;
+    const item = btn.closest(".hm-playlist-item");
+    btn.disabled = true;
+    try {
+      const resp = await postJSON(`${itemsApi}/${item.dataset.musicId}/remove`);
+      if (!resp.ok) throw new Error(resp.status);
+      const data = await resp.json();
+      item.remove();
+      if (data.removed) bumpCount(-1);
+    } catch (err) {
+      console.error("Falha ao remover item:", err);
+      btn.disabled = false;
+    }
+  });
+
+  // ---- carregar mais (keyset pela posição) ----
+  async function loadMore() {
+    if (!nextAfter) return;
+    moreBtn.disabled = true;
+    try {
+      const url = new URL(itemsApi, window.location.origin);
+      url.searchParams.set("after", nextAfter);
+      const resp = await fetch(url);
+      if (!resp.ok) throw new Error(resp.status);
+      const page = await resp.json();
+      page.items.forEach(m => list.appendChild(row(m)));
+      nextAfter = page.next_after;
+      moreBtn.classList.toggle("hidden", !nextAfter);
+    } catch (err) {
+      console.error("Falha ao carregar a playlist:", err);
+    } finally {
+      moreBtn.disabled = false;
+    }
+  }
+
+  if (moreBtn) moreBtn.addEventListener("click", loadMore);
+
+  // ---- buscar e incluir no fim ----
+  const addForm = document.getElementById("playlist-add");
+  const results = document.getElementById("playlist-results");
+  if (!addForm || !results) return;
+
+  addForm.addEventListener("submit", async (e) => {
+    e.preventDefault();
+    const q = addForm.elements.q.value.trim();
+    results.replaceChildren();
+    if (!q) return;
+    try {
+      const url = new URL(addForm.dataset.searchApi, window.location.origin);
+      url.searchParams.set("q", q);
+      url.searchParams.set("limit", "10");
+      const resp = await fetch(url);
+      if (!resp.ok) throw new Error(resp.status);
+      (await resp.json()).items.forEach(m => {
+        const li = document.createElement("li");
+        const label = document.createElement("span");
+        label.textContent = m.artist_name ? `${m.title} — ${m.artist_name}` : m.title;
+        const btn = document.createElement("button");
+        btn.type = "button";
+        btn.className = "hm-btn hm-btn--outline";
+        btn.textContent = "Adicionar";
+        btn.addEventListener("click", () => addTrack(m, btn));
+        li.append(label, btn);
+        results.appendChild(li);
+      });
+    } catch (err) {
+      console.error("Falha na busca:", err);
+    }
+  });
+
+  async function addTrack(m, btn) {
+    btn.disabled = true;
+    try {
+      const resp = await postJSON(addForm.dataset.itemsApi, { ids: [m.id] });
+      if (!resp.ok) throw new Error(resp.status);
+      const data = await resp.json();
+      btn.textContent = data.added.length ? "Adicionada" : "Já está na playlist";
+      if (!data.added.length) return;
+      bumpCount(1);
+      const empty = document.getElementById("playlist-empty");
+      if (empty) empty.remove();
+      // com páginas faltando, o item aparece quando elas forem carregadas
+      if (!nextAfter) {
+        list.appendChild(row({
+          id: m.id, title: m.title, artist_name: m.artist_name,
+          cover: m.cover_url ? `/cover/${m.id}?size=240` : null
+        }));
+      }
+    } catch (err) {
+      console.error("Falha ao incluir música:", err);
+      btn.disabled = false;
+    }
+  }
+})();
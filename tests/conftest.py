@@ -0,0 +1,143 @@
+"""
+Fixtures dos testes.
+
+O app é importado uma vez, apontando para um SQLite temporário (sem SQL
+Server), com o hash de senha na própria thread e sem tarefas periódicas.
+Cada teste que usa ``harmonic`` começa com o banco zerado (admin + seed) e
+os índices em memória recarregados.
+
+    python -m pytest -q
+"""
+import contextlib
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="harmonic-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TMP, 'harmonic.db')}",
+    "SECRET_KEY": "testes",
+    "PASSWORD_HASH_WORKERS": "0",
+    "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",   # rápido: não é o que testamos
+    "COVER_CACHE_DIR": os.path.join(_TMP, "covers"),
+    "STATS_RECONCILE_INTERVAL": "0",
+    "PLAYS_ROLLUP_INTERVAL": "0",
+})
+
+ADMIN_PASSWORD = "admin123"
+PASSWORD = "senha-forte-1"
+
+_serial = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app as harmonic
+
+    with harmonic.app.app_context():
+        harmonic.upgrade_schema()
+    return harmonic
+
+
+@pytest.fixture
+def harmonic(app_module):
+    """O módulo ``app`` com o banco zerado: só o admin e as músicas do seed."""
+    from fragments import MemoryBackend
+
+    h = app_module
+    with h.app.app_context():
+        h.db.session.remove()
+        with h.db.engine.begin() as conn:
+            for table in reversed(h.db.metadata.sorted_tables):
+                conn.execute(table.delete())
+        h.get_or_create_admin_user()
+        h.seed_default_musics()
+        h.db.session.commit()
+    h.warm_indexes()
+    h.favorite_cache.invalidate()
+    h.recommender.invalidate()
+    h.fragment_cache.backend = MemoryBackend(versions=h.CounterVersions())
+    yield h
+    with h.app.app_context():
+        h.db.session.remove()
+
+
+@pytest.fixture
+def engine(harmonic):
+    with harmonic.app.app_context():
+        return harmonic.db.engine
+
+
+@pytest.fixture
+def client(harmonic):
+    return harmonic.app.test_client()
+
+
+@pytest.fixture
+def admin_client(harmonic):
+    c = harmonic.app.test_client()
+    login(c, "admin", ADMIN_PASSWORD)
+    return c
+
+
+@contextlib.contextmanager
+def statements(engine):
+    """Lista com os comandos SQL executados em ``engine`` dentro do bloco."""
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def login(client, username, password=PASSWORD):
+    response = client.post("/login", data={"username": username, "password": password})
+    assert response.status_code == 302, response.data
+    with client.session_transaction() as sess:
+        assert sess.get("user_id"), "login recusado"
+    return response
+
+
+def register(client, role="listener", nickname=None, password=PASSWORD):
+    """Cadastra um usuário pelo formulário e devolve o nickname."""
+    n = next(_serial)
+    nickname = nickname or f"user{n}"
+    response = client.post("/register", data={
+        "firstName": "Teste", "lastName": str(n), "cpf": f"{n:011d}",
+        "email": f"{nickname}@teste.local", "userType": role, "nickname": nickname,
+        "password": password, "confirmPassword": password,
+    })
+    assert response.status_code == 302, response.data
+    return nickname
+
+
+@pytest.fixture
+def user_client(harmonic):
+    """Cliente logado como um ouvinte novo; ``user_client.user_id`` é o id."""
+    c = harmonic.app.test_client()
+    login(c, register(c))
+    with c.session_transaction() as sess:
+        c.user_id = sess["user_id"]
+    return c
+
+
+@pytest.fixture
+def artist_client(harmonic):
+    """Cliente logado como um artista novo; ``artist_client.user_id`` é o id."""
+    c = harmonic.app.test_client()
+    login(c, register(c, role="artist"))
+    with c.session_transaction() as sess:
+        c.user_id = sess["user_id"]
+    return c
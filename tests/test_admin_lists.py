@@ -0,0 +1,51 @@
+from conftest import statements
+
+
+def pages(client, url, limit):
+    items, after = [], 0
+    while True:
+        response = client.get(f"{url}?after={after}&limit={limit}")
+        assert response.status_code == 200
+        body = response.get_json()
+        items.extend(body["items"])
+        if body["next_after"] is None:
+            return items
+        after = body["next_after"]
+
+
+def test_uploads_pages_cover_every_music_once(harmonic, admin_client):
+    items = pages(admin_client, "/admin/api/uploads", limit=7)
+    with harmonic.app.app_context():
+        expected = [m.id for m in harmonic.Music.query.order_by(harmonic.Music.id)]
+    assert [item["id"] for item in items] == expected
+    assert all(item["uploader"] for item in items)
+
+
+def test_users_pages_and_delete_flags(harmonic, admin_client):
+    from conftest import register
+    for _ in range(3):
+        register(harmonic.app.test_client())
+    items = pages(admin_client, "/admin/api/users", limit=2)
+    by_nickname = {item["nickname"]: item for item in items}
+    with harmonic.app.app_context():
+        assert len(items) == harmonic.User.query.count()
+    # o próprio admin e os usuários técnicos não podem ser removidos
+    assert by_nickname["admin"]["can_delete"] is False
+    assert any(item["can_delete"] for item in items)
+    assert not any(
+        item["can_delete"] for item in items if item["email"] in harmonic.PROTECTED_EMAILS
+    )
+
+
+def test_page_is_one_query_whatever_the_size(engine, admin_client):
+    counts = []
+    for limit in (5, 50):
+        with statements(engine) as seen:
+            admin_client.get(f"/admin/api/uploads?limit={limit}")
+        counts.append(sum(1 for s in seen if "FROM musics" in s))
+    assert counts == [1, 1]
+
+
+def test_admin_lists_require_admin(user_client):
+    assert user_client.get("/admin/api/users").status_code == 403
+    assert user_client.get("/admin/api/uploads").status_code == 403
@@ -0,0 +1,124 @@
+import gzip
+import io
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import assets
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    root = tmp_path / "static"
+    write(root / "css" / "style.css", b"body { color: red; }\n" * 200)
+    write(root / "js" / "app.js", b"console.log('oi');\n" * 200)
+    img = io.BytesIO()
+    Image.new("RGB", (64, 64), "blue").save(img, "PNG")
+    write(root / "img" / "logo.png", img.getvalue())
+    return root
+
+
+def test_build_writes_hashed_files_and_manifest(static_dir):
+    files = assets.build(str(static_dir))
+    css = files["css/style.css"]
+    assert css["file"].startswith("css/style.") and css["file"].endswith(".css")
+    assert css["gzip"]
+    assert css.get("br", False) == (assets.brotli is not None)
+
+    dist = static_dir / "dist"
+    original = (static_dir / "css" / "style.css").read_bytes()
+    assert (dist / css["file"]).read_bytes() == original
+    assert gzip.decompress((dist / (css["file"] + ".gz")).read_bytes()) == original
+    assert files["img/logo.png"]["webp"].endswith(".webp")
+
+    manifest = json.loads((dist / "manifest.json").read_text())
+    assert manifest["files"] == files
+    # o que já está em dist não entra de novo
+    assert assets.build(str(static_dir)) == files
+
+
+def test_hash_follows_the_content(static_dir):
+    before = assets.build(str(static_dir))["js/app.js"]["file"]
+    write(static_dir / "js" / "app.js", b"console.log('mudou');\n")
+    assert assets.build(str(static_dir))["js/app.js"]["file"] != before
+
+
+def test_manifest_variants(static_dir):
+    files = assets.build(str(static_dir))
+    manifest = assets.Manifest.load(str(static_dir))
+    css = files["css/style.css"]["file"]
+
+    if assets.brotli is not None:
+        assert manifest.variant(css, "gzip, deflate, br") == (css + ".br", "text/css", "br")
+    assert manifest.variant(css, "gzip") == (css + ".gz", "text/css", "gzip")
+    assert manifest.variant(css) == (css, "text/css", None)
+
+    png = files["img/logo.png"]
+    assert manifest.variant(png["file"], accept="image/webp,*/*")[1] == "image/webp"
+    assert manifest.variant(png["file"])[1] == "image/png"
+    assert manifest.variant(png["webp"])[1] == "image/webp"
+    assert manifest.variant("css/style.css") is None
+
+
+def test_no_manifest_without_build(tmp_path):
+    assert assets.Manifest.load(str(tmp_path)) is None
+
+
+def test_self_hosted_fonts(static_dir, monkeypatch):
+    fetched = {
+        "https://fonts.example/css": (
+            b"@font-face { src: url(https://fonts.gstatic.com/s/inter/v1/a.woff2) }"
+        ),
+        "https://fonts.gstatic.com/s/inter/v1/a.woff2": b"wOF2 fonte",
+    }
+    monkeypatch.setattr(assets, "_fetch", fetched.__getitem__)
+    files = assets.build(str(static_dir), self_host_fonts=True,
+                         fonts_url="https://fonts.example/css")
+    font = files["fonts/a.woff2"]["file"]
+    css = (static_dir / "dist" / files["fonts/fonts.css"]["file"]).read_text()
+    assert f"url({os.path.basename(font)})" in css
+    assert "gstatic" not in css
+
+
+@pytest.fixture
+def built(harmonic, static_dir, monkeypatch):
+    assets.build(str(static_dir))
+    manifest = assets.Manifest.load(str(static_dir))
+    monkeypatch.setattr(harmonic, "asset_manifest", manifest)
+    return manifest
+
+
+def test_templates_link_hashed_assets(client, built):
+    page = client.get("/login").get_data(as_text=True)
+    hashed = built.lookup("css/style.css")
+    assert f"/assets/{hashed}" in page
+    assert "/static/css/style.css" not in page
+
+
+def test_hashed_asset_route(client, built):
+    hashed = built.lookup("css/style.css")
+    response = client.get(f"/assets/{hashed}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "max-age=31536000" in response.headers["Cache-Control"]
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+    logo = client.get(f"/assets/{built.lookup('img/logo.png')}", headers={"Accept": "image/webp"})
+    assert logo.mimetype == "image/webp"
+    assert "Accept" in logo.headers["Vary"]
+
+    assert client.get("/assets/css/nada.css").status_code == 404
+
+
+def test_without_manifest_static_is_served_directly(client, harmonic, monkeypatch):
+    monkeypatch.setattr(harmonic, "asset_manifest", None)
+    assert "/static/css/style.css" in client.get("/login").get_data(as_text=True)
+    assert client.get("/assets/css/style.css").status_code == 404
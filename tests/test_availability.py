@@ -0,0 +1,105 @@
+from availability import AvailabilityIndex, BloomFilter, normalize
+from conftest import register, statements
+
+USERS = [
+    (1, "Ana@Mail.com", "11111111111", "ana"),
+    (2, "bia@mail.com", "22222222222", "bia"),
+]
+
+
+def index(rows=USERS):
+    return AvailabilityIndex(lambda: iter(list(rows)))
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(2000)
+    keys = [f"user{i}@mail.com" for i in range(2000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"outro{i}@mail.com" in bloom for i in range(10000))
+    assert false_positives < 300   # ~1% esperado
+
+
+def test_normalize():
+    assert normalize("email", "  Ana@Mail.COM ") == "ana@mail.com"
+    assert normalize("nickname", " Ana ") == "Ana"
+    assert normalize("cpf", None) == ""
+
+
+def test_lookup_and_own_values():
+    idx = index()
+    assert not idx.is_available("email", "ANA@mail.com")
+    assert idx.is_available("email", "ana@mail.com", user_id=1)
+    assert idx.is_available("email", "carla@mail.com")
+    assert not idx.is_available("nickname", "bia")
+    assert idx.is_available("nickname", "Bia")   # nickname diferencia caixa
+    assert not idx.is_available("cpf", "22222222222")
+
+
+def test_updates_and_removals():
+    idx = index()
+    idx.is_available("email", "x")   # carrega
+    idx.set_user(1, "ana.nova@mail.com", "11111111111", "ana")
+    assert idx.is_available("email", "ana@mail.com")
+    assert not idx.is_available("email", "ana.nova@mail.com")
+    idx.set_user(3, "carla@mail.com", "33333333333", "carla")
+    assert not idx.is_available("nickname", "carla")
+    idx.remove_user(2)
+    assert idx.is_available("nickname", "bia")
+
+
+def test_growing_past_the_bloom_capacity():
+    idx = index([])
+    idx.is_available("email", "x")
+    for i in range(3000):
+        idx.set_user(i, f"u{i}@m.com", str(i), f"u{i}")
+    assert not any(idx.is_available("email", f"u{i}@m.com") for i in range(3000))
+    assert idx.is_available("email", "livre@m.com")
+
+
+def test_api_answers_without_the_database(harmonic, client, engine):
+    nickname = register(harmonic.app.test_client())
+    client.get("/api/availability?nickname=x")   # índice carregado
+    with statements(engine) as seen:
+        body = client.get(
+            f"/api/availability?nickname={nickname}&email=livre@teste.local&cpf=123"
+        ).get_json()
+    assert body == {"available": {"nickname": False, "email": True, "cpf": True}}
+    assert seen == []
+
+
+def test_api_treats_own_values_as_free(harmonic, user_client):
+    with harmonic.app.app_context():
+        user = harmonic.db.session.get(harmonic.User, user_client.user_id)
+        email, nickname = user.email, user.nickname
+    body = user_client.get(f"/api/availability?email={email.upper()}&nickname={nickname}").get_json()
+    assert body == {"available": {"email": True, "nickname": True}}
+
+
+def test_api_requires_a_field(client):
+    assert client.get("/api/availability").status_code == 400
+
+
+def test_index_follows_deletes(harmonic, admin_client, user_client):
+    with harmonic.app.app_context():
+        nickname = harmonic.db.session.get(harmonic.User, user_client.user_id).nickname
+    admin_client.post("/admin/delete_user", data={"id": user_client.user_id})
+    assert harmonic.app.test_client().get(
+        f"/api/availability?nickname={nickname}"
+    ).get_json()["available"]["nickname"] is True
+
+
+def test_register_checks_uniqueness_in_one_query(harmonic, engine):
+    client = harmonic.app.test_client()
+    nickname = register(client)
+    with statements(engine) as seen:
+        response = client.post("/register", data={
+            "firstName": "A", "lastName": "B", "cpf": "99999999999",
+            "email": "novo@teste.local", "userType": "listener", "nickname": nickname,
+            "password": "x", "confirmPassword": "x",
+        })
+    assert response.status_code == 302
+    assert len([s for s in seen if "FROM users" in s]) == 1
+    with harmonic.app.app_context():
+        assert not harmonic.User.query.filter_by(email="novo@teste.local").count()
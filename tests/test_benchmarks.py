@@ -0,0 +1,52 @@
+import pytest
+
+from benchmarks import datagen, routes
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert routes.percentile(values, 0.50) == 51
+    assert routes.percentile(values, 0.99) == 100
+    assert routes.percentile([], 0.5) == 0.0
+
+
+@pytest.fixture
+def bench(harmonic):
+    with harmonic.app.app_context():
+        counts = datagen.generate(harmonic, users=20, musics=50, favorites=60, chunk_size=7)
+    harmonic.warm_indexes()
+    return counts
+
+
+def test_generate_fills_the_tables(harmonic, bench):
+    assert bench == {"users": 20, "musics": 50, "favorites": 60}
+    with harmonic.app.app_context():
+        User, Favorite = harmonic.User, harmonic.Favorite
+        bench_users = User.query.filter(User.email.like("bench%@bench.local"))
+        assert bench_users.count() == 20
+        assert bench_users.filter_by(role="artist").count() == 20 // datagen.ARTIST_EVERY
+        assert Favorite.query.count() == 60
+        # contadores e favorite_count já reconciliados
+        stats = harmonic.read_admin_stats()
+        assert stats["total_favorites"] == 60
+        assert sum(m.favorite_count for m in harmonic.Music.query) == 60
+
+
+def test_generated_users_can_log_in(harmonic, bench):
+    request = routes.TestClientDriver(harmonic.app).session()
+    routes.login(request, "bench3@bench.local")
+
+
+@pytest.mark.parametrize("scenario", ["home", "favorite", "crud_msc", "admin_users"])
+def test_scenarios_run_without_errors(harmonic, bench, scenario):
+    data = routes.BenchData(harmonic)
+    driver = routes.TestClientDriver(harmonic.app)
+    result = routes.run_scenario(driver, data, scenario, concurrency=2, total_requests=6)
+    assert result["requests"] == 6
+    assert result["errors"] == 0
+    assert result["p50_ms"] <= result["p99_ms"]
+
+
+def test_bench_data_requires_generated_users(harmonic):
+    with pytest.raises(SystemExit):
+        routes.BenchData(harmonic)
@@ -0,0 +1,132 @@
+import pytest
+
+from conftest import login, register
+from recommend import build_neighbors
+
+
+@pytest.fixture
+def spam(harmonic, user_client):
+    """Três contas spam (uma artista com músicas favoritadas por outros)."""
+    artist = harmonic.app.test_client()
+    login(artist, register(artist, role="artist", nickname="spam_artista"))
+    for title in ("Spam 1", "Spam 2"):
+        artist.post("/crud_msc", data={"title": title, "genre": "Spam"})
+    for n in range(2):
+        c = harmonic.app.test_client()
+        login(c, register(c, nickname=f"spam_{n}"))
+        c.post("/api/favorites", json={"ids": music_ids(harmonic)[:2]})
+
+    with harmonic.app.app_context():
+        spam_music = [m.id for m in harmonic.Music.query.filter_by(genre="Spam")]
+        ids = [u.id for u in harmonic.User.query.filter(harmonic.User.nickname.like("spam%"))]
+    # um usuário legítimo favorita músicas do spam e do catálogo
+    user_client.post("/api/favorites", json={"ids": spam_music + music_ids(harmonic)[:1]})
+    return sorted(ids)
+
+
+def music_ids(harmonic):
+    with harmonic.app.app_context():
+        return [m.id for m in harmonic.Music.query.filter(
+            harmonic.Music.genre != "Spam"
+        ).order_by(harmonic.Music.id)]
+
+
+def counts(harmonic):
+    with harmonic.app.app_context():
+        return {
+            "users": harmonic.User.query.count(),
+            "musics": harmonic.Music.query.count(),
+            "favorites": harmonic.Favorite.query.count(),
+        }
+
+
+def bulk(client, action, **payload):
+    return client.post(f"/admin/api/users/bulk-{action}", json=payload)
+
+
+def test_dry_run_reports_without_writing(harmonic, admin_client, spam):
+    before = counts(harmonic)
+    body = bulk(admin_client, "delete", filter={"nickname_prefix": "spam"}, dry_run=True).get_json()
+    # 3 usuários, 2 músicas, 4 favoritos dos spams + 2 do usuário nas músicas spam
+    assert body == {"dry_run": True, "users": 3, "musics": 2, "favorites": 6}
+    assert counts(harmonic) == before
+
+    real = bulk(admin_client, "delete", ids=spam).get_json()
+    assert real == dict(body, dry_run=False)
+    after = counts(harmonic)
+    assert after == {k: before[k] - body[k] for k in before}
+
+
+def test_delete_leaves_no_orphans_and_keeps_derived_tables(harmonic, admin_client, spam, user_client):
+    bulk(admin_client, "delete", filter={"email_suffix": "@teste.local", "nickname_prefix": "spam_"})
+    with harmonic.app.app_context():
+        h = harmonic
+        assert not h.User.query.filter(h.User.id.in_(spam)).count()
+        assert not h.Favorite.query.filter(~h.Favorite.music_id.in_(
+            h.db.session.query(h.Music.id))).count()
+        assert not h.Music.query.filter_by(genre="Spam").count()
+
+        stats = h.read_admin_stats()
+        h.reconcile_stats()
+        assert h.read_admin_stats() == stats
+
+        table = {(r.music_id, r.neighbor_id): r.co_count
+                 for r in h.MusicNeighbor.query if r.co_count}
+        n, neighbors = build_neighbors(list(h.favorite_pairs()), top_k=h.app.config["RECS_TOP_K"])
+    expected = {(i, i): c for i, c in n.items()}
+    expected.update(((i, j), c) for i, row in neighbors.items() for j, c in row)
+    assert table == expected
+    assert user_client.get("/api/favorites").get_json()["ids"] == music_ids(harmonic)[:1]
+
+
+def test_admin_and_seed_accounts_are_never_selected(harmonic, admin_client, spam):
+    body = bulk(admin_client, "delete", filter={"id_min": 0}, dry_run=True).get_json()
+    with harmonic.app.app_context():
+        deletable = harmonic.User.query.filter(
+            harmonic.User.email.notin_(harmonic.PROTECTED_EMAILS),
+            harmonic.User.nickname != "admin",
+        ).count()
+    assert body["users"] == deletable
+
+
+def test_selection_is_chunked(harmonic, spam):
+    with harmonic.app.app_context():
+        by_ids = list(harmonic.selected_user_ids({"ids": spam + [999999]}, None, chunk_size=2))
+        by_filter = list(harmonic.selected_user_ids(
+            {"filter": {"nickname_prefix": "spam"}}, None, chunk_size=2
+        ))
+    assert by_ids == by_filter == [spam[:2], spam[2:]]
+
+
+def test_bulk_role(harmonic, admin_client, spam):
+    body = bulk(admin_client, "role", ids=spam, role="listener", dry_run=True).get_json()
+    assert body["users"] == 1 and body["from_roles"] == {"artist": 1}
+
+    bulk(admin_client, "role", ids=spam, role="listener")
+    with harmonic.app.app_context():
+        roles = {u.role for u in harmonic.User.query.filter(harmonic.User.id.in_(spam))}
+        stats = dict(harmonic.read_admin_stats()["users_by_role"])
+        harmonic.reconcile_stats()
+        assert dict(harmonic.read_admin_stats()["users_by_role"]) == stats
+    assert roles == {"listener"}
+
+
+@pytest.mark.parametrize("payload", [
+    [1, 2],
+    {},
+    {"ids": "1,2"},
+    {"ids": [1, True]},
+    {"filter": {}},
+    {"filter": {"senha": "x"}},
+    {"filter": {"role": 1}},
+    {"filter": {"id_min": "abc"}},
+    {"filter": {"id_min": None}},
+    {"filter": {"id_max": True}},
+])
+def test_invalid_selections(admin_client, payload):
+    assert admin_client.post("/admin/api/users/bulk-delete", json=payload).status_code == 400
+
+
+def test_invalid_role_and_non_admin(admin_client, user_client, spam):
+    assert bulk(admin_client, "role", ids=spam, role="root").status_code == 400
+    assert bulk(user_client, "delete", ids=spam).status_code == 403
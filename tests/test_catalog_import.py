@@ -0,0 +1,97 @@
+import io
+
+import pytest
+
+import catalog_import
+from catalog_import import InvalidRow
+
+
+def rows(text, fmt):
+    errors = []
+    valid = list(catalog_import.iter_valid_rows(
+        catalog_import.iter_records(io.StringIO(text), fmt), errors.append
+    ))
+    return valid, errors
+
+
+def test_detect_format():
+    assert catalog_import.detect_format("a.CSV") == "csv"
+    assert catalog_import.detect_format("a.ndjson") == "jsonl"
+    assert catalog_import.detect_format("a.txt", "jsonl") == "jsonl"
+    with pytest.raises(ValueError):
+        catalog_import.detect_format("a.txt")
+
+
+def test_csv_rows_are_cleaned():
+    valid, errors = rows("title,artist_name,genre\n  Faixa , Banda ,\n,Sem título,Pop\n", "csv")
+    assert valid == [{"title": "Faixa", "genre": None, "cover_url": None, "artist_name": "Banda"}]
+    assert [e.line for e in errors] == [3]
+
+
+def test_jsonl_reports_bad_lines_and_keeps_going():
+    text = '{"title": "Uma"}\n\n{quebrado\n[1, 2]\n{"title": "%s"}\n{"title": "Duas"}\n' % ("x" * 161)
+    valid, errors = rows(text, "jsonl")
+    assert [row["title"] for row in valid] == ["Uma", "Duas"]
+    assert [e.line for e in errors] == [3, 4, 5]
+    assert all(isinstance(e, InvalidRow) for e in errors)
+
+
+def test_chunked():
+    assert list(catalog_import.chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(catalog_import.chunked([], 3)) == []
+
+
+def music_count(harmonic):
+    with harmonic.app.app_context():
+        return harmonic.Music.query.count()
+
+
+def test_import_skips_existing_pairs_and_duplicates_in_the_batch(harmonic):
+    before = music_count(harmonic)
+    new = [
+        {"title": "Nova", "artist_name": "Banda", "genre": "Rock", "cover_url": None},
+        {"title": "Nova", "artist_name": "Banda", "genre": "Rock", "cover_url": None},
+        {"title": "Nova", "artist_name": "Outra", "genre": None, "cover_url": None},
+    ]
+    with harmonic.app.app_context():
+        artist_id = harmonic.get_or_create_seed_artist().id
+        assert harmonic.import_catalog(iter(new), artist_id, chunk_size=2) == (2, 1)
+        assert harmonic.import_catalog(iter(new), artist_id) == (0, 3)
+        stats = harmonic.read_admin_stats()
+    assert music_count(harmonic) == before + 2
+    assert stats["total_musics"] == before + 2
+
+
+def test_seed_runs_through_the_pipeline_and_is_idempotent(harmonic):
+    before = music_count(harmonic)
+    with harmonic.app.app_context():
+        inserted, skipped = harmonic.seed_default_musics()
+    assert inserted == 0
+    assert skipped == len(harmonic.SEED_TRACKS)
+    assert music_count(harmonic) == before
+
+
+def test_import_catalog_command(harmonic, tmp_path):
+    path = tmp_path / "catalogo.jsonl"
+    path.write_text(
+        "\n".join(f'{{"title": "Lote {i}", "artist_name": "Selo", "genre": "Jazz"}}' for i in range(25))
+        + '\n{"artist_name": "sem título"}\n',
+        encoding="utf-8",
+    )
+    before = music_count(harmonic)
+    result = harmonic.app.test_cli_runner().invoke(
+        args=["import-catalog", str(path), "--chunk-size", "10"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "25 inseridas, 0 duplicadas, 1 inválidas" in result.output
+    assert music_count(harmonic) == before + 25
+
+
+def test_import_catalog_command_rejects_unknown_owner(harmonic, tmp_path):
+    path = tmp_path / "catalogo.csv"
+    path.write_text("title\nFaixa\n", encoding="utf-8")
+    result = harmonic.app.test_cli_runner().invoke(
+        args=["import-catalog", str(path), "--artist-email", "ninguem@x.local"]
+    )
+    assert result.exit_code != 0
+    assert "não encontrado" in result.output
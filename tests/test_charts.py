@@ -0,0 +1,135 @@
+import random
+
+import pytest
+
+from charts import Charts, TopChart
+from conftest import login, register
+
+
+def brute_top(counts, k):
+    ranked = sorted((-n, music_id) for music_id, n in counts.items() if n > 0)
+    return [(music_id, -neg) for neg, music_id in ranked[:k]]
+
+
+def test_top_chart_orders_and_breaks_ties_by_id():
+    chart = TopChart(3, 5, [(10, 2), (11, 5), (12, 2), (13, 0)])
+    assert chart.top() == [(11, 5), (10, 2), (12, 2)]
+    chart.update(12, 6)
+    assert chart.top(2) == [(12, 6), (11, 5)]
+    chart.update(11, 0)
+    assert chart.top() == [(12, 6), (10, 2)]
+
+
+def test_top_chart_matches_brute_force_under_random_updates():
+    rng = random.Random(7)
+    counts = {music_id: rng.randint(0, 20) for music_id in range(200)}
+
+    def load(n):
+        return brute_top(counts, n)
+
+    size, capacity = 10, 15
+    chart = TopChart(size, capacity, load(capacity))
+    for _ in range(3000):
+        music_id = rng.randrange(200)
+        counts[music_id] = max(0, counts[music_id] + rng.choice((-1, 1, 1)))
+        chart.update(music_id, counts[music_id])
+        if chart.stale:
+            chart = TopChart(size, capacity, load(capacity))
+        # o que a lista mostra está certo; quando tem K, é o topo de verdade
+        shown = chart.top()
+        assert shown == brute_top(counts, size)[:len(shown)]
+        assert len(shown) == size
+
+
+def test_charts_load_all_genres_in_one_call():
+    calls = []
+    rows = [("Pop", 1, 5), ("Pop", 2, 3), ("Rock", 3, 4), (None, 4, 9)]
+
+    def load_tops(n):
+        calls.append(("tops", n))
+        return rows
+
+    def load_top(genre, n):
+        calls.append(("top", genre))
+        return []
+
+    charts = Charts(load_tops, load_top, size=2, reserve=1)
+    assert charts.top() == [(4, 9), (1, 5)]
+    assert charts.top("Pop") == [(1, 5), (2, 3)]
+    assert charts.genres() == ["Pop", "Rock"]
+    assert charts.top("Jazz") == []
+    assert calls == [("tops", 3)]
+
+    charts.update([(3, "Rock", 10), (5, "Jazz", 1)])
+    assert charts.top()[0] == (3, 10)
+    assert charts.top("Jazz") == [(5, 1)]
+
+
+def test_stale_chart_reloads_alone():
+    counts = {1: 5, 2: 4, 3: 3}
+    loaded = []
+
+    def load_top(genre, n):
+        loaded.append(genre)
+        return brute_top(counts, n)
+
+    charts = Charts(lambda n: [("Pop", m, c) for m, c in brute_top(counts, n)],
+                    load_top, size=2, reserve=0)
+    charts.top()
+    counts[1] = 0
+    charts.update([(1, "Pop", 0)])
+    assert charts.top("Pop") == [(2, 4), (3, 3)]
+    assert loaded == ["Pop"]
+
+
+@pytest.fixture
+def music_ids(harmonic):
+    with harmonic.app.app_context():
+        return [m.id for m in harmonic.Music.query.order_by(harmonic.Music.id).limit(3)]
+
+
+def favorite_counts(harmonic, ids):
+    with harmonic.app.app_context():
+        return {m.id: m.favorite_count for m in harmonic.Music.query.filter(harmonic.Music.id.in_(ids))}
+
+
+def test_favorites_move_counts_and_the_chart(harmonic, user_client, admin_client, music_ids):
+    a, b, c = music_ids
+    fan = harmonic.app.test_client()
+    login(fan, register(fan))
+    fan.post("/api/favorites", json={"ids": [a, b]})
+    user_client.post(f"/favorite/{b}")
+
+    assert favorite_counts(harmonic, music_ids) == {a: 1, b: 2, c: 0}
+    body = harmonic.app.test_client().get("/api/charts").get_json()
+    assert [(i["id"], i["favorite_count"]) for i in body["items"]][:2] == [(b, 2), (a, 1)]
+    assert "max-age=30" in harmonic.app.test_client().get("/api/charts").headers["Cache-Control"]
+
+    admin_client.post("/admin/delete_user", data={"id": user_client.user_id})
+    assert favorite_counts(harmonic, music_ids)[b] == 1
+
+
+def test_genre_chart_and_unknown_genre(harmonic, user_client, music_ids):
+    user_client.post(f"/api/favorites/{music_ids[0]}")
+    with harmonic.app.app_context():
+        genre = harmonic.db.session.get(harmonic.Music, music_ids[0]).genre
+    client = harmonic.app.test_client()
+    body = client.get("/api/charts", query_string={"genre": genre}).get_json()
+    assert [i["id"] for i in body["items"]] == [music_ids[0]]
+    assert client.get("/api/charts?genre=Inexistente").status_code == 404
+
+
+def test_rebuild_command_fixes_drift(harmonic, user_client, music_ids):
+    user_client.post(f"/api/favorites/{music_ids[0]}")
+    with harmonic.app.app_context():
+        harmonic.Music.query.update({harmonic.Music.favorite_count: 7})
+        harmonic.db.session.commit()
+    result = harmonic.app.test_cli_runner().invoke(args=["rebuild-charts", "--chunk-size", "4"])
+    assert result.exit_code == 0, result.output
+    assert favorite_counts(harmonic, music_ids) == {music_ids[0]: 1, music_ids[1]: 0, music_ids[2]: 0}
+    assert harmonic.charts.top() == [(music_ids[0], 1)]
+
+
+def test_home_shows_trending(harmonic, user_client, music_ids):
+    user_client.post(f"/api/favorites/{music_ids[0]}")
+    assert "Em alta" in user_client.get("/home").get_data(as_text=True)
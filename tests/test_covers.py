@@ -0,0 +1,165 @@
+import http.server
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from covers import CoverFetchError, CoverStore, UrlFetcher, sniff_image_type
+
+
+def png(size=(800, 600), color="red"):
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, "PNG")
+    return out.getvalue()
+
+
+class FakeFetcher:
+    timeout = 1.0
+
+    def __init__(self, files, delay=0):
+        self.files = files
+        self.delay = delay
+        self.calls = []
+
+    def fetch(self, url):
+        self.calls.append(url)
+        time.sleep(self.delay)
+        if url not in self.files:
+            raise CoverFetchError(f"404 {url}")
+        return self.files[url]
+
+
+@pytest.fixture
+def server():
+    """Servidor HTTP local que serve ``server.files`` e conta os GETs."""
+    files = {}
+    hits = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            body = files.get(self.path)
+            self.send_response(200 if body else 404)
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.files, httpd.hits = files, hits
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(png()[:12]) == "image/png"
+    assert sniff_image_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert sniff_image_type(b"<html>") is None
+
+
+def test_url_fetcher_refuses_internal_hosts(server):
+    server.files["/a.png"] = png()
+    with pytest.raises(CoverFetchError, match="interno"):
+        UrlFetcher().fetch(server.url + "/a.png")
+    with pytest.raises(CoverFetchError):
+        UrlFetcher().fetch("file:///etc/passwd")
+    assert UrlFetcher(allow_private=True).fetch(server.url + "/a.png") == server.files["/a.png"]
+
+
+def test_downloads_once_and_stores_by_content(tmp_path, server):
+    server.files["/a.png"] = server.files["/b.png"] = png()
+    store = CoverStore(str(tmp_path), UrlFetcher(allow_private=True))
+
+    first = store.get(server.url + "/a.png")
+    again = store.get(server.url + "/a.png")
+    other = store.get(server.url + "/b.png")
+    assert first == again
+    assert first[1] == "image/png"
+    assert other[0] == first[0]   # mesmo conteúdo, mesmo arquivo
+    assert server.hits == ["/a.png", "/b.png"]
+
+
+def test_thumbnails(tmp_path):
+    url = "http://capas/a.png"
+    store = CoverStore(str(tmp_path), FakeFetcher({url: png()}), sizes=(100, 300))
+    path, mimetype, etag = store.get(url, size=120)
+    assert mimetype == "image/jpeg"
+    assert etag.endswith("-100-jpeg")
+    with Image.open(path) as img:
+        assert img.size == (100, 75)
+
+    path, mimetype, _ = store.get(url, size=280, fmt="webp")
+    assert mimetype == "image/webp"
+    with Image.open(path) as img:
+        assert img.size == (300, 225)
+
+
+def test_concurrent_fetches_of_one_url_collapse(tmp_path):
+    url = "http://capas/lenta.png"
+    fetcher = FakeFetcher({url: png()}, delay=0.3)
+    store = CoverStore(str(tmp_path), fetcher)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.original(url)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fetcher.calls == [url]
+    assert len(set(results)) == 1 and len(results) == 8
+
+
+def test_failures_are_remembered_and_non_images_rejected(tmp_path):
+    fetcher = FakeFetcher({"http://capas/pagina": b"<html></html>"})
+    store = CoverStore(str(tmp_path), fetcher)
+    for _ in range(2):
+        with pytest.raises(CoverFetchError):
+            store.original("http://capas/sumiu.png")
+    with pytest.raises(CoverFetchError, match="não é uma imagem"):
+        store.original("http://capas/pagina")
+    assert fetcher.calls == ["http://capas/sumiu.png", "http://capas/pagina"]
+
+
+@pytest.fixture
+def covered(harmonic, tmp_path, monkeypatch):
+    """Uma música com capa servida por um fetcher falso."""
+    url = "https://capas.exemplo/c.png"
+    fetcher = FakeFetcher({url: png()})
+    monkeypatch.setattr(harmonic, "cover_store", CoverStore(str(tmp_path), fetcher))
+    with harmonic.app.app_context():
+        music = harmonic.Music.query.first()
+        music.cover_url = url
+        harmonic.db.session.commit()
+        return music.id, fetcher
+
+
+def test_cover_route_caches_and_revalidates(harmonic, client, covered):
+    music_id, fetcher = covered
+    response = client.get(f"/cover/{music_id}?size=240&v=abc")
+    assert response.status_code == 200
+    assert response.mimetype == "image/jpeg"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "Accept" in response.headers["Vary"]
+    etag = response.headers["ETag"]
+
+    again = client.get(f"/cover/{music_id}?size=240&v=abc", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert len(fetcher.calls) == 1
+
+    webp = client.get(f"/cover/{music_id}?size=240", headers={"Accept": "image/webp"})
+    assert webp.mimetype == "image/webp"
+    assert "immutable" not in webp.headers["Cache-Control"]
+
+
+def test_cover_route_falls_back_to_the_origin(harmonic, client, covered):
+    music_id, fetcher = covered
+    fetcher.files.clear()
+    response = client.get(f"/cover/{music_id}")
+    assert response.status_code == 302
+    assert response.headers["Location"] == "https://capas.exemplo/c.png"
+    assert client.get("/cover/999999").status_code == 404
@@ -0,0 +1,68 @@
+from discover import DiscoverSampler
+
+
+def sampler(ids):
+    return DiscoverSampler(lambda: list(ids))
+
+
+def test_sample_returns_distinct_loaded_ids():
+    s = sampler(range(1, 1001))
+    picked = s.sample(10)
+    assert len(picked) == 10
+    assert len(set(picked)) == 10
+    assert all(1 <= music_id <= 1000 for music_id in picked)
+
+
+def test_sample_skips_excluded_ids():
+    s = sampler(range(1, 1001))
+    exclude = set(range(1, 501))
+    for _ in range(20):
+        assert not set(s.sample(10, exclude=exclude)) & exclude
+
+
+def test_small_catalog_returns_every_allowed_id():
+    s = sampler(range(1, 31))
+    assert sorted(s.sample(10, exclude=set(range(1, 26)))) == [26, 27, 28, 29, 30]
+    assert s.sample(10, exclude=set(range(1, 31))) == []
+
+
+def test_mostly_excluded_catalog_is_bounded():
+    s = sampler(range(1, 100_001))
+    exclude = frozenset(range(1, 99_991))
+    picked = s.sample(10, exclude=exclude)
+    # sorteios limitados: pode voltar menos que k, nunca um excluído
+    assert len(picked) <= 10
+    assert not set(picked) & exclude
+
+
+def test_add_and_remove_keep_the_array_compact():
+    s = sampler([1, 2, 3])
+    s.sample(1)   # carrega
+    s.add(4)
+    s.add(4)
+    s.remove(2)
+    assert len(s) == 3
+    assert sorted(s.sample(10)) == [1, 3, 4]
+    assert 2 not in s and 4 in s
+
+
+def test_invalidate_reloads_from_source():
+    ids = [1, 2]
+    s = DiscoverSampler(lambda: list(ids))
+    assert sorted(s.sample(5)) == [1, 2]
+    ids.append(3)
+    s.invalidate()
+    assert sorted(s.sample(5)) == [1, 2, 3]
+
+
+def test_uploaded_music_enters_the_sampler(harmonic, artist_client):
+    artist_client.post("/crud_msc", data={"title": "Faixa Nova", "genre": "Pop"})
+    with harmonic.app.app_context():
+        music = harmonic.Music.query.filter_by(title="Faixa Nova").one()
+    assert music.id in harmonic.discover_sampler
+
+
+def test_home_renders_discover_tracks(harmonic, user_client):
+    response = user_client.get("/home")
+    assert response.status_code == 200
+    assert b"hm-music-card" in response.data
@@ -0,0 +1,125 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import exports
+
+
+def test_encode_splits_into_bounded_chunks(monkeypatch):
+    monkeypatch.setattr(exports, "CHUNK_BYTES", 64)
+    rows = [(n, f"música {n}", None) for n in range(50)]
+    for fmt in ("csv", "jsonl"):
+        chunks = list(exports.encode(fmt, ["id", "title", "genre"], iter(rows)))
+        assert len(chunks) > 5
+        assert max(len(c) for c in chunks) < 64 + 100
+        text = b"".join(chunks).decode("utf-8")
+        if fmt == "csv":
+            parsed = list(csv.reader(io.StringIO(text)))
+            assert parsed[0] == ["id", "title", "genre"]
+            assert parsed[1:] == [[str(n), f"música {n}", ""] for n in range(50)]
+        else:
+            parsed = [json.loads(line) for line in text.splitlines()]
+            assert parsed[3] == {"id": 3, "title": "música 3", "genre": None}
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        exports.encode("xml", ["id"], [])
+
+
+def test_gzip_chunks_round_trip():
+    chunks = [b"id\n"] + [f"{n}\n".encode() for n in range(1000)]
+    assert gzip.decompress(b"".join(exports.gzip_chunks(iter(chunks)))) == b"".join(chunks)
+
+
+@pytest.mark.parametrize("fmt, content, expected, kept", [
+    ("csv", b"id,title\n1,a\n2,b\n3,c", 2, b"id,title\n1,a\n2,b\n"),
+    ("csv", b"id,title\n", None, b"id,title\n"),
+    ("csv", b"", None, b""),
+    ("jsonl", b'{"id": 1}\n{"id": 7}\n{"id"', 7, b'{"id": 1}\n{"id": 7}\n'),
+])
+def test_last_exported_id_trims_partial_line(tmp_path, fmt, content, expected, kept):
+    path = tmp_path / f"out.{fmt}"
+    path.write_bytes(content)
+    assert exports.last_exported_id(path, fmt) == expected
+    assert path.read_bytes() == kept
+
+
+def user_rows(harmonic):
+    with harmonic.app.app_context():
+        return [(u.id, u.email, u.cpf) for u in harmonic.User.query.order_by(harmonic.User.id)]
+
+
+def test_export_rows_batches_and_ranges(harmonic):
+    with harmonic.app.app_context():
+        ids = [m.id for m in harmonic.Music.query.order_by(harmonic.Music.id)]
+        names, rows = harmonic.export_rows("musics", batch=3)
+        assert names[0] == "id"
+        assert [row[0] for row in rows] == ids
+
+        _, rows = harmonic.export_rows("musics", after=ids[2], until=ids[6], batch=2)
+        assert [row[0] for row in rows] == ids[3:7]
+
+
+def test_admin_export_csv_hides_sensitive_columns(harmonic, admin_client):
+    resp = admin_client.get("/admin/export/users.csv")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/csv"
+    assert "users.csv" in resp.headers["Content-Disposition"]
+    parsed = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert "cpf" not in parsed[0] and "password_hash" not in parsed[0]
+    assert [(int(r["id"]), r["email"]) for r in parsed] == [
+        (user_id, email) for user_id, email, _ in user_rows(harmonic)
+    ]
+
+    sensitive = admin_client.get("/admin/export/users.jsonl?sensitive=1")
+    lines = [json.loads(line) for line in sensitive.get_data(as_text=True).splitlines()]
+    assert [(r["id"], r["email"], r["cpf"]) for r in lines] == user_rows(harmonic)
+    assert all(r["password_hash"] for r in lines)
+
+
+def test_admin_export_gzip_and_range(harmonic, admin_client, user_client):
+    with harmonic.app.app_context():
+        music_ids = [m.id for m in harmonic.Music.query.limit(3)]
+    user_client.post("/api/favorites", json={"ids": music_ids})
+    plain = admin_client.get("/admin/export/favorites.jsonl").get_data()
+    resp = admin_client.get("/admin/export/favorites.jsonl?gzip=1")
+    assert resp.mimetype == "application/gzip"
+    assert gzip.decompress(resp.get_data()) == plain
+
+    ids = [json.loads(line)["id"] for line in plain.splitlines()]
+    ranged = admin_client.get(f"/admin/export/favorites.jsonl?after={ids[0]}&until={ids[1]}")
+    assert [json.loads(line)["id"] for line in ranged.get_data().splitlines()] == [ids[1]]
+
+
+def test_admin_export_access(admin_client, user_client):
+    assert user_client.get("/admin/export/users.csv").status_code == 403
+    assert admin_client.get("/admin/export/senhas.csv").status_code == 404
+    assert admin_client.get("/admin/export/users.xml").status_code == 404
+
+
+def test_cli_export_and_resume(harmonic, tmp_path):
+    runner = harmonic.app.test_cli_runner()
+    full = tmp_path / "musics.csv"
+    result = runner.invoke(args=["export", "musics", "-o", str(full)])
+    assert result.exit_code == 0, result.output
+    expected = full.read_bytes()
+    with harmonic.app.app_context():
+        assert expected.count(b"\n") == harmonic.Music.query.count() + 1
+
+    # simula uma exportação interrompida no meio de uma linha
+    partial = tmp_path / "partial.csv"
+    lines = expected.splitlines(keepends=True)
+    partial.write_bytes(b"".join(lines[:4]) + lines[4][:5])
+    result = runner.invoke(args=["export", "musics", "-o", str(partial), "--resume"])
+    assert result.exit_code == 0, result.output
+    assert partial.read_bytes() == expected
+
+    gz = tmp_path / "musics.csv.gz"
+    runner.invoke(args=["export", "musics", "-o", str(gz)])
+    assert gzip.decompress(gz.read_bytes()) == expected
+
+    assert runner.invoke(args=["export", "musics", "-o", str(gz), "--resume"]).exit_code != 0
@@ -0,0 +1,110 @@
+import pytest
+
+from favorites_cache import FavoriteSetCache
+
+
+def test_cache_loads_once_and_applies_writes():
+    loads = []
+
+    def load(user_id):
+        loads.append(user_id)
+        return [1, 2]
+
+    cache = FavoriteSetCache(load)
+    assert cache.get(7) == {1, 2}
+    cache.update(7, added=[3], removed=[1])
+    assert cache.get(7) == {2, 3}
+    assert loads == [7]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.update(8, added=[9])   # não carregado: nada a fazer
+    assert cache.get(8) == {1, 2}
+
+
+def test_cache_is_bounded_and_expires(monkeypatch):
+    import favorites_cache
+
+    now = [0.0]
+    monkeypatch.setattr(favorites_cache.time, "monotonic", lambda: now[0])
+    cache = FavoriteSetCache(lambda user_id: [user_id], max_users=2, ttl=10)
+    for user_id in (1, 2, 3):
+        cache.get(user_id)
+    assert list(cache._entries) == [2, 3]
+
+    now[0] = 11
+    cache.get(2)
+    assert cache.misses == 4
+
+    cache.invalidate(2)
+    assert 2 not in cache._entries
+    cache.invalidate()
+    assert not cache._entries
+
+
+@pytest.fixture
+def music_ids(harmonic):
+    with harmonic.app.app_context():
+        return [m.id for m in harmonic.Music.query.order_by(harmonic.Music.id).limit(3)]
+
+
+def stored_favorites(harmonic, user_id):
+    with harmonic.app.app_context():
+        return {
+            row.music_id for row in harmonic.Favorite.query.filter_by(user_id=user_id)
+        }
+
+
+def test_toggle_returns_the_new_state(harmonic, user_client, music_ids):
+    music_id = music_ids[0]
+    response = user_client.post(f"/api/favorites/{music_id}")
+    assert response.get_json() == {"music_id": music_id, "favorited": True}
+    assert stored_favorites(harmonic, user_client.user_id) == {music_id}
+
+    response = user_client.post(f"/api/favorites/{music_id}")
+    assert response.get_json()["favorited"] is False
+    assert stored_favorites(harmonic, user_client.user_id) == set()
+
+
+def test_explicit_state_is_idempotent(harmonic, user_client, music_ids):
+    music_id = music_ids[0]
+    for _ in range(2):
+        response = user_client.post(f"/api/favorites/{music_id}", json={"favorited": True})
+        assert response.get_json()["favorited"] is True
+    assert stored_favorites(harmonic, user_client.user_id) == {music_id}
+    assert user_client.get("/api/favorites").get_json() == {"ids": [music_id]}
+
+
+def test_batch(harmonic, user_client, music_ids):
+    response = user_client.post("/api/favorites", json={"ids": music_ids + [999999]})
+    body = response.get_json()
+    assert body["changed"] == sorted(music_ids)
+    assert body["not_found"] == [999999]
+
+    response = user_client.post("/api/favorites", json={"ids": music_ids[:2], "favorited": False})
+    assert response.get_json()["changed"] == sorted(music_ids[:2])
+    assert stored_favorites(harmonic, user_client.user_id) == {music_ids[2]}
+    assert user_client.get("/api/favorites").get_json() == {"ids": [music_ids[2]]}
+
+
+@pytest.mark.parametrize("body", [
+    [1, 2], "x", 3, {"ids": []}, {"ids": "1"}, {"ids": [True]}, {"ids": [1.5]},
+])
+def test_batch_rejects_bad_bodies(user_client, body):
+    assert user_client.post("/api/favorites", json=body).status_code == 400
+
+
+@pytest.mark.parametrize("body", [[True], "x", 1])
+def test_toggle_rejects_non_object_bodies(user_client, music_ids, body):
+    assert user_client.post(f"/api/favorites/{music_ids[0]}", json=body).status_code == 400
+
+
+def test_unknown_music_and_anonymous(client, user_client):
+    assert user_client.post("/api/favorites/999999").status_code == 404
+    assert client.post("/api/favorites/1").status_code == 401
+    assert client.get("/api/favorites").get_json() == {"ids": []}
+
+
+def test_home_stars_come_from_the_cache(harmonic, user_client, music_ids):
+    user_client.post("/api/favorites", json={"ids": music_ids})
+    assert harmonic.favorite_cache.get(user_client.user_id) == set(music_ids)
+    assert user_client.get("/home").status_code == 200
@@ -0,0 +1,88 @@
+from fragments import FragmentCache, LocalVersions, MemoryBackend
+
+
+def test_render_only_when_a_dependency_changes():
+    cache = FragmentCache(MemoryBackend())
+    renders = []
+
+    def render():
+        renders.append(1)
+        return f"<p>{len(renders)}</p>"
+
+    assert cache.get_or_render("favs", 1, ["favorites:1"], render) == "<p>1</p>"
+    assert cache.get_or_render("favs", 1, ["favorites:1"], render) == "<p>1</p>"
+    cache.bump("favorites:2")
+    assert cache.get_or_render("favs", 1, ["favorites:1"], render) == "<p>1</p>"
+    cache.bump("favorites:1")
+    assert cache.get_or_render("favs", 1, ["favorites:1"], render) == "<p>2</p>"
+    assert cache.stats()["sections"]["favs"] == {"hits": 2, "misses": 2, "hit_rate": 0.5}
+
+
+def test_memory_backend_evicts_by_bytes():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", "12345", 60)
+    backend.set("b", "ção", 60)          # 5 bytes em UTF-8
+    assert backend.info()["bytes"] == 10
+    backend.get("a")                     # "a" passa a ser o mais recente
+    backend.set("c", "x", 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == "12345"
+    backend.set("grande", "x" * 11, 60)  # maior que o cache: não entra
+    assert backend.get("grande") is None
+
+
+def test_memory_backend_expires():
+    backend = MemoryBackend()
+    backend.set("a", "x", -1)
+    assert backend.get("a") is None
+    assert backend.info()["entries"] == 0
+
+
+def test_local_versions_are_per_instance():
+    a, b = MemoryBackend(), MemoryBackend()
+    a.incr("x")
+    assert a.get_versions(["x", "y"]) == [1, 0]
+    assert b.get_versions(["x"]) == [0]
+
+
+def test_shared_versions_reach_every_backend(harmonic):
+    # dois "workers": HTML em processos diferentes, versões no banco
+    with harmonic.app.app_context():
+        one = FragmentCache(MemoryBackend(versions=harmonic.CounterVersions()))
+        two = FragmentCache(MemoryBackend(versions=harmonic.CounterVersions()))
+        assert two.get_or_render("s", 1, ["uploads:1"], lambda: "antigo") == "antigo"
+        one.bump("uploads:1")
+        assert two.get_or_render("s", 1, ["uploads:1"], lambda: "novo") == "novo"
+        assert one.backend.get_versions(["uploads:1"]) == [1]
+
+
+def section_misses(harmonic, section):
+    return harmonic.fragment_cache.stats()["sections"].get(section, {}).get("misses", 0)
+
+
+def test_home_favorites_section_follows_writes(harmonic, user_client):
+    with harmonic.app.app_context():
+        music = harmonic.Music.query.first()
+        music_id, title = music.id, music.title
+
+    user_client.get("/home")
+    misses = section_misses(harmonic, "favorites")
+    user_client.get("/home")
+    assert section_misses(harmonic, "favorites") == misses
+
+    user_client.post(f"/api/favorites/{music_id}")
+    page = user_client.get("/home").get_data(as_text=True)
+    assert section_misses(harmonic, "favorites") == misses + 1
+    assert title in page
+
+
+def test_home_artist_section_follows_uploads(harmonic, artist_client):
+    artist_client.get("/home")
+    artist_client.post("/crud_msc", data={"title": "Estreia Inédita"})
+    assert "Estreia Inédita" in artist_client.get("/home").get_data(as_text=True)
+
+
+def test_cache_stats_endpoint(harmonic, admin_client, user_client):
+    body = admin_client.get("/admin/api/cache-stats").get_json()
+    assert {"fragments", "favorite_sets", "plays", "replicas"} <= set(body)
+    assert user_client.get("/admin/api/cache-stats").status_code == 403
@@ -0,0 +1,109 @@
+import re
+
+import pytest
+
+from genres import canonical, slugify, split_genres
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Trap/R&B", [("trap", "Trap"), ("r-b", "R&B")]),
+    ("Sertanejo Pop", [("sertanejo-pop", "Sertanejo Pop")]),
+    ("Pop, pop ; POP", [("pop", "Pop")]),
+    ("Eletronica + EDM", [("eletronica", "Eletronica")]),
+    ("  rnb | Hip Hop ", [("r-b", "R&B"), ("hip-hop", "Hip Hop")]),
+    ("", []),
+    (None, []),
+    ("/ , ;", []),
+])
+def test_split_genres(raw, expected):
+    assert split_genres(raw) == expected
+
+
+def test_slug_ignores_accents_and_case():
+    assert slugify("Eletrônica") == slugify("ELETRONICA") == "eletronica"
+    assert canonical("edm") == ("eletronica", "Eletrônica")
+    assert canonical("  ") is None
+
+
+def facets(client):
+    return {g["slug"]: g["musics"] for g in client.get("/api/genres").get_json()["genres"]}
+
+
+def exact_counts(harmonic):
+    h = harmonic
+    with h.app.app_context():
+        rows = (h.db.session.query(h.Genre.slug, h.db.func.count(h.MusicGenre.music_id))
+                .join(h.MusicGenre, h.MusicGenre.genre_id == h.Genre.id)
+                .group_by(h.Genre.slug).all())
+    return dict(rows)
+
+
+def test_seed_is_linked_and_facets_are_exact(harmonic, client):
+    counts = facets(client)
+    assert counts == exact_counts(harmonic)
+    # "Trap/R&B" entra nas duas facetas
+    assert counts["trap"] >= 1 and counts["r-b"] >= 1
+    assert "trap-r-b" not in counts
+
+
+def test_upload_updates_facets(harmonic, artist_client, client):
+    before = facets(client)
+    artist_client.post("/crud_msc", data={"title": "Nova", "genre": "Trap / rnb"})
+    after = facets(client)
+    assert after["trap"] == before["trap"] + 1
+    assert after["r-b"] == before["r-b"] + 1
+    assert after == exact_counts(harmonic)
+
+
+def test_import_updates_facets(harmonic, artist_client, client):
+    with harmonic.app.app_context():
+        harmonic.import_catalog([
+            {"title": "Importada 1", "artist_name": "Banda X", "genre": "Forró/Piseiro",
+             "cover_url": None},
+            {"title": "Importada 2", "artist_name": "Banda X", "genre": "forro",
+             "cover_url": None},
+        ], artist_id=artist_client.user_id)
+    counts = facets(client)
+    assert counts["forro"] == 2 and counts["piseiro"] == 1
+    assert counts == exact_counts(harmonic)
+
+
+def titles(html):
+    return re.findall(r'hm-music-title">([^<]*)<', html)
+
+
+def test_browse_pages_newest_first(harmonic, artist_client, client, monkeypatch):
+    for n in range(5):
+        artist_client.post("/crud_msc", data={"title": f"Xote {n}", "genre": "Xote"})
+    with harmonic.app.app_context():
+        ids = {m.title: m.id for m in harmonic.Music.query.filter_by(genre="Xote")}
+    monkeypatch.setattr(harmonic, "GENRE_PAGE_SIZE", 2)
+
+    pages = []
+    query = {}
+    while True:
+        resp = client.get("/genre/xote", query_string=query)
+        assert resp.status_code == 200
+        html = resp.get_data(as_text=True)
+        pages.append(titles(html))
+        if "Mais músicas" not in html:
+            break
+        query = {"before": ids[pages[-1][-1]]}
+    assert pages == [["Xote 4", "Xote 3"], ["Xote 2", "Xote 1"], ["Xote 0"]]
+
+
+def test_unknown_genre_is_404(client):
+    assert client.get("/genre/nao-existe").status_code == 404
+
+
+def test_backfill_command_rebuilds_links(harmonic, client):
+    expected = facets(client)
+    with harmonic.app.app_context():
+        harmonic.MusicGenre.query.delete()
+        harmonic.Genre.query.update({harmonic.Genre.music_count: 0})
+        harmonic.db.session.commit()
+    assert facets(client) == {}
+
+    result = harmonic.app.test_cli_runner().invoke(args=["backfill-genres", "--chunk-size", "7"])
+    assert result.exit_code == 0, result.output
+    assert facets(client) == expected
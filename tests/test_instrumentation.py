@@ -0,0 +1,103 @@
+import logging
+
+import pytest
+from flask import Flask, render_template_string
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+from instrumentation import Histogram, RequestMetrics, normalize_statement
+
+
+def test_normalize_statement():
+    sql = "SELECT *  FROM users\n WHERE id = 42 AND name = 'O''Neil' AND x IN (?, ?, ?)"
+    assert normalize_statement(sql) == (
+        "SELECT * FROM users WHERE id = ? AND name = ? AND x IN (?, ...)"
+    )
+
+
+def test_histogram_lines_are_cumulative():
+    hist = Histogram((1, 5))
+    for value in (0.5, 3, 3, 9):
+        hist.observe(value)
+    assert list(hist.lines("m", 'endpoint="x"')) == [
+        'm_bucket{endpoint="x",le="1"} 1',
+        'm_bucket{endpoint="x",le="5"} 3',
+        'm_bucket{endpoint="x",le="+Inf"} 4',
+        'm_sum{endpoint="x"} 15.500000',
+        'm_count{endpoint="x"} 4',
+    ]
+
+
+@pytest.fixture
+def tiny():
+    """App mínimo com uma engine SQLite e a instrumentação ligada."""
+    app = Flask(__name__)
+    metrics = RequestMetrics(slow_query_ms=1000, n_plus_one_threshold=3)
+    metrics.init_app(app)
+    engine = create_engine("sqlite://")
+
+    @app.route("/one")
+    def one():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return render_template_string("{{ 'ok' }}")
+
+    @app.route("/many")
+    def many():
+        with engine.connect() as conn:
+            for i in range(4):
+                conn.execute(text(f"SELECT {i}"))
+        return "ok"
+
+    yield app, metrics
+    event.remove(Engine, "before_cursor_execute", metrics._before_execute)
+    event.remove(Engine, "after_cursor_execute", metrics._after_execute)
+
+
+def test_server_timing_header(tiny):
+    app, _ = tiny
+    timing = app.test_client().get("/one").headers["Server-Timing"]
+    assert 'desc="1 queries"' in timing
+    assert "tpl;dur=" in timing and "total;dur=" in timing
+
+
+def test_repeated_shapes_are_flagged(tiny, caplog):
+    app, metrics = tiny
+    with caplog.at_level(logging.WARNING, logger="harmonic.sql"):
+        app.test_client().get("/many")
+        app.test_client().get("/one")
+    assert [r.getMessage() for r in caplog.records] == ["provável N+1 em many: 4× SELECT ?"]
+    text_ = metrics.render_prometheus()
+    assert 'harmonic_n_plus_one_requests_total{endpoint="many"} 1' in text_
+    assert 'harmonic_request_queries_bucket{endpoint="many",le="5"} 1' in text_
+    assert 'harmonic_request_duration_seconds_count{endpoint="one"} 1' in text_
+
+
+def test_slow_queries_are_logged(tiny, caplog):
+    app, metrics = tiny
+    metrics.slow_query_seconds = 0
+    with caplog.at_level(logging.WARNING, logger="harmonic.sql"):
+        app.test_client().get("/one")
+    assert any("consulta lenta" in r.getMessage() and "SELECT ?" in r.getMessage()
+               for r in caplog.records)
+    assert 'harmonic_slow_queries_total{endpoint="one"} 1' in metrics.render_prometheus()
+
+
+def test_app_pages_carry_server_timing(user_client):
+    response = user_client.get("/home")
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+def test_metrics_endpoint_is_admin_only(admin_client, user_client):
+    admin_client.get("/home")
+    response = admin_client.get("/admin/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'harmonic_request_duration_seconds_count{endpoint="home"}' in response.get_data(as_text=True)
+    assert user_client.get("/admin/metrics").status_code == 403
+
+
+def test_admin_uploads_has_no_n_plus_one(admin_client, caplog):
+    with caplog.at_level(logging.WARNING, logger="harmonic.sql"):
+        assert admin_client.get("/admin/api/uploads?limit=50").status_code == 200
+    assert not [r for r in caplog.records if "N+1" in r.getMessage()]
@@ -0,0 +1,128 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, inspect, text
+
+import index_advisor
+from migrations import Migration, Migrator
+
+# como db.metadata: descreve o esquema final; as migrações são idempotentes
+toy = MetaData()
+Table("notes", toy, Column("id", Integer, primary_key=True), Column("body", String(20)),
+      Column("tag", String(10)))
+
+
+def _notes_up(ops):
+    ops.create_tables(["notes"])
+
+
+def _notes_down(ops):
+    ops.drop_tables(["notes"])
+
+
+def _tag_up(ops):
+    ops.add_column("notes", Column("tag", String(10)))
+    ops.create_index("notes", "ix_notes_tag", ["tag"])
+
+
+def _tag_down(ops):
+    ops.drop_index("notes", "ix_notes_tag")
+    ops.drop_column("notes", "tag")
+
+
+TOY = [Migration(1, "notes", _notes_up, _notes_down), Migration(2, "notes.tag", _tag_up, _tag_down)]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+
+
+def test_upgrade_and_downgrade_step_by_step(engine):
+    migrator = Migrator(TOY, toy)
+    assert [m.version for m in migrator.upgrade(engine, target=1)] == [1]
+    assert migrator.current(engine) == 1
+    assert [m.version for m in migrator.upgrade(engine)] == [2]
+    assert migrator.upgrade(engine) == []
+    assert [ix["name"] for ix in inspect(engine).get_indexes("notes")] == ["ix_notes_tag"]
+    assert [(m.version, done) for m, done in migrator.status(engine)] == [(1, True), (2, True)]
+
+    migrator.downgrade(engine, 1)
+    assert "tag" not in {c["name"] for c in inspect(engine).get_columns("notes")}
+    # subir de novo recria a coluna que a volta removeu
+    migrator.upgrade(engine)
+    assert "tag" in {c["name"] for c in inspect(engine).get_columns("notes")}
+
+    steps = []
+    migrator.downgrade(engine, 0, on_step=lambda action, m: steps.append((action, m.version)))
+    assert steps == [("downgrade", 2), ("downgrade", 1)]
+    assert not inspect(engine).has_table("notes")
+    assert migrator.current(engine) == 0
+
+
+def test_failed_step_is_not_recorded(engine):
+    def broken(ops):
+        ops.create_tables(["notes"])
+        raise RuntimeError("falhou no meio")
+
+    migrator = Migrator([Migration(1, "quebrada", broken, _notes_down)], toy)
+    with pytest.raises(RuntimeError):
+        migrator.upgrade(engine)
+    assert migrator.current(engine) == 0
+
+
+def test_versions_must_increase():
+    with pytest.raises(ValueError):
+        Migrator([TOY[1], TOY[0]], toy)
+
+
+def test_app_migrations_round_trip(harmonic, engine):
+    migrator = harmonic.schema_migrator
+    migrator.upgrade(engine)
+    tables = set(inspect(engine).get_table_names())
+    assert set(harmonic.db.metadata.tables) <= tables
+
+    indexed = {
+        (table, tuple(ix["column_names"]))
+        for table in ("favorites", "musics") for ix in inspect(engine).get_indexes(table)
+    }
+    assert ("favorites", ("music_id",)) in indexed
+    assert ("musics", ("artist_id",)) in indexed
+    assert ("musics", ("title", "artist_name")) in indexed
+
+    migrator.downgrade(engine, 0)
+    assert not set(harmonic.db.metadata.tables) & set(inspect(engine).get_table_names())
+    migrator.upgrade(engine)
+    assert migrator.current(engine) == migrator.head
+
+
+def test_advisor_suggests_and_applies_missing_indexes(engine):
+    meta = MetaData()
+    Table("plays", meta, Column("id", Integer, primary_key=True),
+          Column("user_id", Integer), Column("music_id", Integer))
+    meta.create_all(engine)
+
+    with index_advisor.capture(engine) as captured:
+        with engine.connect() as conn:
+            for user_id in (1, 2, 3):
+                conn.execute(text("SELECT plays.music_id FROM plays WHERE plays.user_id = :u"),
+                             {"u": user_id})
+    assert len(captured) == 1
+
+    _, suggestions = index_advisor.advise(engine, captured)
+    assert [(s.table, s.columns) for s in suggestions] == [("plays", ("user_id",))]
+    assert suggestions[0].migration_line() == (
+        'ops.create_index("plays", "ix_plays_user_id", [\'user_id\'])'
+    )
+
+    index_advisor.apply(engine, meta, suggestions)
+    assert index_advisor.advise(engine, captured)[1] == []
+
+
+def test_cli(harmonic):
+    runner = harmonic.app.test_cli_runner()
+    status = runner.invoke(args=["db-status"])
+    assert status.exit_code == 0
+    assert "[ ]" not in status.output
+
+    advisor = runner.invoke(args=["index-advisor"])
+    assert advisor.exit_code == 0, advisor.output
+    assert "formatos de comando capturados" in advisor.output
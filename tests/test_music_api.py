@@ -0,0 +1,78 @@
+import pytest
+
+from conftest import statements
+
+
+def walk(client, **params):
+    items, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        body = client.get("/api/musics", query_string=query).get_json()
+        items += body["items"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items
+
+
+@pytest.fixture
+def catalog(harmonic, artist_client):
+    # títulos repetidos e gênero vazio para exercitar os desempates
+    for title, genre in [("Igual", "Rock"), ("Igual", "Rock"), ("Sem gênero", ""), ("Aa", "")]:
+        artist_client.post("/crud_msc", data={"title": title, "genre": genre})
+    with harmonic.app.app_context():
+        return [(m.id, m.genre, m.title) for m in harmonic.Music.query]
+
+
+def test_pages_by_id_cover_the_catalog_once(client, catalog):
+    items = walk(client, limit=7, fields="id")
+    assert [item["id"] for item in items] == sorted(music_id for music_id, _, _ in catalog)
+
+
+def test_pages_by_genre_and_title(client, catalog):
+    items = walk(client, order="genre", limit=3, fields="id,genre,title")
+    expected = sorted(catalog, key=lambda m: (m[1] is not None, m[1] or "", m[2], m[0]))
+    assert [item["id"] for item in items] == [music_id for music_id, _, _ in expected]
+
+
+def test_fields_projection(client, catalog):
+    body = client.get("/api/musics?fields=title,cover&limit=2").get_json()
+    assert all(set(item) == {"title", "cover"} for item in body["items"])
+
+
+def test_every_page_is_one_catalog_query(client, engine, catalog):
+    cursor = client.get("/api/musics?limit=5").get_json()["next_cursor"]
+    with statements(engine) as seen:
+        client.get("/api/musics", query_string={"limit": 5, "cursor": cursor})
+    music_queries = [s for s in seen if "FROM musics" in s]
+    assert len(music_queries) == 1
+    # a página começa pela chave do cursor, não pulando linhas
+    assert "musics.id >" in music_queries[0]
+
+
+def test_conditional_get_follows_the_catalog_version(client, artist_client, catalog):
+    first = client.get("/api/musics")
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    again = client.get("/api/musics", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+
+    artist_client.post("/crud_msc", data={"title": "Muda a versão"})
+    changed = client.get("/api/musics", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("query", [
+    "order=title",
+    "fields=id,password_hash",
+    "cursor=@@@",
+    "cursor=eyJhIjoxfQ",          # {"a":1}: não é lista
+    "cursor=WzEsMl0",             # [1,2]: tamanho errado para order=id
+    "order=genre&cursor=WzFd",    # [1]
+    "cursor=W3t9XQ",              # [{}]
+])
+def test_bad_requests(client, catalog, query):
+    assert client.get(f"/api/musics?{query}").status_code == 400
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from conftest import PASSWORD, login, register
+from passwords import HasherBusy, PasswordHasher
+
+FAST = "pbkdf2:sha256:1000"
+
+
+def test_inline_hash_and_verify():
+    hasher = PasswordHasher(FAST, workers=0)
+    stored = hasher.hash("segredo")
+    assert stored.startswith("pbkdf2:sha256:1000$")
+    assert hasher.verify(stored, "segredo")
+    assert not hasher.verify(stored, "outro")
+
+
+def test_needs_rehash_compares_the_parameters():
+    hasher = PasswordHasher(FAST, workers=0)
+    assert not hasher.needs_rehash(generate_password_hash("x", FAST))
+    assert hasher.needs_rehash(generate_password_hash("x", "pbkdf2:sha256:500"))
+    assert hasher.needs_rehash(generate_password_hash("x", "scrypt"))
+
+
+@pytest.fixture
+def pooled():
+    hasher = PasswordHasher(FAST, workers=1, max_pending=1, timeout=0.5)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_pool_hashes_in_another_process(pooled):
+    stored = pooled.hash("segredo")
+    assert pooled.verify(stored, "segredo")
+
+
+def test_timeout_keeps_the_slot_until_the_work_ends(pooled):
+    pooled.hash("aquece")   # sobe o processo antes de medir
+    with pytest.raises(HasherBusy):
+        pooled._run(time.sleep, 1.5)
+    # o sleep ainda roda no pool: a única vaga continua ocupada
+    started = time.perf_counter()
+    with pytest.raises(HasherBusy, match="Muitas"):
+        pooled.hash("rejeitada")
+    assert time.perf_counter() - started < 0.1
+    time.sleep(1.5)
+    assert pooled.verify(pooled.hash("depois"), "depois")
+
+
+def test_after_fork_forgets_the_parent_pool(pooled):
+    pooled.hash("aquece")
+    parent = pooled._pool
+    pooled.after_fork()
+    assert pooled._pool is None
+    parent.shutdown()
+
+
+def test_login_rehashes_outdated_hashes(harmonic):
+    client = harmonic.app.test_client()
+    nickname = register(client)
+    with harmonic.app.app_context():
+        user = harmonic.User.query.filter_by(nickname=nickname).one()
+        user.password_hash = generate_password_hash(PASSWORD, "pbkdf2:sha256:500")
+        harmonic.db.session.commit()
+
+    login(client, nickname)
+    with harmonic.app.app_context():
+        stored = harmonic.User.query.filter_by(nickname=nickname).one().password_hash
+    assert stored.startswith(FAST + "$")
+
+
+def test_busy_hasher_answers_fast(harmonic, monkeypatch):
+    def busy(*args):
+        raise HasherBusy("cheio")
+
+    monkeypatch.setattr(harmonic.password_hasher, "verify", busy)
+    response = harmonic.app.test_client().post(
+        "/login", data={"username": "admin", "password": "x"}
+    )
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/login")
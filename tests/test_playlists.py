@@ -0,0 +1,207 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, literal, select
+
+import positions
+from conftest import login, register, statements
+
+
+def test_midpoint_is_strictly_between():
+    rng = random.Random(3)
+    keys = [""]
+    for _ in range(2000):
+        i = rng.randrange(len(keys))
+        low = keys[i]
+        high = keys[i + 1] if i + 1 < len(keys) else None
+        key = positions.midpoint(low, high)
+        positions.validate(key)
+        assert low < key and (high is None or key < high)
+        keys.insert(i + 1, key)
+    assert keys == sorted(keys)
+
+
+def test_same_gap_grows_slowly():
+    low, high = positions.key_after(""), positions.key_after(positions.key_after(""))
+    for _ in range(100):
+        high = positions.midpoint(low, high)
+    assert len(high) <= 30
+
+
+def test_ends_do_not_grow_keys():
+    key = positions.key_after("")
+    assert key == "i"
+    for _ in range(1000):
+        nxt = positions.key_after(key)
+        assert nxt > key and len(nxt) <= positions.WIDTH
+        key = nxt
+    key = "i"
+    for _ in range(1000):
+        prev = positions.key_before(key)
+        assert "" < prev < key and len(prev) <= positions.WIDTH
+        key = prev
+
+
+def test_full_block_opens_the_next():
+    top = "z" * positions.WIDTH
+    after = positions.key_after(top)
+    assert after > top and after.startswith(top)
+    low = positions.key_before("1")
+    assert low < "1"
+    positions.validate(low)
+
+
+def test_spread_and_keys_after():
+    keys = positions.spread(1000)
+    assert keys == sorted(keys) and len(set(keys)) == 1000
+    assert max(map(len, keys)) <= positions.WIDTH
+    for key in keys:
+        positions.validate(key)
+    assert positions.keys_after(keys[-1], 3) == sorted(positions.keys_after(keys[-1], 3))
+    assert positions.keys_after(keys[-1], 1)[0] > keys[-1]
+
+
+@pytest.mark.parametrize("key", ["", "a0", "Ab", "a-b"])
+def test_validate_rejects(key):
+    with pytest.raises(ValueError):
+        positions.validate(key)
+
+
+def test_bulk_key_in_sqlite():
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        keys = [conn.scalar(select(positions.bulk_key("i", literal(n)))) for n in (1, 9, 10)]
+    assert keys == ["i00000011", "i00000091", "i00000101"]
+    assert keys == sorted(keys) and keys[0] > "i"
+
+
+@pytest.fixture
+def playlist(harmonic, user_client):
+    resp = user_client.post("/playlists", data={"name": "Minha lista"})
+    playlist_id = int(resp.headers["Location"].rstrip("/").rsplit("/", 1)[1])
+    with harmonic.app.app_context():
+        ids = [m.id for m in harmonic.Music.query.order_by(harmonic.Music.id).limit(8)]
+    user_client.post(f"/api/playlists/{playlist_id}/items", json={"ids": ids[:6]})
+    return playlist_id, ids
+
+
+def order(client, playlist_id, limit=100):
+    result, after = [], None
+    while True:
+        query = {"limit": limit}
+        if after:
+            query["after"] = after
+        body = client.get(f"/api/playlists/{playlist_id}/items", query_string=query).get_json()
+        result += [item["id"] for item in body["items"]]
+        after = body["next_after"]
+        if after is None:
+            return result
+
+
+def item_count(harmonic, playlist_id):
+    with harmonic.app.app_context():
+        return harmonic.db.session.get(harmonic.Playlist, playlist_id).item_count
+
+
+def move(client, playlist_id, music_id, **anchor):
+    return client.post(f"/api/playlists/{playlist_id}/items/{music_id}/move", json=anchor)
+
+
+def test_append_and_keyset_pages(harmonic, user_client, playlist):
+    playlist_id, ids = playlist
+    assert order(user_client, playlist_id, limit=4) == ids[:6]
+    body = user_client.post(f"/api/playlists/{playlist_id}/items",
+                            json={"ids": [ids[6], ids[0], 999999]}).get_json()
+    assert body == {"added": [ids[6]], "not_found": [999999]}
+    assert order(user_client, playlist_id, limit=2) == ids[:7]
+    assert item_count(harmonic, playlist_id) == 7
+
+
+def test_move_rewrites_only_the_moved_row(harmonic, user_client, playlist, engine):
+    playlist_id, ids = playlist
+    a, b, c, d, e, f = ids[:6]
+    with statements(engine) as seen:
+        assert move(user_client, playlist_id, f, after=a).status_code == 200
+    updates = [s for s in seen if s.lstrip().upper().startswith("UPDATE")]
+    assert len(updates) == 1 and "playlist_items" in updates[0]
+    assert order(user_client, playlist_id) == [a, f, b, c, d, e]
+
+    move(user_client, playlist_id, c, before=a)
+    move(user_client, playlist_id, a, after=None)
+    move(user_client, playlist_id, b, after=e)
+    assert order(user_client, playlist_id) == [a, c, f, d, e, b]
+
+    # já no lugar: nada muda
+    same = move(user_client, playlist_id, c, after=a).get_json()
+    assert move(user_client, playlist_id, c, after=a).get_json() == same
+
+
+def test_many_moves_into_one_gap_renumber(harmonic, user_client, playlist, monkeypatch):
+    playlist_id, ids = playlist
+    monkeypatch.setattr(positions, "MAX_LENGTH", 4)
+    expected = order(user_client, playlist_id)
+    for _ in range(20):
+        # sempre o último para logo depois do primeiro: mesma fresta
+        last = expected.pop()
+        expected.insert(1, last)
+        assert move(user_client, playlist_id, last, after=expected[0]).status_code == 200
+    assert order(user_client, playlist_id) == expected
+    with harmonic.app.app_context():
+        keys = [p for (p,) in harmonic.db.session.query(harmonic.PlaylistItem.position)]
+    assert max(map(len, keys)) <= 4
+
+
+def test_invalid_moves(user_client, playlist):
+    playlist_id, ids = playlist
+    assert move(user_client, playlist_id, ids[0], after=ids[7]).status_code == 409
+    assert move(user_client, playlist_id, ids[7], after=ids[0]).status_code == 409
+    assert move(user_client, playlist_id, ids[0], after=ids[1], before=ids[2]).status_code == 400
+    assert move(user_client, playlist_id, ids[0], after="x").status_code == 400
+    bad_page = user_client.get(f"/api/playlists/{playlist_id}/items?after=A0")
+    assert bad_page.status_code == 400
+
+
+def test_add_favorites_in_one_statement(harmonic, user_client, playlist, engine):
+    playlist_id, ids = playlist
+    user_client.post("/api/favorites", json={"ids": [ids[7], ids[1], ids[6]]})
+    with statements(engine) as seen:
+        user_client.post(f"/playlists/{playlist_id}/add-favorites")
+    inserts = [s for s in seen if "INSERT INTO playlist_items" in s]
+    assert len(inserts) == 1 and "SELECT" in inserts[0]
+
+    # no fim, na ordem em que foram favoritados; o que já estava fica
+    assert order(user_client, playlist_id) == ids[:6] + [ids[7], ids[6]]
+    assert item_count(harmonic, playlist_id) == 8
+
+    user_client.post(f"/playlists/{playlist_id}/add-favorites")
+    assert item_count(harmonic, playlist_id) == 8
+
+    # inclusões depois do lote continuam no fim
+    user_client.post(f"/api/playlists/{playlist_id}/items/{ids[0]}/remove")
+    user_client.post(f"/api/playlists/{playlist_id}/items", json={"ids": [ids[0]]})
+    assert order(user_client, playlist_id)[-1] == ids[0]
+
+
+def test_playlists_are_private(harmonic, user_client, playlist):
+    playlist_id, ids = playlist
+    other = harmonic.app.test_client()
+    login(other, register(other))
+    assert other.get(f"/api/playlists/{playlist_id}/items").status_code == 404
+    assert other.get(f"/playlists/{playlist_id}").status_code == 404
+    assert harmonic.app.test_client().get(f"/api/playlists/{playlist_id}/items").status_code == 401
+
+
+def test_pages_rename_remove_and_delete(harmonic, user_client, playlist):
+    playlist_id, ids = playlist
+    user_client.post(f"/playlists/{playlist_id}/rename", data={"name": "Outro nome"})
+    assert "Outro nome" in user_client.get("/playlists").get_data(as_text=True)
+    assert user_client.get(f"/playlists/{playlist_id}").status_code == 200
+
+    body = user_client.post(f"/api/playlists/{playlist_id}/items/{ids[2]}/remove").get_json()
+    assert body["removed"]
+    assert item_count(harmonic, playlist_id) == 5
+
+    user_client.post(f"/playlists/{playlist_id}/delete")
+    with harmonic.app.app_context():
+        assert harmonic.db.session.get(harmonic.Playlist, playlist_id) is None
+        assert not harmonic.PlaylistItem.query.filter_by(playlist_id=playlist_id).count()
@@ -0,0 +1,216 @@
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+from plays import PlayBuffer, PlayBufferFull
+
+
+def wait_until(check, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return
+        time.sleep(0.01)
+    raise AssertionError("tempo esgotado")
+
+
+class Recorder:
+    def __init__(self, fail=0, gate=None):
+        self.batches = []
+        self.fail = fail
+        self.gate = gate
+
+    def __call__(self, rows):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("banco fora do ar")
+        self.batches.append(list(rows))
+
+    @property
+    def rows(self):
+        return [row for batch in self.batches for row in batch]
+
+
+def test_flushes_full_batches_without_waiting():
+    write = Recorder()
+    buffer = PlayBuffer(write, batch_size=3, flush_ms=60000)
+    buffer.add(list(range(6)))
+    wait_until(lambda: len(write.batches) == 2)
+    assert write.batches == [[0, 1, 2], [3, 4, 5]]
+    buffer.close()
+
+
+def test_flushes_partial_batch_after_deadline():
+    write = Recorder()
+    buffer = PlayBuffer(write, batch_size=1000, flush_ms=30)
+    buffer.add([1, 2])
+    wait_until(lambda: write.batches)
+    assert write.batches == [[1, 2]]
+    assert buffer.stats()["written"] == 2
+    buffer.close()
+
+
+def test_full_queue_rejects_whole_request():
+    gate = threading.Event()
+    write = Recorder(gate=gate)
+    buffer = PlayBuffer(write, batch_size=2, flush_ms=0, max_pending=4)
+    buffer.add([1, 2])
+    wait_until(lambda: len(buffer) == 0)    # lote 1 preso na gravação
+    buffer.add([3, 4, 5])
+    with pytest.raises(PlayBufferFull):
+        buffer.add([6, 7])
+    assert buffer.stats()["rejected"] == 2
+    gate.set()
+    buffer.close()
+    assert write.rows == [1, 2, 3, 4, 5]
+
+
+def test_failed_batch_is_retried_in_order():
+    write = Recorder(fail=2)
+    buffer = PlayBuffer(write, batch_size=10, flush_ms=0, retry_delay=0)
+    buffer.add([1, 2, 3])
+    wait_until(lambda: write.rows == [1, 2, 3])
+    stats = buffer.stats()
+    assert stats["failures"] == 2 and stats["dropped"] == 0
+    buffer.close()
+
+
+def test_close_writes_pending_rows():
+    write = Recorder()
+    buffer = PlayBuffer(write, batch_size=1000, flush_ms=60000)
+    buffer.add([1, 2, 3])
+    buffer.close()
+    assert write.rows == [1, 2, 3]
+    # depois de fechado, um add novo sobe outra thread
+    buffer.add([4])
+    buffer.close()
+    assert write.rows == [1, 2, 3, 4]
+
+
+@pytest.fixture
+def music_ids(harmonic):
+    with harmonic.app.app_context():
+        return [m.id for m in harmonic.Music.query.order_by(harmonic.Music.id).limit(3)]
+
+
+def play_count(harmonic):
+    with harmonic.app.app_context():
+        return harmonic.Play.query.count()
+
+
+def test_api_queues_and_writes_in_batches(harmonic, user_client, music_ids):
+    resp = user_client.post("/api/plays", json={"events": [
+        {"music_id": music_ids[0], "ms_played": 30000},
+        {"music_id": music_ids[1]},
+        {"music_id": 999999},
+        {"music_id": music_ids[2], "played_at": 1000},     # 1970: velho demais
+    ]})
+    assert resp.status_code == 202
+    assert resp.get_json() == {"accepted": 2, "ignored": 2}
+
+    single = user_client.post("/api/plays", data={"music_id": str(music_ids[2])})
+    assert single.get_json()["accepted"] == 1
+    harmonic.play_buffer.close()
+    with harmonic.app.app_context():
+        rows = harmonic.Play.query.order_by(harmonic.Play.id).all()
+        assert [(r.user_id, r.music_id) for r in rows] == [
+            (user_client.user_id, music_id) for music_id in music_ids
+        ]
+        assert rows[0].ms_played == 30000
+        assert rows[0].hour == rows[0].played_at.replace(minute=0, second=0, microsecond=0)
+
+
+@pytest.mark.parametrize("payload", [
+    [],
+    {"events": "x"},
+    ["x"],
+    {"ms_played": 10},
+    {"music_id": "abc"},
+    {"music_id": True},
+    {"music_id": -1},
+])
+def test_api_rejects_invalid_events(user_client, payload):
+    assert user_client.post("/api/plays", json=payload).status_code == 400
+
+
+def test_api_requires_login_and_pushes_back(harmonic, client, user_client, music_ids, monkeypatch):
+    assert client.post("/api/plays", json={"music_id": music_ids[0]}).status_code == 401
+    monkeypatch.setattr(harmonic.play_buffer, "max_pending", 0)
+    resp = user_client.post("/api/plays", json={"music_id": music_ids[0]})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "5"
+
+
+def record_plays(harmonic, user_id, music_ids, when=None):
+    with harmonic.app.app_context():
+        when = when or harmonic.utc_now()
+        harmonic.write_plays([
+            {"user_id": user_id, "music_id": music_id, "played_at": when,
+             "hour": when.replace(minute=0, second=0, microsecond=0), "ms_played": None}
+            for music_id in music_ids
+        ])
+
+
+def hourly(harmonic):
+    with harmonic.app.app_context():
+        users = {(r.user_id, r.music_id): r.plays for r in harmonic.UserPlayHour.query}
+        musics = {r.music_id: r.plays for r in harmonic.MusicPlayHour.query}
+    return users, musics
+
+
+def test_rollup_sums_each_play_once(harmonic, user_client, music_ids):
+    a, b, _ = music_ids
+    uid = user_client.user_id
+    record_plays(harmonic, uid, [a, a, b])
+    with harmonic.app.app_context():
+        # a primeira rodada só marca até onde viu; a segunda soma
+        assert harmonic.rollup_plays() == 0
+        assert harmonic.rollup_plays() == 3
+        assert harmonic.rollup_plays() == 0
+    assert hourly(harmonic) == ({(uid, a): 2, (uid, b): 1}, {a: 2, b: 1})
+
+    record_plays(harmonic, uid, [a, b, b, b, 999999])
+    with harmonic.app.app_context():
+        harmonic.rollup_plays(chunk_size=2)
+        harmonic.rollup_plays(chunk_size=2)
+    # a música que não existe fica de fora
+    assert hourly(harmonic) == ({(uid, a): 3, (uid, b): 4}, {a: 3, b: 4})
+
+
+def test_rollup_progress_is_compare_and_set(harmonic):
+    with harmonic.app.app_context():
+        assert harmonic._swap_rollup_state(None, "0:5")
+        harmonic.db.session.commit()
+        # outro rollup já gravou: quem leu o estado antigo perde a troca
+        assert not harmonic._swap_rollup_state(None, "0:7")
+        assert not harmonic._swap_rollup_state("0:0", "0:7")
+        assert harmonic._swap_rollup_state("0:5", "5:7")
+        harmonic.db.session.commit()
+
+
+def test_rollup_prunes_old_plays(harmonic, user_client, music_ids):
+    with harmonic.app.app_context():
+        old = harmonic.utc_now() - timedelta(days=harmonic.app.config["PLAYS_RETENTION_DAYS"] + 1)
+    record_plays(harmonic, user_client.user_id, music_ids[:1], when=old)
+    record_plays(harmonic, user_client.user_id, music_ids[1:2])
+    with harmonic.app.app_context():
+        harmonic.rollup_plays()
+        assert harmonic.rollup_plays() == 2
+    assert play_count(harmonic) == 1
+
+
+def test_home_shows_recent_plays(harmonic, user_client, music_ids):
+    assert 'id="hm-recent"' not in user_client.get("/home").get_data(as_text=True)
+    record_plays(harmonic, user_client.user_id, music_ids[:1])
+    runner = harmonic.app.test_cli_runner()
+    runner.invoke(args=["rollup-plays"])
+    assert "1 execuções somadas" in runner.invoke(args=["rollup-plays"]).output
+    with harmonic.app.app_context():
+        title = harmonic.db.session.get(harmonic.Music, music_ids[0]).title
+    html = user_client.get("/home").get_data(as_text=True)
+    recent = html[html.index('id="hm-recent"'):]
+    assert title in recent[:recent.index("</section>")]
@@ -0,0 +1,119 @@
+import pytest
+
+import recommend
+from conftest import login, register
+from recommend import Recommender, build_neighbors, favorite_pair_changes
+
+PAIRS = [
+    (1, 10), (1, 11), (1, 12),
+    (2, 10), (2, 11),
+    (3, 11), (3, 13),
+    (4, 10), (4, 10),   # duplicado conta uma vez
+]
+
+
+def as_sets(neighbors):
+    return {i: set(row) for i, row in neighbors.items()}
+
+
+def test_build_neighbors_counts_co_favorites():
+    counts, neighbors = build_neighbors(PAIRS)
+    assert counts == {10: 3, 11: 3, 12: 1, 13: 1}
+    assert as_sets(neighbors) == {
+        10: {(11, 2), (12, 1)},
+        11: {(10, 2), (12, 1), (13, 1)},
+        12: {(10, 1), (11, 1)},
+        13: {(11, 1)},
+    }
+
+
+def test_python_fallback_matches_numpy(monkeypatch):
+    expected_counts, expected = build_neighbors(PAIRS)
+    monkeypatch.setattr(recommend, "np", None)
+    counts, neighbors = build_neighbors(PAIRS)
+    assert counts == expected_counts
+    assert as_sets(neighbors) == as_sets(expected)
+
+
+def test_top_k_keeps_the_most_similar():
+    _, neighbors = build_neighbors(PAIRS, top_k=1)
+    # 11 ~ 10 (2 de 3 em comum) ganha de 12 e 13 (1 em comum)
+    assert neighbors[11] == [(10, 2)]
+    assert all(len(row) == 1 for row in neighbors.values())
+
+
+def test_pair_changes_count_batch_pairs_once():
+    changes = list(favorite_pair_changes([1, 2, 3, 4], added=[3, 4]))
+    assert changes == [(3, [1, 2], 1), (4, [1, 2, 3], 1)]
+
+    changes = list(favorite_pair_changes([1], removed=[2, 3]))
+    assert changes == [(2, [1, 3], -1), (3, [1], -1)]
+
+
+def test_recommend_and_incremental_changes():
+    counts, neighbors = build_neighbors(PAIRS)
+    rec = Recommender(lambda: iter(()))
+    rec.load(counts, neighbors)
+    assert sorted(rec.recommend({12}, k=2)) == [10, 11]
+    assert rec.recommend({13}) == [11]
+    assert rec.recommend(set()) == []
+
+    # usuário novo favorita 13 e 12: os dois viram vizinhos
+    rec.favorite_changed(12, [13], 1)
+    assert 12 in rec.recommend({13})
+    rec.favorite_changed(12, [13], -1)
+    assert 12 not in rec.recommend({13})
+
+
+def test_reload_reads_the_table():
+    rows = [(10, 10, 2), (11, 11, 2), (10, 11, 2), (11, 10, 2)]
+    rec = Recommender(lambda: iter(rows))
+    assert rec.recommend({10}) == [11]
+    assert len(rec) == 2
+
+
+def neighbor_table(harmonic):
+    with harmonic.app.app_context():
+        rows = harmonic.db.session.query(
+            harmonic.MusicNeighbor.music_id,
+            harmonic.MusicNeighbor.neighbor_id,
+            harmonic.MusicNeighbor.co_count,
+        ).all()
+        pairs = list(harmonic.favorite_pairs())
+    table = {(i, j): n for i, j, n in rows if n}
+    counts, neighbors = build_neighbors(pairs, top_k=harmonic.app.config["RECS_TOP_K"])
+    expected = {(i, i): n for i, n in counts.items()}
+    expected.update(((i, j), n) for i, row in neighbors.items() for j, n in row)
+    return table, expected
+
+
+@pytest.fixture
+def music_ids(harmonic):
+    with harmonic.app.app_context():
+        return [m.id for m in harmonic.Music.query.order_by(harmonic.Music.id).limit(4)]
+
+
+def test_favorite_writes_keep_the_neighbor_table(harmonic, user_client, music_ids):
+    a, b, c, d = music_ids
+    other = harmonic.app.test_client()
+    login(other, register(other))
+
+    user_client.post("/api/favorites", json={"ids": [a, b, c]})
+    other.post("/api/favorites", json={"ids": [a, d]})
+    user_client.post(f"/favorite/{d}")
+    user_client.post("/api/favorites", json={"ids": [a, b], "favorited": False})
+
+    table, expected = neighbor_table(harmonic)
+    assert table == expected
+
+
+def test_home_shows_recommendations(harmonic, user_client, music_ids):
+    a, b, c, _ = music_ids
+    other = harmonic.app.test_client()
+    login(other, register(other))
+    other.post("/api/favorites", json={"ids": [a, b, c]})
+    user_client.post(f"/api/favorites/{a}")
+
+    with harmonic.app.app_context():
+        assert set(harmonic.recommender.recommend({a})) == {b, c}
+    assert "Recomendadas para você" in user_client.get("/home").get_data(as_text=True)
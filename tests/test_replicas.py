@@ -0,0 +1,134 @@
+import time
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+
+from replicas import PRIMARY_UNTIL, ReplicaRouter, RoutingSession
+
+
+def make_app(tmp_path, window=5, check=None, keys=("replica_1", "replica_2")):
+    """App mínimo com primário e réplicas em arquivos SQLite (cada um com um conteúdo)."""
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "teste"
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config["SQLALCHEMY_BINDS"] = {key: f"sqlite:///{tmp_path / key}.db" for key in keys}
+    router = ReplicaRouter(keys, window=window, check_interval=3600, check=check)
+    db = SQLAlchemy(app, session_options={"class_": RoutingSession, "router": router})
+
+    class Note(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        body = db.Column(db.String(20))
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            db.metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(Note.__table__.insert(), {"body": key or "primary"})
+        router.attach(db.engines)
+        router.check_now()
+
+    def bodies():
+        return [n.body for n in Note.query.order_by(Note.id)]
+
+    @app.route("/read")
+    def read():
+        return jsonify(first=bodies(), second=bodies())
+
+    @app.route("/write", methods=["POST"])
+    def write():
+        before = bodies()
+        db.session.add(Note(body="nova"))
+        db.session.commit()
+        return jsonify(before=before)
+
+    @app.route("/write-on-get")
+    def write_on_get():
+        db.session.add(Note(body="nova"))
+        db.session.flush()
+        return jsonify(after=bodies())
+
+    app.db, app.router, app.bodies = db, router, bodies
+    return app
+
+
+@pytest.fixture
+def replicated(tmp_path):
+    return make_app(tmp_path)
+
+
+def where(client):
+    body = client.get("/read").get_json()
+    assert body["first"] == body["second"]      # uma réplica por transação
+    return body["first"][0]
+
+
+def test_reads_rotate_between_replicas(replicated):
+    client = replicated.test_client()
+    seen = [where(client) for _ in range(4)]
+    assert sorted(seen) == ["replica_1", "replica_1", "replica_2", "replica_2"]
+    assert seen[0] != seen[1]
+
+
+def test_writes_and_non_get_stay_on_primary(replicated):
+    client = replicated.test_client()
+    assert client.post("/write").get_json()["before"] == ["primary"]
+    assert client.get("/write-on-get").get_json()["after"] == ["primary", "nova", "nova"]
+    with replicated.app_context():
+        assert replicated.bodies()[0] == "primary"
+
+
+def test_read_your_writes_window(tmp_path):
+    app = make_app(tmp_path, window=0.3)
+    writer, other = app.test_client(), app.test_client()
+    writer.post("/write")
+    with writer.session_transaction() as sess:
+        assert sess[PRIMARY_UNTIL] > time.time()
+    assert where(writer) == "primary"
+    assert where(other).startswith("replica_")
+    time.sleep(0.35)
+    assert where(writer).startswith("replica_")
+
+
+def test_unhealthy_replicas_fall_back_to_primary(tmp_path):
+    app = make_app(tmp_path, check=lambda engine: "replica_2" not in str(engine.url))
+    client = app.test_client()
+    assert {where(client) for _ in range(3)} == {"replica_1"}
+
+    app.router.mark_down("replica_1", RuntimeError("caiu"))
+    assert where(client) == "primary"
+    assert app.router.stats() == {
+        "replicas": ["replica_1", "replica_2"], "healthy": [],
+        "failures": {"replica_1": 1, "replica_2": 0},
+    }
+    # a próxima verificação devolve a réplica ao rodízio
+    app.router.check_now()
+    assert where(client) == "replica_1"
+
+
+def test_unreachable_replica_is_not_used(tmp_path):
+    app = make_app(tmp_path)
+    broken = sa.create_engine(f"sqlite:///{tmp_path / 'nao-existe' / 'replica.db'}")
+    with app.app_context():
+        app.router.attach({"replica_1": app.db.engines["replica_1"], "replica_2": broken})
+    assert app.router.check_now() == ["replica_1"]
+    assert {where(app.test_client()) for _ in range(3)} == {"replica_1"}
+
+
+def test_without_replicas_it_is_a_plain_session(tmp_path):
+    app = make_app(tmp_path, keys=())
+    assert where(app.test_client()) == "primary"
+    with app.app_context():
+        assert app.db.session().router is None
+
+
+def test_app_reports_replica_health(admin_client):
+    stats = admin_client.get("/admin/api/cache-stats").get_json()
+    assert stats["replicas"] == {"replicas": [], "healthy": [], "failures": {}}
+
+
+def test_sync_replicas_needs_replicas(harmonic):
+    result = harmonic.app.test_cli_runner().invoke(args=["sync-replicas"])
+    assert result.exit_code != 0
+    assert "Nenhuma réplica configurada" in result.output
@@ -0,0 +1,126 @@
+import threading
+
+from search import SearchIndex, fold, trigrams, words
+
+ROWS = [
+    (1, "Garupa", "Luísa Sonza", "Pop"),
+    (2, "Idiota", "Jão", "Pop"),
+    (3, "Sonzeira", "Outro Artista", "Funk"),
+    (4, "Águas de Março", "Elis Regina", "MPB"),
+]
+
+
+def index(rows=ROWS):
+    return SearchIndex(lambda: iter(list(rows)))
+
+
+def ids(hits):
+    return [music_id for music_id, _ in hits]
+
+
+def test_fold_and_words():
+    assert fold("Jão") == "jao"
+    assert fold("ÁGUAS") == "aguas"
+    assert fold(None) == ""
+    assert words("Águas de Março!") == ["aguas", "de", "marco"]
+    assert trigrams("jao") == {" ja", "jao", "ao "}
+
+
+def test_accent_and_case_insensitive():
+    s = index()
+    assert ids(s.search("Luisa Sonza")) == [1]
+    assert ids(s.search("jao")) == [2]
+    assert ids(s.search("AGUAS marco")) == [4]
+
+
+def test_every_word_must_match():
+    s = index()
+    assert ids(s.search("sonza idiota")) == []
+    assert ids(s.search("pop jao")) == [2]
+
+
+def test_exact_ranks_above_prefix():
+    s = index()
+    assert sorted(ids(s.search("sonz"))) == [1, 3]
+    hits = dict(s.search("sonza"))
+    assert hits[1] > hits.get(3, 0)
+
+
+def test_fuzzy_match():
+    s = index()
+    assert ids(s.search("luiza")) == [1]
+    assert ids(s.search("xyzw")) == []
+
+
+def test_title_outweighs_genre():
+    s = index([(1, "Pop Star", "A", "Rock"), (2, "Outra", "B", "Pop")])
+    assert ids(s.search("pop")) == [1, 2]
+
+
+def test_add_and_remove_are_incremental():
+    s = index()
+    s.search("x")    # carrega
+    s.add(5, "Nova Faixa", "Jão", "Pop")
+    assert sorted(ids(s.search("jao"))) == [2, 5]
+    s.add(5, "Renomeada", "Jão", "Pop")
+    assert ids(s.search("nova")) == []
+    s.remove(2)
+    assert ids(s.search("idiota")) == []
+    assert ids(s.search("jao")) == [5]
+    assert len(s) == 4
+
+
+def test_stale_index_rebuilds_once_in_background_and_keeps_serving():
+    rows = list(ROWS)
+    release = threading.Event()
+    started = threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        if len(loads) > 1:
+            started.set()
+            release.wait(5)
+        return iter(list(rows))
+
+    s = SearchIndex(load)
+    assert ids(s.search("jao")) == [2]
+
+    rows.append((9, "Do Banco", "Jão", "Pop"))
+    s.invalidate()
+    for _ in range(5):
+        # o índice antigo continua respondendo durante a reconstrução
+        assert ids(s.search("jao")) == [2]
+    assert started.wait(5)
+
+    # mudança feita durante a carga é reaplicada no índice novo
+    s.add(10, "Durante", "Jão", "Pop")
+    s.remove(2)
+    release.set()
+    for _ in range(100):
+        if not s._rebuilding:
+            break
+        threading.Event().wait(0.05)
+
+    assert len(loads) == 2
+    assert sorted(ids(s.search("jao"))) == [9, 10]
+
+
+def test_search_api_and_page(harmonic, artist_client):
+    artist_client.post("/crud_msc", data={
+        "title": "Canção Única", "artist_name": "Zé Ninguém", "genre": "Forró",
+    })
+    response = harmonic.app.test_client().get("/api/search?q=cancao unica")
+    assert response.status_code == 200
+    items = response.get_json()["items"]
+    assert [item["title"] for item in items] == ["Canção Única"]
+    assert items[0]["artist_name"] == "Zé Ninguém"
+
+    page = harmonic.app.test_client().get("/search?q=ze ninguem")
+    assert page.status_code == 200
+    assert "Canção Única" in page.get_data(as_text=True)
+
+
+def test_search_api_empty_query(harmonic):
+    response = harmonic.app.test_client().get("/api/search?q=")
+    assert response.get_json()["items"] == []
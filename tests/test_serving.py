@@ -0,0 +1,125 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from conftest import ROOT
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="precisa de fork")
+
+SERVER = textwrap.dedent("""
+    import os, sys, time
+    sys.path.insert(0, {root!r})
+    from serving import PreforkServer
+
+    def app(environ, start_response):
+        if environ["PATH_INFO"] == "/slow":
+            time.sleep(1.5)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [str(os.getpid()).encode()]
+
+    def post_fork(slot):
+        print("fork", slot, os.getpid(), flush=True)
+
+    def worker_exit(slot):
+        print("exit", slot, os.getpid(), flush=True)
+
+    PreforkServer(app, port={port}, workers=2, threads=4, graceful_timeout=5,
+                  post_fork=post_fork, worker_exit=worker_exit).run()
+""")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(port, path="/"):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10) as resp:
+        return int(resp.read())
+
+
+def wait_until(check, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            result = check()
+            if result:
+                return result
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("tempo esgotado")
+
+
+def pids(port, n=40):
+    return {get(port) for _ in range(n)}
+
+
+@pytest.fixture
+def server(tmp_path):
+    port = free_port()
+    script = tmp_path / "server.py"
+    script.write_text(SERVER.format(root=ROOT, port=port))
+    proc = subprocess.Popen([sys.executable, str(script)], stdout=subprocess.PIPE, text=True)
+    proc.port = port
+    wait_until(lambda: get(port))
+    yield proc
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+
+
+def test_workers_are_forked_and_serve(server):
+    # as conexões se espalham pelos processos filhos, nunca pelo mestre
+    seen = wait_until(lambda: len(pids(server.port)) == 2 and pids(server.port))
+    assert server.pid not in seen
+
+
+def test_dead_worker_is_replaced(server):
+    victim = get(server.port)
+    os.kill(victim, signal.SIGKILL)
+    wait_until(lambda: victim not in pids(server.port) and len(pids(server.port)) == 2)
+
+
+def test_reload_replaces_workers(server):
+    before = wait_until(lambda: len(pids(server.port)) == 2 and pids(server.port))
+    server.send_signal(signal.SIGHUP)
+    wait_until(lambda: not pids(server.port) & before)
+
+
+def test_shutdown_finishes_in_flight_requests(server):
+    result = []
+    slow = threading.Thread(target=lambda: result.append(get(server.port, "/slow")))
+    slow.start()
+    time.sleep(0.3)
+    server.send_signal(signal.SIGTERM)
+    slow.join(10)
+    assert result, "request em andamento foi derrubado"
+    assert server.wait(15) == 0
+    out = server.stdout.read()
+    assert out.count("fork") == 2
+    assert out.count("exit") == 2
+
+
+def test_engine_pool_options(harmonic):
+    options = harmonic.app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    assert options["pool_pre_ping"] is True
+    assert options["pool_recycle"] == 1800
+
+
+def test_after_fork_resets_process_state(harmonic):
+    with harmonic.app.app_context():
+        harmonic.db.session.execute(harmonic.db.text("SELECT 1"))
+        harmonic.db.session.remove()
+    harmonic.after_fork(slot=1)
+    # o app segue funcionando com as conexões novas
+    assert harmonic.app.test_client().get("/api/musics?limit=1").status_code == 200
@@ -0,0 +1,84 @@
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table
+
+import startup
+from conftest import statements
+
+
+def toy_metadata(extra_column=False, index=False):
+    meta = MetaData()
+    columns = [Column("id", Integer, primary_key=True), Column("name", String(20))]
+    if extra_column:
+        columns.append(Column("tag", String(10)))
+    table = Table("things", meta, *columns)
+    if index:
+        Index("ix_things_name", table.c.name)
+    return meta
+
+
+def test_fingerprint_is_stable_and_sensitive():
+    base = startup.fingerprint(toy_metadata(), 1, [{"title": "a"}])
+    assert base == startup.fingerprint(toy_metadata(), 1, [{"title": "a"}])
+    assert base != startup.fingerprint(toy_metadata(extra_column=True), 1, [{"title": "a"}])
+    assert base != startup.fingerprint(toy_metadata(index=True), 1, [{"title": "a"}])
+    assert base != startup.fingerprint(toy_metadata(), 2, [{"title": "a"}])
+    assert base != startup.fingerprint(toy_metadata(), 1, [{"title": "b"}])
+
+
+def test_timer_report():
+    timer = startup.StartupTimer()
+    with timer.step("conexão"):
+        pass
+    timer.skip("seed")
+    names = [name for name, _ in timer.steps]
+    assert names == ["conexão", "seed"]
+    assert timer.steps[1][1] is None
+    report = timer.report()
+    assert report.endswith("seed (pulado)")
+    assert "conexão" in report and " ms" in report
+
+
+def skipped(timer):
+    return {name for name, seconds in timer.steps if seconds is None}
+
+
+def test_second_bootstrap_is_a_single_query(harmonic, engine):
+    first = harmonic.bootstrap()
+    assert skipped(first) == set()
+
+    with statements(engine) as seen:
+        second = harmonic.bootstrap()
+    assert skipped(second) == {"migrações", "admin", "seed"}
+    assert len(seen) == 1 and "app_meta" in seen[0]
+
+    assert skipped(harmonic.bootstrap(force=True)) == set()
+
+
+def test_seed_change_reruns_bootstrap(harmonic, monkeypatch):
+    harmonic.bootstrap()
+    track = {"title": "Faixa Nova", "genre": "Pop", "artist_name": "Alguém", "cover_url": None}
+    monkeypatch.setattr(harmonic, "SEED_TRACKS", harmonic.SEED_TRACKS + [track])
+    assert skipped(harmonic.bootstrap()) == set()
+    with harmonic.app.app_context():
+        assert harmonic.Music.query.filter_by(title="Faixa Nova").count() == 1
+    assert skipped(harmonic.bootstrap()) == {"migrações", "admin", "seed"}
+
+
+def test_forget_bootstrap(harmonic):
+    harmonic.bootstrap()
+    with harmonic.app.app_context():
+        harmonic.forget_bootstrap()
+    assert skipped(harmonic.bootstrap()) == set()
+
+
+def test_bootstrap_never_creates_the_database_with_database_url(harmonic, monkeypatch):
+    def fail():
+        raise AssertionError("não devia criar o banco")
+
+    monkeypatch.setattr(harmonic, "ensure_mssql_database", fail)
+    harmonic.bootstrap(force=True)
+
+
+def test_cli(harmonic):
+    result = harmonic.app.test_cli_runner().invoke(args=["bootstrap"])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("Bootstrap em ")
@@ -0,0 +1,83 @@
+from conftest import register, statements
+
+
+def stats(harmonic):
+    with harmonic.app.app_context():
+        return harmonic.read_admin_stats()
+
+
+def fresh_stats(harmonic):
+    with harmonic.app.app_context():
+        harmonic.reconcile_stats()
+        return harmonic.read_admin_stats()
+
+
+def test_writes_keep_counters_in_step_with_the_tables(harmonic, admin_client, artist_client, user_client):
+    fresh_stats(harmonic)
+    artist_client.post("/crud_msc", data={"title": "Contada", "genre": "Samba"})
+    with harmonic.app.app_context():
+        music_id = harmonic.Music.query.filter_by(title="Contada").one().id
+    user_client.post(f"/favorite/{music_id}")
+    register(harmonic.app.test_client(), role="artist")
+
+    with harmonic.app.app_context():
+        victim = harmonic.User.query.filter_by(id=user_client.user_id).one().id
+    admin_client.post("/admin/delete_user", data={"id": victim})
+
+    counted = stats(harmonic)
+    counted.pop("favorites_by_day")
+    recounted = fresh_stats(harmonic)
+    recounted.pop("favorites_by_day")
+    assert counted == recounted
+
+
+def test_favorite_counts_by_day(harmonic, user_client):
+    before = dict(fresh_stats(harmonic)["favorites_by_day"])
+    with harmonic.app.app_context():
+        music_id = harmonic.Music.query.first().id
+    user_client.post(f"/favorite/{music_id}")
+    after = stats(harmonic)
+    assert after["total_favorites"] == 1
+    assert sum(dict(after["favorites_by_day"]).values()) == sum(before.values()) + 1
+
+
+def test_reconcile_corrects_drift(harmonic):
+    expected = fresh_stats(harmonic)
+    with harmonic.app.app_context():
+        harmonic.bump_counters({("total", "musics"): 7, ("role", "listener"): -3})
+        harmonic.db.session.commit()
+    assert stats(harmonic)["total_musics"] == expected["total_musics"] + 7
+    assert fresh_stats(harmonic) == expected
+
+
+def test_existing_counters_bump_in_one_update(harmonic, engine):
+    fresh_stats(harmonic)
+    deltas = {("total", "users"): 1, ("total", "musics"): 2, ("total", "favorites"): 3}
+    with harmonic.app.app_context():
+        with statements(engine) as seen:
+            harmonic.bump_counters(deltas)
+        harmonic.db.session.rollback()
+    assert len(seen) == 1
+    assert seen[0].lstrip().upper().startswith("UPDATE")
+
+
+def test_missing_counters_are_created(harmonic):
+    with harmonic.app.app_context():
+        harmonic.bump_counters({("genre", "Polca"): 2, ("total", "users"): 0})
+        harmonic.db.session.commit()
+    assert ("Polca", 2) in stats(harmonic)["musics_by_genre"]
+
+
+def test_zeroed_counters_are_hidden(harmonic):
+    with harmonic.app.app_context():
+        harmonic.bump_counters({("genre", "Polca"): 1})
+        harmonic.bump_counters({("genre", "Polca"): -1})
+        harmonic.db.session.commit()
+    assert "Polca" not in dict(stats(harmonic)["musics_by_genre"])
+
+
+def test_admin_home_reads_the_counters(harmonic, admin_client, engine):
+    with statements(engine) as seen:
+        response = admin_client.get("/home")
+    assert response.status_code == 200
+    assert not [s for s in seen if "count(" in s.lower() and "FROM users" in s]